@@ -297,81 +297,65 @@ class CampaignAgent:
                 "message": f"Error executing {tool_name}: {str(e)}"
             })
     
-    def _save_tool_calls(self, campaign_id: str, tool_calls_history: List[Dict]) -> None:
-        """Save tool calls to campaign state."""
+    def _save_tool_calls(self, campaign_id: str, tool_calls_history: List[Dict], uow=None) -> None:
+        """Append tool calls to the campaign's workflow log (errors propagate inside a unit of work)."""
         try:
-            from core.db import get_db_connection
-            import json as json_lib
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get existing tool calls
-            cursor.execute('SELECT tool_calls FROM campaigns WHERE id = ?', (campaign_id,))
-            row = cursor.fetchone()
-            existing_calls = []
-            if row and row[0]:
-                try:
-                    existing_calls = json_lib.loads(row[0])
-                except:
-                    existing_calls = []
-            
-            # Append new tool calls
-            existing_calls.extend(tool_calls_history)
-            
-            # Save updated tool calls
-            cursor.execute(
-                'UPDATE campaigns SET tool_calls = ? WHERE id = ?',
-                (json_lib.dumps(existing_calls), campaign_id)
-            )
-            conn.commit()
-            conn.close()
+            from core.db import append_tool_calls
+            append_tool_calls(campaign_id, tool_calls_history, uow=uow)
             logger.info(f"Saved {len(tool_calls_history)} tool calls to campaign {campaign_id}")
         except Exception as e:
             logger.error(f"Failed to save tool calls: {e}")
+            if uow is not None:
+                raise
     
-    def _save_pending_action(self, campaign_id: str, pending_action: Dict) -> None:
+    def _save_pending_action(self, campaign_id: str, pending_action: Dict, uow=None) -> None:
         """Save pending action that requires payment before execution."""
         try:
-            from core.db import get_db_connection
-            import json as json_lib
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            cursor.execute(
-                'UPDATE campaigns SET pending_action = ? WHERE id = ?',
-                (json_lib.dumps(pending_action), campaign_id)
-            )
-            conn.commit()
-            conn.close()
+            from core.db import set_pending_action
+            set_pending_action(campaign_id, pending_action, uow=uow)
             logger.info(f"Saved pending action {pending_action['tool_name']} to campaign {campaign_id}")
         except Exception as e:
             logger.error(f"Failed to save pending action: {e}")
     
-    def execute_pending_action(self, campaign_id: str, user_id: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
+    def _record_paid_execution(self, campaign_id: str, tool_calls_history: List[Dict], new_pending: Optional[Dict] = None, uow=None) -> None:
+        """
+        Write the outcome of a paid run: store the next pending action if
+        another payment is needed (the paid one was cleared when it was
+        claimed) and log the tool calls.
+        """
+        if new_pending is not None:
+            from core.db import set_pending_action
+            set_pending_action(campaign_id, new_pending, uow=uow)
+        self._save_tool_calls(campaign_id, tool_calls_history, uow=uow)
+    
+    def execute_pending_action(self, campaign_id: str, user_id: str, conversation_history: List[Dict] = None, uow=None) -> Dict[str, Any]:
         """
         Execute a pending action after payment has been processed.
         Then CONTINUE the agent loop to process subsequent steps (like filtering).
+        
+        The pending action is first claimed (cleared with a compare-and-set in
+        its own short transaction), so two payments for it cannot both execute
+        the tool. With a unit of work (core.db.UnitOfWork) the writes that
+        record the run go through it and the caller commits them together; its
+        first write comes after the tools and the LLM have finished, so it
+        holds the write lock only for those statements.
         """
+        tool_calls_history = []
+        pending_action = None
         try:
-            from core.db import get_db_connection
-            import json as json_lib
+            from core.db import claim_pending_action
             from langchain_core.messages import ToolMessage
             
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            
-            # Get pending action
-            cursor.execute('SELECT pending_action FROM campaigns WHERE id = ?', (campaign_id,))
-            row = cursor.fetchone()
+            # Claim the pending action
+            pending_action = claim_pending_action(campaign_id)
             
-            if not row or not row[0]:
+            if not pending_action:
                 return {
                     "success": False,
                     "message": "No pending action found for this campaign.",
                     "error": "No pending action"
                 }
             
-            pending_action = json_lib.loads(row[0])
             tool_name = pending_action.get("tool_name")
             tool_args = pending_action.get("tool_args", {})
             tool_id = pending_action.get("tool_id", tool_name)
@@ -385,21 +369,13 @@ class CampaignAgent:
             # Execute the tool
             tool_result = self._execute_tool(tool_name, tool_args)
             
-            # Clear pending action
-            cursor.execute(
-                'UPDATE campaigns SET pending_action = NULL WHERE id = ?',
-                (campaign_id,)
-            )
-            conn.commit()
-            conn.close()
-            
-            # Save to tool calls history
+            # Recorded (and the pending action cleared) once the run finishes
             tool_call_record = {
                 "tool_name": tool_name,
                 "tool_args": tool_args,
                 "paid": True
             }
-            self._save_tool_calls(campaign_id, [tool_call_record])
+            tool_calls_history.append(tool_call_record)
             
             logger.info(f"Tool {tool_name} executed. Now continuing agent loop...")
             
@@ -433,8 +409,7 @@ class CampaignAgent:
             ))
             messages.append(ToolMessage(content=str(tool_result), tool_call_id=tool_id))
             
-            # Track tool calls and costs for continuation
-            tool_calls_history = [tool_call_record]
+            # Track costs for continuation (tool calls go on tool_calls_history)
             total_cost = 0.0
             
             # Prices are 10x base rate. Search includes filtering (grouped payment)
@@ -457,8 +432,7 @@ class CampaignAgent:
                     response_text = self._extract_text_content(response.content)
                     logger.info(f"Agent completed post-payment with: {response_text[:100]}...")
                     
-                    if tool_calls_history:
-                        self._save_tool_calls(campaign_id, tool_calls_history[1:])  # Don't double-save first tool
+                    self._record_paid_execution(campaign_id, tool_calls_history, uow=uow)
                     
                     return {
                         "success": True,
@@ -495,7 +469,7 @@ class CampaignAgent:
                             "tool_id": tc_id,
                             "cost": tool_cost
                         }
-                        self._save_pending_action(campaign_id, new_pending)
+                        self._record_paid_execution(campaign_id, tool_calls_history, new_pending, uow=uow)
                         
                         action_descriptions = {
                             "apollo_search_people": "search and filter leads",
@@ -527,6 +501,7 @@ class CampaignAgent:
                     logger.info(f"Tool {tc_name} result: {str(tc_result)[:200]}...")
             
             # Max iterations reached
+            self._record_paid_execution(campaign_id, tool_calls_history, uow=uow)
             return {
                 "success": True,
                 "message": "Processing complete.",
@@ -536,6 +511,19 @@ class CampaignAgent:
             
         except Exception as e:
             logger.exception(f"Error executing pending action: {e}")
+            try:
+                if tool_calls_history:
+                    # The paid tool ran; keep its record (it stays cleared so it won't run again)
+                    self._record_paid_execution(campaign_id, tool_calls_history, uow=uow)
+                elif pending_action:
+                    # Nothing ran; put the claimed action back for another payment (the claim
+                    # committed on its own, so this must too)
+                    from core.db import set_pending_action
+                    set_pending_action(campaign_id, pending_action)
+            except Exception as record_error:
+                logger.error(f"Failed to record paid execution: {record_error}")
+                if uow is not None:
+                    raise
             return {
                 "success": False,
                 "message": f"Error executing action: {str(e)}",
@@ -0,0 +1,112 @@
+"""
+Request latency while an online backup runs.
+
+Worker threads serve a mix of contact-page reads and response inserts against
+a generated database (see benchmarks/generate.py) and record per-request
+latency. That is measured with no backup running, then during a throttled
+core.backup copy (the defaults: small page steps with a pause after each),
+then during an unthrottled one (the whole file in one step). Exits non-zero if
+the throttled backup pushes p99 above --max-p99-ratio times the idle p99.
+
+Usage:
+    python -m benchmarks.bench_backup [--size medium] [--threads 4] [--max-p99-ratio 2]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+from benchmarks.bench_db import percentile
+from benchmarks.common import db, use_database, restore_database, disable_campaign_cache
+from benchmarks.generate import SIZES, generate
+from core import backup
+
+WRITE_EVERY = 4  # one response insert per this many requests
+
+
+def worker(campaigns, stop, samples, seed):
+    rng = random.Random(seed)
+    i = 0
+    while not stop.is_set():
+        campaign_id = rng.choice(campaigns)
+        start = time.perf_counter()
+        if i % WRITE_EVERY == 0:
+            db.add_campaign_response(campaign_id, f'bench{i}@example.com', 'Thanks, interested.')
+        else:
+            db.get_campaign_contacts_page(campaign_id, limit=20, offset=rng.randrange(5))
+        samples.append((time.perf_counter() - start) * 1000)
+        i += 1
+
+
+def measure(label, campaigns, threads, during):
+    """Run the workload while during() runs; returns (p50, p99, requests, seconds)"""
+    stop = threading.Event()
+    samples = []
+    workers = [
+        threading.Thread(target=worker, args=(campaigns, stop, samples, n)) for n in range(threads)
+    ]
+    for thread in workers:
+        thread.start()
+    start = time.perf_counter()
+    try:
+        during()
+    finally:
+        elapsed = time.perf_counter() - start
+        stop.set()
+        for thread in workers:
+            thread.join()
+    p50, p99 = percentile(samples, 0.5), percentile(samples, 0.99)
+    print(f"{label:<22} p50 {p50:7.2f} ms   p99 {p99:7.2f} ms   {len(samples) / elapsed:8.0f} req/s   {elapsed:6.1f} s")
+    return p50, p99
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--size', default='small', choices=sorted(SIZES))
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'arc_bench_data'),
+                        help='where generated databases are kept between runs')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--idle-seconds', type=float, default=5.0)
+    parser.add_argument('--max-p99-ratio', type=float, default=2.0)
+    args = parser.parse_args()
+
+    source = os.path.join(args.data_dir, f'{args.size}-seed{args.seed}.db')
+    if not os.path.exists(source):
+        os.makedirs(args.data_dir, exist_ok=True)
+        generate(source + '.partial', *SIZES[args.size], seed=args.seed,
+                 log=lambda message: print(message, file=sys.stderr))
+        os.replace(source + '.partial', source)
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    path = os.path.join(workdir, 'campaigns.db')
+    shutil.copyfile(source, path)
+    previous = use_database(path)
+    try:
+        disable_campaign_cache()
+        conn = db.get_db_connection()
+        campaigns = [row[0] for row in conn.execute('SELECT id FROM campaigns ORDER BY random() LIMIT 500')]
+        target = os.path.join(workdir, 'snapshot.db')
+        print(f"{args.size}: {os.path.getsize(path) / 1e6:.0f} MB, {args.threads} threads, "
+              f"{backup.BACKUP_PAGES_PER_STEP} pages/step, {backup.BACKUP_STEP_SLEEP_MS} ms between steps")
+
+        _, idle_p99 = measure('no backup', campaigns, args.threads, lambda: time.sleep(args.idle_seconds))
+        _, throttled_p99 = measure('throttled backup', campaigns, args.threads,
+                                   lambda: backup.backup_database(path, target))
+        measure('unthrottled backup', campaigns, args.threads,
+                lambda: backup.backup_database(path, target, pages_per_step=-1, step_sleep_ms=0))
+    finally:
+        restore_database(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if throttled_p99 > idle_p99 * args.max_p99_ratio:
+        print(f"FAIL: p99 during the throttled backup is {throttled_p99 / idle_p99:.1f}x the idle p99")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,87 @@
+"""
+Connection benchmark: legacy per-call connections vs pooled WAL connections.
+
+Simulates concurrent authenticated chat requests, each of which performs the
+same handful of core/db.py calls the API makes (user sync, campaign lookup,
+campaign update, analytics write, campaign list).
+
+Usage:
+    python -m benchmarks.bench_connections [--threads 8] [--requests 2000]
+"""
+
+import argparse
+import os
+import shutil
+import statistics
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import db, use_database, restore_database, seed_users_and_campaigns
+
+
+def simulated_request(i, users, campaigns_per_user):
+    """One authenticated chat turn worth of DB work; returns latency in ms"""
+    user_id = f'user_{i % users}'
+    campaign_id = f'{user_id}_campaign_{i % campaigns_per_user}'
+    start = time.perf_counter()
+    db.create_user_if_not_exists({
+        'user_id': user_id,
+        'email': f'{user_id}@example.com',
+        'name': f'User {i % users}',
+        'picture': None
+    })
+    db.get_campaign_analytics(campaign_id, user_id)
+    db.update_campaign(campaign_id, user_id, status='active')
+    db.create_or_update_analytics(campaign_id, emails_sent=i)
+    db.get_all_campaigns(user_id)
+    return (time.perf_counter() - start) * 1000
+
+
+def run_mode(mode, args, workdir):
+    path = os.path.join(workdir, f'bench_{mode}.db')
+    use_database(path, mode)
+    seed_users_and_campaigns(args.users, args.campaigns)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        latencies = list(pool.map(
+            lambda i: simulated_request(i, args.users, args.campaigns),
+            range(args.requests)
+        ))
+    elapsed = time.perf_counter() - start
+    db.close_all_connections()
+
+    latencies.sort()
+    return {
+        'mode': mode,
+        'requests_per_sec': args.requests / elapsed,
+        'p50_ms': statistics.median(latencies),
+        'p99_ms': latencies[int(len(latencies) * 0.99) - 1],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--requests', type=int, default=2000)
+    parser.add_argument('--users', type=int, default=20)
+    parser.add_argument('--campaigns', type=int, default=10, help='Campaigns per user')
+    args = parser.parse_args()
+
+    previous = (db.DB_PATH, db.DB_CONNECTION_MODE)
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    try:
+        results = [run_mode(mode, args, workdir) for mode in ('per_call', 'pooled')]
+    finally:
+        restore_database(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.requests} simulated requests on {args.threads} threads")
+    print(f"{'mode':<10} {'req/s':>10} {'p50 ms':>10} {'p99 ms':>10}")
+    for r in results:
+        print(f"{r['mode']:<10} {r['requests_per_sec']:>10.1f} {r['p50_ms']:>10.2f} {r['p99_ms']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+"""
+Storage benchmark suite: latency of every public core/db.py function at several data sizes.
+
+For each size, builds (once, then reuses from --data-dir) a database with
+benchmarks.generate, copies it to a scratch file and times each function
+against it with the campaign read cache disabled. Reads and writes use
+campaigns and users sampled across the dataset, plus the worst cases (the
+user with the most campaigns, the campaign with the most replies).
+
+The results go to a JSON report. Given a --baseline report from an earlier
+run (same sizes and seed), it lists every function whose median got slower
+by more than --threshold, or a database that got bigger by that factor, and
+exits non-zero, so storage regressions are caught before deploy. A public
+function without a case here also fails the run.
+
+Usage:
+    python -m benchmarks.bench_db [--sizes small,medium] [--output report.json] [--baseline previous.json]
+"""
+
+import argparse
+import inspect
+import os
+import platform
+import random
+import shutil
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from benchmarks.common import db, use_database, restore_database, disable_campaign_cache
+from benchmarks.generate import SIZES, generate
+from core import serializer
+
+# Differences below this are timer noise, whatever the ratio
+MIN_DELTA_MS = 0.05
+
+# Public functions that are not timed, and why
+NOT_TIMED = {
+    'close_all_connections': 'tears down the pool the other cases measure through',
+    'clear_campaign_cache': 'in-process cache bookkeeping, no storage access',
+    'invalidate_campaign_cache': 'in-process cache bookkeeping, no storage access',
+    'campaign_cache_stats': 'in-process cache bookkeeping, no storage access',
+    'memory_db_path': 'DB_PATH string helper, no storage access',
+    'is_memory_path': 'DB_PATH string helper, no storage access',
+    'companion_db_path': 'DB_PATH string helper, no storage access',
+    'drop_memory_database': 'in-memory database teardown, used by tests only',
+    'sharding_enabled': 'DB_SHARDS setting check, no storage access',
+    'user_db_path': 'shard routing; the cases run unsharded, where it returns DB_PATH',
+    'campaign_db_path': 'shard routing; the cases run unsharded, where it returns DB_PATH',
+    'all_db_paths': 'shard routing; the cases run unsharded, where it returns DB_PATH',
+    'fan_out': 'runs other helpers once per shard; see benchmarks/bench_shards.py',
+}
+
+# Whole-database jobs: timed once per size, skipped with --skip-maintenance
+MAINTENANCE = ('rebuild_search_index', 'recode_all_json_rows')
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+class Fixtures:
+    """Ids sampled from the benchmark database that the cases run against"""
+
+    def __init__(self, rng, samples=100):
+        conn = db.get_db_connection()
+        rows = conn.execute(
+            'SELECT id, user_id FROM campaigns WHERE executed = 1 ORDER BY random() LIMIT ?', (samples,)
+        ).fetchall()
+        self.campaigns = [(row['id'], row['user_id']) for row in rows]
+        self.users = [row[0] for row in conn.execute('SELECT id FROM users ORDER BY random() LIMIT ?', (samples,))]
+        self.heaviest_user = conn.execute(
+            'SELECT user_id FROM campaigns GROUP BY user_id ORDER BY COUNT(*) DESC LIMIT 1'
+        ).fetchone()[0]
+        self.busiest_campaign = conn.execute(
+            'SELECT campaign_id FROM analytics ORDER BY replies DESC LIMIT 1'
+        ).fetchone()[0]
+        self.emails = {
+            campaign_id: conn.execute(
+                'SELECT email FROM campaign_contacts WHERE campaign_id = ? ORDER BY position DESC LIMIT 1',
+                (campaign_id,)
+            ).fetchone()[0]
+            for campaign_id, _ in self.campaigns
+        }
+        self.max_contact_id = conn.execute('SELECT MAX(id) FROM contacts').fetchone()[0] or 0
+        conn.close()
+        self.contact = db.get_campaign_contacts(self.campaigns[0][0], limit=1)[0]
+        self.contact_text = serializer.dumps(self.contact)
+        self.stored_contact = db.encode_json_column(self.contact)
+        self.cursor = db.encode_campaign_cursor('2025-06-01T12:00:00', self.campaigns[0][0])
+        self.rng = rng
+
+    def campaign(self, i):
+        return self.campaigns[i % len(self.campaigns)]
+
+    def user(self, i):
+        return self.users[i % len(self.users)]
+
+
+def _schema_version():
+    conn = db.get_db_connection()
+    try:
+        return db.get_schema_version(conn)
+    finally:
+        conn.close()
+
+
+def _connection_roundtrip():
+    db.get_db_connection().close()
+
+
+def _user_record(user_id, name='Bench User'):
+    return {'user_id': user_id, 'email': f'{user_id}@example.com', 'name': name, 'picture': None}
+
+
+def _sync_known_user(f, iterations):
+    """The steady state of an authenticated request: a user synced before, profile unchanged"""
+    for user_id in f.users:
+        db.create_user_if_not_exists(_user_record(user_id))
+    return lambda i: db.create_user_if_not_exists(_user_record(f.user(i)))
+
+
+def _delete_campaign(f, iterations):
+    """Campaigns (with contacts) created up front so only the delete is timed"""
+    user_id = f.user(0)
+    ids = [f'bench_delete_{i}' for i in range(iterations)]
+    contacts = db.get_campaign_contacts(f.campaign(0)[0])
+    for campaign_id in ids:
+        db.create_campaign(campaign_id, 'Bench', user_id)
+        db.save_campaign_contacts(campaign_id, user_id, contacts)
+    return lambda i: db.delete_campaign(ids[i], user_id)
+
+
+def _claim_pending_action(f, iterations):
+    """Campaigns with a pending action created up front, so every timed claim wins its compare-and-set"""
+    user_id = f.user(0)
+    ids = [f'bench_claim_{i}' for i in range(iterations)]
+    pending = {'tool_name': 'apollo_search_people', 'tool_args': {'person_titles': ['CTO']}, 'cost': 1.0}
+    for campaign_id in ids:
+        db.create_campaign(campaign_id, 'Bench', user_id)
+        db.set_pending_action(campaign_id, pending)
+    return lambda i: db.claim_pending_action(ids[i])
+
+
+def _save_campaign_contacts(f, iterations):
+    contacts = {campaign_id: db.get_campaign_contacts(campaign_id) for campaign_id, _ in f.campaigns}
+    return lambda i: db.save_campaign_contacts(*f.campaign(i), contacts[f.campaign(i)[0]])
+
+
+def _unit_of_work_update(campaign_id, user_id):
+    with db.UnitOfWork() as uow:
+        db.update_campaign(campaign_id, user_id, status='active', uow=uow)
+
+
+def build_cases():
+    """
+    (label, factory) pairs. A factory takes (fixtures, iterations) and returns
+    the callable to time, which is passed the iteration number. The function a
+    case covers is its label up to any '['.
+    """
+    messages = [{'role': 'user', 'content': 'Also add heads of sales in Austin.'},
+                {'role': 'assistant', 'content': 'Added 12 more contacts to the draft.'}]
+    tool_call = {'tool_name': 'apollo_search_people', 'tool_args': {'person_titles': ['CTO']}, 'paid': True}
+    pending = {'tool_name': 'gmail_send_bulk_emails', 'tool_args': {'subject': 'Quick idea'}, 'cost': 0.25}
+    return [
+        ('init_db', lambda f, n: lambda i: db.init_db()),
+        ('get_db_connection', lambda f, n: lambda i: _connection_roundtrip()),
+        ('get_schema_version', lambda f, n: lambda i: _schema_version()),
+        ('create_user_if_not_exists', _sync_known_user),
+        ('create_user_if_not_exists[profile changed]', lambda f, n: lambda i: db.create_user_if_not_exists(
+            _user_record(f.user(i), name=f'Bench User {i}'))),
+        ('create_campaign', lambda f, n: lambda i: db.create_campaign(f'bench_new_{i}', 'Bench', f.user(i))),
+        ('user_owns_campaign', lambda f, n: lambda i: db.user_owns_campaign(*f.campaign(i))),
+        ('get_all_campaigns', lambda f, n: lambda i: db.get_all_campaigns(f.user(i), messages_limit=10)),
+        ('get_all_campaigns[heaviest user]',
+         lambda f, n: lambda i: db.get_all_campaigns(f.heaviest_user, messages_limit=10)),
+        ('get_campaign_summaries', lambda f, n: lambda i: db.get_campaign_summaries(f.user(i))),
+        ('get_campaign_summaries[heaviest user, all includes]', lambda f, n: lambda i: db.get_campaign_summaries(
+            f.heaviest_user, include=list(db.CAMPAIGN_SUMMARY_INCLUDES))),
+        ('encode_campaign_cursor', lambda f, n: lambda i: db.encode_campaign_cursor('2025-06-01T12:00:00', f'{i}')),
+        ('decode_campaign_cursor', lambda f, n: lambda i: db.decode_campaign_cursor(f.cursor)),
+        ('encode_json_column', lambda f, n: lambda i: db.encode_json_column(f.contact)),
+        ('decode_json_column', lambda f, n: lambda i: db.decode_json_column(f.stored_contact)),
+        ('encode_json_text', lambda f, n: lambda i: db.encode_json_text(f.contact_text)),
+        ('decode_json_text', lambda f, n: lambda i: db.decode_json_text(f.stored_contact)),
+        ('get_campaign_analytics', lambda f, n: lambda i: db.get_campaign_analytics(*f.campaign(i))),
+        ('get_campaign_analytics[last 10 messages]',
+         lambda f, n: lambda i: db.get_campaign_analytics(*f.campaign(i), messages_limit=10)),
+        ('update_campaign', lambda f, n: lambda i: db.update_campaign(*f.campaign(i), status='active', cost=0.25)),
+        ('UnitOfWork[update_campaign]', lambda f, n: lambda i: _unit_of_work_update(*f.campaign(i))),
+        ('generate_sample_analytics', lambda f, n: lambda i: db.generate_sample_analytics(f.campaign(i)[0])),
+        ('create_or_update_analytics',
+         lambda f, n: lambda i: db.create_or_update_analytics(f.campaign(i)[0], emails_opened=i)),
+        ('increment_analytics', lambda f, n: lambda i: db.increment_analytics(f.campaign(i)[0], emails_opened=1)),
+        ('increment_analytics_batch[50 events]', lambda f, n: lambda i: db.increment_analytics_batch(
+            [{'campaign_id': f.campaign(i + j)[0], 'replies': 1} for j in range(50)])),
+        ('add_campaign_response', lambda f, n: lambda i: db.add_campaign_response(
+            f.campaign(i)[0], f.emails[f.campaign(i)[0]], 'Sounds good, send me a calendar invite.')),
+        ('add_campaign_responses_batch[100 rows]', lambda f, n: lambda i: db.add_campaign_responses_batch([
+            (f.campaign(i + j)[0], f.emails[f.campaign(i + j)[0]], 'Please follow up next quarter.',
+             datetime.now().isoformat()) for j in range(100)])),
+        ('get_campaign_responses', lambda f, n: lambda i: db.get_campaign_responses(f.campaign(i)[0])),
+        ('get_campaign_responses[busiest campaign]',
+         lambda f, n: lambda i: db.get_campaign_responses(f.busiest_campaign)),
+        ('get_campaign_responses_since',
+         lambda f, n: lambda i: db.get_campaign_responses_since(f.campaign(i)[0], since_id=0, limit=100)),
+        ('get_campaign_responses_since[busiest campaign]',
+         lambda f, n: lambda i: db.get_campaign_responses_since(f.busiest_campaign, since_id=0, limit=100)),
+        ('save_campaign_contacts', _save_campaign_contacts),
+        ('get_campaign_contacts', lambda f, n: lambda i: db.get_campaign_contacts(f.campaign(i)[0])),
+        ('get_campaign_contacts[page of 10]',
+         lambda f, n: lambda i: db.get_campaign_contacts(f.campaign(i)[0], limit=10, offset=10)),
+        ('get_campaign_contacts_page', lambda f, n: lambda i: db.get_campaign_contacts_page(f.campaign(i)[0], offset=20)),
+        ('get_campaign_contacts_page[sorted, filtered]', lambda f, n: lambda i: db.get_campaign_contacts_page(
+            f.campaign(i)[0], sort='organization', filters={'city': 'a'})),
+        ('get_campaign_contact_by_email', lambda f, n: lambda i: db.get_campaign_contact_by_email(
+            f.campaign(i)[0], f.emails[f.campaign(i)[0]])),
+        ('count_campaign_contacts', lambda f, n: lambda i: db.count_campaign_contacts(f.campaign(i)[0])),
+        ('append_campaign_messages', lambda f, n: lambda i: db.append_campaign_messages(*f.campaign(i), messages)),
+        ('get_campaign_messages', lambda f, n: lambda i: db.get_campaign_messages(f.campaign(i)[0])),
+        ('get_campaign_messages[last 10]',
+         lambda f, n: lambda i: db.get_campaign_messages(f.campaign(i)[0], last_n=10)),
+        ('append_tool_calls', lambda f, n: lambda i: db.append_tool_calls(f.campaign(i)[0], [tool_call])),
+        ('get_tool_calls', lambda f, n: lambda i: db.get_tool_calls(f.campaign(i)[0])),
+        ('get_tool_calls[by tool]',
+         lambda f, n: lambda i: db.get_tool_calls(f.campaign(i)[0], tool_name='apollo_search_people')),
+        ('set_pending_action', lambda f, n: lambda i: db.set_pending_action(f.campaign(i)[0], pending)),
+        ('get_pending_action', lambda f, n: lambda i: db.get_pending_action(f.campaign(i)[0])),
+        ('claim_pending_action', _claim_pending_action),
+        ('build_search_query', lambda f, n: lambda i: db.build_search_query('pricing "calendar invite" follow*')),
+        ('search_campaign_text', lambda f, n: lambda i: db.search_campaign_text(f.campaign(i)[1], 'pricing')),
+        ('search_campaign_text[heaviest user, common word]',
+         lambda f, n: lambda i: db.search_campaign_text(f.heaviest_user, 'send')),
+        ('search_campaign_text[prefix]', lambda f, n: lambda i: db.search_campaign_text(f.campaign(i)[1], 'calend*')),
+        ('recode_json_rows[500 contacts]', lambda f, n: lambda i: db.recode_json_rows(
+            'contacts', after_id=f.rng.randrange(f.max_contact_id), batch_size=500)),
+        ('delete_campaign', _delete_campaign),
+        ('rebuild_search_index', lambda f, n: lambda i: db.rebuild_search_index()),
+        ('recode_all_json_rows', lambda f, n: lambda i: db.recode_all_json_rows()),
+    ]
+
+
+def uncovered_functions(labels):
+    """Public core/db.py functions with neither a case nor a NOT_TIMED reason"""
+    public = {
+        name for name, fn in inspect.getmembers(db, inspect.isfunction)
+        if not name.startswith('_') and fn.__module__ == db.__name__
+    }
+    covered = {label.split('[')[0] for label in labels}
+    return sorted(public - covered - set(NOT_TIMED))
+
+
+def run_case(fn, iterations, budget_seconds):
+    """Call fn(i) up to iterations times (fewer once the time budget is spent); returns latencies in ms"""
+    samples = []
+    deadline = time.perf_counter() + budget_seconds
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - start) * 1000)
+        if samples and time.perf_counter() > deadline:
+            break
+    return samples
+
+
+def bench_size(size, args, workdir, log):
+    users, campaigns, responses = SIZES[size]
+    source = os.path.join(args.data_dir, f'{size}-seed{args.seed}.db')
+    if not os.path.exists(source):
+        log(f'[{size}] generating {users:,} users, {campaigns:,} campaigns, {responses:,} responses -> {source}')
+        os.makedirs(args.data_dir, exist_ok=True)
+        partial = source + '.partial'
+        if os.path.exists(partial):
+            os.remove(partial)
+        generate(partial, users, campaigns, responses, seed=args.seed, log=log)
+        os.replace(partial, source)
+    path = os.path.join(workdir, f'{size}.db')
+    shutil.copyfile(source, path)
+
+    results = {}
+    previous = use_database(path)
+    try:
+        disable_campaign_cache()
+        rng = random.Random(args.seed)
+        fixtures = Fixtures(rng)
+        for label, factory in build_cases():
+            name = label.split('[')[0]
+            maintenance = name in MAINTENANCE
+            if maintenance and args.skip_maintenance:
+                continue
+            iterations = 1 if maintenance else args.iterations
+            samples = run_case(factory(fixtures, iterations), iterations, args.budget_seconds)
+            results[label] = {
+                'iterations': len(samples),
+                'p50_ms': round(statistics.median(samples), 4),
+                'p95_ms': round(percentile(samples, 0.95), 4),
+                'p99_ms': round(percentile(samples, 0.99), 4),
+                'max_ms': round(max(samples), 4),
+            }
+            log(f"[{size}] {label:<55}{results[label]['p50_ms']:>10.3f}ms{results[label]['p99_ms']:>10.3f}ms")
+        db.close_all_connections()
+    finally:
+        restore_database(previous)
+    return {
+        'dataset': {'users': users, 'campaigns': campaigns, 'responses': responses, 'seed': args.seed},
+        'db_bytes': os.path.getsize(source),
+        'functions': results,
+    }
+
+
+def compare(report, baseline, threshold):
+    """Human-readable regressions of report against baseline"""
+    regressions = []
+    for size, current in report['sizes'].items():
+        before = baseline.get('sizes', {}).get(size)
+        if before is None:
+            continue
+        if before['dataset'] != current['dataset']:
+            regressions.append(f'[{size}] dataset differs from the baseline ({before["dataset"]}); not compared')
+            continue
+        if current['db_bytes'] > before['db_bytes'] * threshold:
+            regressions.append(f"[{size}] database grew {before['db_bytes'] / 1e6:.1f} MB -> "
+                               f"{current['db_bytes'] / 1e6:.1f} MB")
+        for label, result in current['functions'].items():
+            old = before['functions'].get(label)
+            if old is None:
+                continue
+            new_ms, old_ms = result['p50_ms'], old['p50_ms']
+            if new_ms > old_ms * threshold and new_ms - old_ms > MIN_DELTA_MS:
+                regressions.append(f'[{size}] {label}: p50 {old_ms:.3f}ms -> {new_ms:.3f}ms '
+                                   f'({new_ms / max(old_ms, 1e-9):.1f}x)')
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default='small,medium', help=f'comma-separated, from {", ".join(SIZES)}')
+    parser.add_argument('--data-dir', default=os.path.join(tempfile.gettempdir(), 'arc_bench_data'),
+                        help='where generated databases are kept between runs')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--iterations', type=int, default=200, help='calls per function')
+    parser.add_argument('--budget-seconds', type=float, default=5.0, help='stop a function early after this long')
+    parser.add_argument('--skip-maintenance', action='store_true', help=f'skip {", ".join(MAINTENANCE)}')
+    parser.add_argument('--output', help='write the JSON report here')
+    parser.add_argument('--baseline', help='earlier report to compare against')
+    parser.add_argument('--threshold', type=float, default=1.5, help='slowdown factor reported as a regression')
+    args = parser.parse_args()
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f'unknown size(s) {unknown}, expected {sorted(SIZES)}')
+    missing = uncovered_functions(label for label, _ in build_cases())
+    if missing:
+        print(f"No benchmark case for public core/db.py function(s): {', '.join(missing)}")
+        sys.exit(2)
+
+    log = lambda message: print(message, file=sys.stderr)
+    report = {
+        'created_at': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'json_backend': serializer.backend_name(),
+        'json_compression': db.DB_JSON_COMPRESSION,
+        'sizes': {},
+    }
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    try:
+        for size in sizes:
+            report['sizes'][size] = bench_size(size, args, workdir, log)
+            os.remove(os.path.join(workdir, f'{size}.db'))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'wb') as f:
+            f.write(serializer.dumpb(report, indent=2))
+        log(f'Report written to {args.output}')
+
+    print(f"{'function':<55}" + ''.join(f'{size + " p50":>16}' for size in sizes))
+    for label in report['sizes'][sizes[0]]['functions']:
+        cells = ''.join(
+            f"{report['sizes'][size]['functions'][label]['p50_ms']:>14.3f}ms"
+            if label in report['sizes'][size]['functions'] else f"{'-':>16}"
+            for size in sizes
+        )
+        print(f'{label:<55}{cells}')
+    print(f"{'database size':<55}" + ''.join(f"{report['sizes'][size]['db_bytes'] / 1e6:>14.1f}MB" for size in sizes))
+
+    if args.baseline:
+        with open(args.baseline, 'rb') as f:
+            baseline = serializer.loads(f.read())
+        regressions = compare(report, baseline, args.threshold)
+        if regressions:
+            print(f'\n{len(regressions)} regression(s) against {args.baseline} (threshold {args.threshold}x):')
+            for line in regressions:
+                print(f'    {line}')
+            sys.exit(1)
+        print(f'\nNo regressions against {args.baseline} (threshold {args.threshold}x)')
+
+
+if __name__ == '__main__':
+    main()
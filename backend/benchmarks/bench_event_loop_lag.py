@@ -0,0 +1,96 @@
+"""
+Event-loop lag check: a slow query called directly vs through core.async_db.
+
+A ticker coroutine sleeps in short intervals and records how late it wakes up
+while a deliberately slow SQLite query runs. Called directly, the query stalls
+the loop for its whole duration; through core.async_db the loop keeps ticking.
+Exits non-zero if the async path still lags by more than --max-lag-ms.
+
+Usage:
+    python -m benchmarks.bench_event_loop_lag [--rows 3000000] [--max-lag-ms 50]
+"""
+
+import argparse
+import asyncio
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+from benchmarks.common import db, use_database, restore_database
+from core import async_db
+
+TICK_SECONDS = 0.005
+
+
+def slow_query(rows):
+    """Count through a recursive CTE; CPU-bound inside SQLite"""
+    conn = db.get_db_connection()
+    try:
+        return conn.execute(
+            "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?) "
+            "SELECT count(*) FROM n",
+            (rows,)
+        ).fetchone()[0]
+    finally:
+        conn.close()
+
+
+async def ticker(stop, lags):
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_SECONDS)
+        lags.append((time.perf_counter() - start - TICK_SECONDS) * 1000)
+
+
+async def measure(label, call):
+    stop = asyncio.Event()
+    lags = []
+    tick_task = asyncio.create_task(ticker(stop, lags))
+    await asyncio.sleep(TICK_SECONDS * 2)
+    start = time.perf_counter()
+    await call()
+    elapsed = (time.perf_counter() - start) * 1000
+    stop.set()
+    await tick_task
+    max_lag = max(lags) if lags else 0.0
+    print(f"{label:<10} query {elapsed:8.1f} ms   max loop lag {max_lag:8.1f} ms   ticks {len(lags)}")
+    return max_lag
+
+
+async def run(args):
+    async def blocking():
+        slow_query(args.rows)
+
+    async def offloaded():
+        await async_db.run_in_db_thread(slow_query, args.rows)
+
+    await measure('blocking', blocking)
+    lag = await measure('async_db', offloaded)
+    async_db.shutdown()
+    return lag
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--rows', type=int, default=3_000_000)
+    parser.add_argument('--max-lag-ms', type=float, default=50.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    previous = use_database(os.path.join(workdir, 'lag.db'))
+    try:
+        lag = asyncio.run(run(args))
+    finally:
+        restore_database(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if lag > args.max_lag_ms:
+        print(f"FAIL: event loop stalled {lag:.1f} ms while a query ran through core.async_db")
+        sys.exit(1)
+    print("OK: slow queries no longer block the event loop")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+JSON column compression benchmark: DB size and read/write latency per codec.
+
+Builds a synthetic dataset (10k campaigns by default, each with contacts,
+conversation turns and tool calls) once per DB_JSON_COMPRESSION codec, then
+reports the database size and the latency of the write helpers and of the
+campaign read paths (with the campaign read cache disabled).
+
+Usage:
+    python -m benchmarks.bench_json_compression [--campaigns 10000] [--reads 2000]
+"""
+
+import argparse
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import (
+    db, use_database, restore_database, disable_campaign_cache,
+    synthetic_contact, synthetic_messages, synthetic_tool_calls
+)
+
+CAMPAIGNS_PER_USER = 100
+
+
+def timed(samples, fn, *args, **kwargs):
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    samples.append((time.perf_counter() - start) * 1000)
+    return result
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def run_codec(codec, args, workdir):
+    path = os.path.join(workdir, f'compression_{codec}.db')
+    use_database(path)
+    disable_campaign_cache()
+    db.DB_JSON_COMPRESSION = codec
+    writes = []
+    rng = random.Random(42)
+
+    campaign_ids = []
+    for i in range(args.campaigns):
+        user_id = f'user_{i // CAMPAIGNS_PER_USER}'
+        if i % CAMPAIGNS_PER_USER == 0:
+            db.create_user_if_not_exists({'user_id': user_id, 'email': f'{user_id}@example.com', 'name': user_id, 'picture': None})
+        campaign_id = f'campaign_{i}'
+        db.create_campaign(campaign_id, f'Campaign {i}', user_id)
+        contacts = [synthetic_contact(i * 100 + n) for n in range(args.contacts)]
+        timed(writes, db.save_campaign_contacts, campaign_id, user_id, contacts)
+        timed(writes, db.append_campaign_messages, campaign_id, user_id, synthetic_messages(args.messages))
+        timed(writes, db.append_tool_calls, campaign_id, synthetic_tool_calls(args.tool_calls, contacts))
+        campaign_ids.append((campaign_id, user_id))
+
+    reads = {'get_campaign_analytics': [], 'get_campaign_messages': [], 'get_campaign_contacts': []}
+    for campaign_id, user_id in rng.sample(campaign_ids, min(args.reads, len(campaign_ids))):
+        timed(reads['get_campaign_analytics'], db.get_campaign_analytics, campaign_id, user_id)
+        timed(reads['get_campaign_messages'], db.get_campaign_messages, campaign_id)
+        timed(reads['get_campaign_contacts'], db.get_campaign_contacts, campaign_id)
+
+    conn = db.get_db_connection()
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.close()
+    db.close_all_connections()
+    size = os.path.getsize(path)
+    return codec, size, writes, reads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--campaigns', type=int, default=10000)
+    parser.add_argument('--contacts', type=int, default=20)
+    parser.add_argument('--messages', type=int, default=8)
+    parser.add_argument('--tool-calls', type=int, default=3)
+    parser.add_argument('--reads', type=int, default=2000)
+    args = parser.parse_args()
+
+    codecs = ['none', 'zlib'] + (['zstd'] if db.zstandard is not None else [])
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    previous = (db.DB_PATH, db.DB_CONNECTION_MODE)
+    previous_codec = db.DB_JSON_COMPRESSION
+    previous_cache_size = db._campaign_cache.maxsize
+    try:
+        results = [run_codec(codec, args, workdir) for codec in codecs]
+    finally:
+        db.DB_JSON_COMPRESSION = previous_codec
+        db._campaign_cache.maxsize = previous_cache_size
+        restore_database(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.campaigns} campaigns x ({args.contacts} contacts, {args.messages} turns, {args.tool_calls} tool calls)")
+    print(f"{'codec':<6}{'size MB':>10}{'write p50':>11}{'write p99':>11}", end='')
+    for name in results[0][3]:
+        print(f"{name + ' p50':>32}", end='')
+    print()
+    for codec, size, writes, reads in results:
+        print(f"{codec:<6}{size / 1e6:>10.1f}{statistics.median(writes):>9.3f}ms{percentile(writes, 0.99):>9.3f}ms", end='')
+        for samples in reads.values():
+            print(f"{statistics.median(samples):>30.3f}ms", end='')
+        print()
+    if 'zstd' not in codecs:
+        print("(zstd skipped: the 'zstandard' package is not installed)")
+
+
+if __name__ == '__main__':
+    main()
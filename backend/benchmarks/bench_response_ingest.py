@@ -0,0 +1,78 @@
+"""
+Response ingestion benchmark: per-request commits vs the write-behind buffer.
+
+Several threads submit customer responses through core.response_buffer as fast
+as they can, once per durability mode, then the buffer is closed (flushing the
+tail) and the stored rows and reply counters are checked.
+
+Usage:
+    python -m benchmarks.bench_response_ingest [--threads 8] [--responses 20000]
+"""
+
+import argparse
+import os
+import shutil
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmarks.common import db, use_database, restore_database, seed_users_and_campaigns
+from core.response_buffer import ResponseWriteBuffer, DURABILITY_MODES
+
+
+def run_mode(mode, args, workdir):
+    use_database(os.path.join(workdir, f'ingest_{mode}.db'))
+    seed_users_and_campaigns(1, args.campaigns)
+    buffer = ResponseWriteBuffer(durability=mode)
+    buffer.start()
+
+    def click(i):
+        future = buffer.submit(f'user_0_campaign_{i % args.campaigns}', f'lead{i}@example.com', 'interested')
+        if mode != 'write_behind':
+            future.result()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.threads) as pool:
+        list(pool.map(click, range(args.responses)))
+    acked = time.perf_counter() - start
+    buffer.close()
+    stored = time.perf_counter() - start
+
+    conn = db.get_db_connection()
+    rows = conn.execute('SELECT COUNT(*) FROM campaign_responses').fetchone()[0]
+    replies = conn.execute('SELECT COALESCE(SUM(replies), 0) FROM analytics').fetchone()[0]
+    conn.close()
+    db.close_all_connections()
+    return {
+        'mode': mode,
+        'acked_per_sec': args.responses / acked,
+        'stored_per_sec': args.responses / stored,
+        'rows': rows,
+        'replies': replies,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--responses', type=int, default=20000)
+    parser.add_argument('--campaigns', type=int, default=20)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    previous = (db.DB_PATH, db.DB_CONNECTION_MODE)
+    try:
+        results = [run_mode(mode, args, workdir) for mode in reversed(DURABILITY_MODES)]
+    finally:
+        restore_database(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{'mode':<14}{'acked/s':>12}{'stored/s':>12}{'rows':>10}{'replies':>10}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['acked_per_sec']:>12.0f}{r['stored_per_sec']:>12.0f}{r['rows']:>10}{r['replies']:>10}")
+        if r['rows'] != args.responses or r['replies'] != args.responses:
+            raise SystemExit(f"{r['mode']}: expected {args.responses} rows and replies")
+
+
+if __name__ == '__main__':
+    main()
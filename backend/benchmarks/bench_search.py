@@ -0,0 +1,93 @@
+"""
+Full-text search benchmark: /api/search latency as the responses table grows.
+
+Fills a scratch database with customer responses drawn from a Zipf-like
+vocabulary (so a few words are in most replies and most words are rare),
+spread over many users, then times search_campaign_text() for words of
+different frequency. Ingest goes through add_campaign_responses_batch(), so
+the insert rate includes the FTS triggers.
+
+Usage:
+    python -m benchmarks.bench_search [--responses 1000000] [--users 1000] [--queries 200]
+"""
+
+import argparse
+import itertools
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+
+from benchmarks.common import db, use_database, restore_database, seed_users_and_campaigns
+
+VOCABULARY = 5000
+CAMPAIGNS_PER_USER = 2
+BATCH = 20000
+
+# (label, vocabulary rank range) of the words queried
+BANDS = [('common', (0, 10)), ('frequent', (10, 100)), ('mid', (100, 1000)), ('rare', (1000, VOCABULARY))]
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+
+def build(args, rng):
+    words = [f'w{i}' for i in range(VOCABULARY)]
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(VOCABULARY)))
+    seed_users_and_campaigns(users=args.users, campaigns_per_user=CAMPAIGNS_PER_USER)
+
+    ingest_seconds = 0.0
+    for first in range(0, args.responses, BATCH):
+        rows = []
+        for i in range(first, min(first + BATCH, args.responses)):
+            campaign_id = f'user_{rng.randrange(args.users)}_campaign_{rng.randrange(CAMPAIGNS_PER_USER)}'
+            text = ' '.join(rng.choices(words, cum_weights=cum_weights, k=args.words))
+            rows.append((campaign_id, f'reply{i}@example.com', text, '2024-01-01T00:00:00'))
+        start = time.perf_counter()
+        db.add_campaign_responses_batch(rows)
+        ingest_seconds += time.perf_counter() - start
+    return words, ingest_seconds
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--responses', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=1000)
+    parser.add_argument('--words', type=int, default=12, help='words per response')
+    parser.add_argument('--queries', type=int, default=200, help='queries per frequency band')
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    previous = use_database(os.path.join(workdir, 'search.db'))
+    try:
+        words, ingest_seconds = build(args, rng)
+        results = []
+        for label, (low, high) in BANDS:
+            samples = []
+            for _ in range(args.queries):
+                user_id = f'user_{rng.randrange(args.users)}'
+                query = words[rng.randrange(low, high)]
+                start = time.perf_counter()
+                db.search_campaign_text(user_id, query, limit=20)
+                samples.append((time.perf_counter() - start) * 1000)
+            results.append((label, samples))
+        db.close_all_connections()
+        size = os.path.getsize(os.path.join(workdir, 'search.db'))
+    finally:
+        restore_database(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    print(f"{args.responses} responses, {args.users} users: ingest {args.responses / ingest_seconds:,.0f} rows/s, "
+          f"database {size / 1e6:.0f} MB")
+    print(f"{'words':<10}{'p50':>10}{'p99':>10}")
+    for label, samples in results:
+        print(f"{label:<10}{statistics.median(samples):>8.2f}ms{percentile(samples, 0.99):>8.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+"""
+Serialization benchmark: stdlib json vs orjson on realistic campaign payloads.
+
+Payloads mirror what the API and tools actually move around: a campaign detail
+(as returned by get_campaign_analytics), a page of 50 campaign summaries, an
+Apollo search tool result and a stored conversation history. Each is encoded
+to str (DB blobs, tool results), to bytes (HTTP bodies) and decoded again,
+once per core.serializer backend.
+
+Usage:
+    python -m benchmarks.bench_serialization [--iterations 500]
+"""
+
+import argparse
+import time
+
+from benchmarks.common import synthetic_contact, synthetic_messages, synthetic_tool_calls
+from core import serializer
+
+
+def build_payloads():
+    contacts = [synthetic_contact(i) for i in range(50)]
+    messages = synthetic_messages(30)
+    campaign = {
+        'id': 'campaign_42',
+        'name': 'AI infra founders, Bay Area',
+        'createdAt': '2024-05-01T12:00:00',
+        'paid': True,
+        'executed': True,
+        'cost': 1.25,
+        'status': 'active',
+        'contacts': serializer.dumps(contacts),
+        'contactsCount': len(contacts),
+        'tool_calls': serializer.dumps(synthetic_tool_calls(6, contacts)),
+        'messages': messages,
+        'pendingCost': 0,
+        'analytics': {'emailsSent': 50, 'emailsOpened': 21, 'replies': 4, 'bounceRate': 0.02},
+    }
+    summaries = {
+        'campaigns': [
+            {
+                'id': f'campaign_{i}', 'name': f'Campaign {i}', 'createdAt': '2024-05-01T12:00:00',
+                'paid': i % 2 == 0, 'executed': i % 2 == 0, 'cost': 0.5, 'status': 'active',
+                'contactsCount': 20, 'pendingCost': 0,
+                'analytics': {'emailsSent': 20, 'emailsOpened': 8, 'replies': 1, 'bounceRate': 0.0},
+            }
+            for i in range(50)
+        ],
+        'nextCursor': 'WyIyMDI0LTA1LTAxVDEyOjAwOjAwIiwiY2FtcGFpZ25fNDIiXQ',
+    }
+    tool_result = {
+        'status': 'success',
+        'message': 'Found 100 contacts',
+        'results': [synthetic_contact(i) for i in range(100)],
+        'count': 100,
+    }
+    return {
+        'campaign detail': campaign,
+        'summaries page': summaries,
+        'apollo tool result': tool_result,
+        'conversation history': messages,
+    }
+
+
+def per_call_us(fn, arg, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn(arg)
+    return (time.perf_counter() - start) / iterations * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--iterations', type=int, default=500)
+    args = parser.parse_args()
+
+    payloads = build_payloads()
+    backends = ['stdlib'] + (['orjson'] if serializer.orjson is not None else [])
+    original = serializer.backend_name()
+    results = {}
+    try:
+        for backend in backends:
+            serializer.set_backend(backend)
+            for label, payload in payloads.items():
+                text = serializer.dumps(payload)
+                results[backend, label] = (
+                    len(text),
+                    per_call_us(serializer.dumps, payload, args.iterations),
+                    per_call_us(serializer.dumpb, payload, args.iterations),
+                    per_call_us(serializer.loads, text, args.iterations),
+                )
+    finally:
+        serializer.set_backend(original)
+
+    print(f"{'payload':<22}{'backend':<9}{'KB':>7}{'dumps us':>11}{'dumpb us':>11}{'loads us':>11}")
+    for label in payloads:
+        for backend in backends:
+            size, dumps_us, dumpb_us, loads_us = results[backend, label]
+            print(f"{label:<22}{backend:<9}{size / 1024:>7.1f}{dumps_us:>11.1f}{dumpb_us:>11.1f}{loads_us:>11.1f}")
+    if 'orjson' not in backends:
+        print("(orjson not installed: only the stdlib backend was measured)")
+
+
+if __name__ == '__main__':
+    main()
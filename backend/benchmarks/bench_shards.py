@@ -0,0 +1,81 @@
+"""
+Write throughput with and without sharding (DB_SHARDS).
+
+Writer threads append conversation turns, the write every chat request makes,
+for users spread over the threads, each append its own transaction. This runs
+once per shard count on a fresh database. Unsharded, every append waits for
+the one write lock. With N shards, writers only wait for appends that hash to
+the same shard.
+
+Usage:
+    python -m benchmarks.bench_shards [--shards 0,2,4,8] [--threads 8] [--seconds 5]
+"""
+
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from benchmarks.common import db, use_database, restore_database, seed_users_and_campaigns
+
+USERS = 64
+
+
+def writer(thread_index, threads, stop, counts):
+    users = [u for u in range(USERS) if u % threads == thread_index]
+    done = 0
+    while not stop.is_set():
+        user_id = f'user_{users[done % len(users)]}'
+        db.append_campaign_messages(f'{user_id}_campaign_0', user_id, [
+            {'role': 'user', 'content': f'Turn {done}: find CTOs at fintech startups in Berlin'}
+        ])
+        done += 1
+    counts[thread_index] = done
+
+
+def run(shards, threads, seconds):
+    workdir = tempfile.mkdtemp(prefix='arc_bench_')
+    previous_shards = db.DB_SHARDS
+    db.DB_SHARDS = str(shards)
+    with contextlib.redirect_stdout(io.StringIO()):
+        previous = use_database(os.path.join(workdir, 'campaigns.db'))
+    try:
+        seed_users_and_campaigns(USERS, 1)
+        stop = threading.Event()
+        counts = [0] * threads
+        workers = [threading.Thread(target=writer, args=(n, threads, stop, counts)) for n in range(threads)]
+        start = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        time.sleep(seconds)
+        stop.set()
+        for thread in workers:
+            thread.join()
+        return sum(counts) / (time.perf_counter() - start)
+    finally:
+        restore_database(previous)
+        db.DB_SHARDS = previous_shards
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--shards', default='0,2,4,8', help="comma-separated shard counts (0 = unsharded)")
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    baseline = None
+    for shards in [int(n) for n in args.shards.split(',')]:
+        rate = run(shards, args.threads, args.seconds)
+        baseline = baseline or rate
+        label = f'{shards} shards' if shards else 'unsharded'
+        print(f'{label:<12} {rate:10.0f} appends/s   {rate / baseline:5.2f}x')
+
+
+if __name__ == '__main__':
+    main()
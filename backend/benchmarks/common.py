@@ -0,0 +1,119 @@
+"""
+Shared helpers for benchmarks: pointing core.db at a scratch database and seeding it.
+"""
+
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import core.db as db
+
+
+def use_database(path, mode='pooled'):
+    """Point core.db at path (creating the schema) and return the previous settings"""
+    previous = (db.DB_PATH, db.DB_CONNECTION_MODE)
+    db.close_all_connections()
+    db.clear_campaign_cache()
+    db._user_sync_cache.clear()
+    db.DB_CONNECTION_MODE = mode
+    db.DB_PATH = path
+    db.init_db()
+    return previous
+
+
+def restore_database(previous):
+    """Undo use_database()"""
+    db.close_all_connections()
+    db.clear_campaign_cache()
+    db._user_sync_cache.clear()
+    db.DB_PATH, db.DB_CONNECTION_MODE = previous
+
+
+def seed_users_and_campaigns(users, campaigns_per_user):
+    """Create users user_0..N with campaigns user_N_campaign_0..M"""
+    for u in range(users):
+        user_id = f'user_{u}'
+        db.create_user_if_not_exists({
+            'user_id': user_id,
+            'email': f'{user_id}@example.com',
+            'name': f'User {u}',
+            'picture': None
+        })
+        for c in range(campaigns_per_user):
+            db.create_campaign(f'{user_id}_campaign_{c}', f'Campaign {c}', user_id)
+
+
+def disable_campaign_cache():
+    """Make campaign reads hit the database every time (for latency measurements)"""
+    db.clear_campaign_cache()
+    db._campaign_cache.maxsize = 0
+
+
+_FIRST_NAMES = ['Ada', 'Grace', 'Linus', 'Margaret', 'Alan', 'Barbara', 'Ken', 'Radia', 'Dennis', 'Frances']
+_LAST_NAMES = ['Lovelace', 'Hopper', 'Torvalds', 'Hamilton', 'Turing', 'Liskov', 'Thompson', 'Perlman', 'Ritchie', 'Allen']
+_COMPANIES = ['Acme Robotics', 'Globex', 'Initech', 'Umbrella Health', 'Hooli', 'Stark Industries', 'Wayne Enterprises']
+_TITLES = ['VP of Engineering', 'Head of Growth', 'CTO', 'Director of Sales', 'Founder & CEO', 'Marketing Manager']
+_CITIES = ['San Francisco', 'New York', 'Austin', 'London', 'Berlin', 'Toronto', 'Singapore']
+
+
+def synthetic_contact(i):
+    """An Apollo-style person record like the ones the filter tool stores"""
+    first = _FIRST_NAMES[i % len(_FIRST_NAMES)]
+    last = _LAST_NAMES[(i // len(_FIRST_NAMES)) % len(_LAST_NAMES)]
+    company = _COMPANIES[i % len(_COMPANIES)]
+    slug = f'{first}-{last}-{i}'.lower()
+    return {
+        'id': f'apollo_{i:08x}',
+        'name': f'{first} {last}',
+        'first_name': first,
+        'last_name': last,
+        'email': f'{slug}@{company.split()[0].lower()}.com',
+        'title': _TITLES[i % len(_TITLES)],
+        'linkedin_url': f'https://www.linkedin.com/in/{slug}',
+        'city': _CITIES[i % len(_CITIES)],
+        'country': 'United States',
+        'organization': {
+            'name': company,
+            'website_url': f'https://{company.split()[0].lower()}.com',
+            'industry': 'computer software',
+            'estimated_num_employees': 50 + (i % 20) * 25,
+        },
+        'email_status': 'verified',
+    }
+
+
+def synthetic_messages(n, topic='AI infrastructure startups'):
+    """n alternating user/assistant turns of realistic length"""
+    messages = []
+    for turn in range(n):
+        if turn % 2 == 0:
+            content = f'Find me {10 + turn} decision makers at {topic} in the Bay Area and draft an intro email.'
+            messages.append({'role': 'user', 'content': content})
+        else:
+            content = (
+                f'I found {10 + turn} matching people at {topic}. Here is a draft you can review before I send it:\n\n'
+                'Subject: Quick idea for your outbound pipeline\n\n'
+                'Hi {first_name},\n\nI noticed your team has been growing quickly and wanted to share how '
+                'similar companies cut their prospecting time in half while keeping reply rates high. '
+                'Would you be open to a 15 minute call next week?\n\nBest,\nThe Arc Wardens team'
+            )
+            messages.append({'role': 'assistant', 'content': content, 'cost': 0.01 * turn})
+    return messages
+
+
+def synthetic_tool_calls(n, contacts):
+    """n executed tool calls whose arguments carry contact data, like the agent logs"""
+    tools = ['apollo_search_people', 'filter_contacts', 'gmail_send_bulk_emails']
+    return [
+        {
+            'tool_name': tools[i % len(tools)],
+            'tool_args': {
+                'person_titles': _TITLES[:3],
+                'person_locations': _CITIES[:2],
+                'recipients': [c['email'] for c in contacts[:10]],
+            },
+            'paid': i % 3 != 0,
+        }
+        for i in range(n)
+    ]
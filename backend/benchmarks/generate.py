@@ -0,0 +1,302 @@
+"""
+Synthetic database generator: realistic users, campaigns, contacts and replies.
+
+Contacts follow the shape of filtered_contacts_export.json (name, title,
+organization, headline, address, email, LinkedIn URL); the export's own
+contacts are the templates, with new names, emails and profile URLs. Volumes
+are skewed the way production data is: a few users own many campaigns, a few
+campaigns get most of the replies, and people show up in several campaigns
+(stored once in `contacts`, referenced from each campaign).
+
+Rows are bulk-inserted in large transactions rather than through the
+core/db.py helpers, but into the schema init_db() creates, so the FTS
+triggers index responses and conversation turns as usual. The same seed
+always produces the same database.
+
+Usage:
+    python -m benchmarks.generate --output /tmp/arc_small.db [--size small|medium|large]
+    python -m benchmarks.generate --output /tmp/arc.db --users 10000 --campaigns 200000 --responses 5000000
+"""
+
+import argparse
+import copy
+import itertools
+import os
+import random
+import re
+import time
+from datetime import datetime, timedelta
+
+from benchmarks.common import (
+    db, use_database, restore_database,
+    synthetic_contact, synthetic_messages, synthetic_tool_calls
+)
+from core import serializer
+
+TEMPLATE_PATH = os.path.join(os.path.dirname(__file__), '..', 'filtered_contacts_export.json')
+
+# (users, campaigns, responses) per preset
+SIZES = {
+    'small': (100, 2000, 50000),
+    'medium': (1000, 20000, 500000),
+    'large': (10000, 200000, 5000000),
+}
+
+# Campaigns are created over the year before this instant
+END = datetime(2026, 1, 31, 12, 0, 0)
+SPAN_DAYS = 365
+# Share of campaigns that were paid for and sent; the rest stay drafts
+EXECUTED_RATIO = 0.7
+# Each person appears in this many campaigns on average
+CONTACT_REUSE = 2
+# Skew exponents of campaigns per user and replies per campaign (0 = uniform)
+USER_SKEW = 0.8
+REPLY_SKEW = 0.6
+CAMPAIGN_BATCH = 500
+RESPONSE_BATCH = 20000
+
+_REPLIES = [
+    "Thanks for reaching out, I'd be happy to chat next week.",
+    'Not interested at the moment, please remove me from your list.',
+    'Can you send over some pricing details?',
+    "I'm out of office until Monday with limited access to email.",
+    'Looping in my colleague who owns this area.',
+    'Interesting timing, we were just discussing outbound tooling. Does Thursday work?',
+    'We already use a vendor for this, but happy to compare.',
+    'Please follow up next quarter.',
+    'Who gave you my email?',
+    'Sounds good, send me a calendar invite.',
+]
+_FIRST_NAMES = ['Priya', 'Arjun', 'Meera', 'Rahul', 'Ananya', 'Vikram', 'Sara', 'David', 'Lena', 'Omar',
+                'Chen', 'Maria', 'James', 'Fatima', 'Kenji', 'Aisha', 'Lucas', 'Nina', 'Ravi', 'Emma']
+_LAST_NAMES = ['Sharma', 'Iyer', 'Patel', 'Nair', 'Reddy', 'Kapoor', 'Garcia', 'Smith', 'Khan', 'Wang',
+               'Müller', 'Rossi', 'Tanaka', 'Silva', 'Cohen', 'Okafor', 'Dubois', 'Novak', 'Singh', 'Brown']
+
+
+def load_templates(path=TEMPLATE_PATH):
+    """The contacts of an exported campaigns file, or [] if there is none"""
+    try:
+        with open(path, 'rb') as f:
+            campaigns = serializer.loads(f.read())
+    except FileNotFoundError:
+        return []
+    return [contact for campaign in campaigns for contact in campaign.get('contacts') or []]
+
+
+def _skewed_cum_weights(n, exponent):
+    return list(itertools.accumulate(1 / (rank + 1) ** exponent for rank in range(n)))
+
+
+def _slug(text):
+    return re.sub(r'[^a-z0-9]+', '', text.lower())
+
+
+def person(person_id, templates):
+    """Contact record of one synthetic person; always the same for the same id"""
+    if not templates:
+        return synthetic_contact(person_id)
+    contact = copy.copy(templates[person_id % len(templates)])
+    first = _FIRST_NAMES[person_id % len(_FIRST_NAMES)]
+    last = _LAST_NAMES[(person_id // len(_FIRST_NAMES)) % len(_LAST_NAMES)]
+    domain = (contact.get('email') or '@example.com').rsplit('@', 1)[-1]
+    contact['name'] = f'{first} {last}'
+    contact['email'] = f'{_slug(first)}.{_slug(last)}{person_id}@{domain}'
+    contact['linkedin_url'] = f'http://www.linkedin.com/in/{_slug(first)}{_slug(last)}{person_id}'
+    return contact
+
+
+def campaign_person_id(campaign_index, position, contacts_per_campaign, population):
+    """Which person fills a campaign slot (a fixed scatter, so replies can find their sender again)"""
+    return ((campaign_index * contacts_per_campaign + position) * 2654435761) % population
+
+
+def campaign_id_for(created_at, index):
+    """Millisecond-timestamp ids like the frontend creates, made unique by the index"""
+    return f'{int(created_at.timestamp() * 1000)}{index % 1000:03d}'
+
+
+def campaign_name_for(created_at):
+    """Campaigns are named after the time they were started, e.g. '6:41 AM'"""
+    return f"{created_at.hour % 12 or 12}:{created_at.minute:02d} {'AM' if created_at.hour < 12 else 'PM'}"
+
+
+def user_id_for(index):
+    """21-digit ids like Google account subjects"""
+    return str(100000000000000000000 + index * 7919)
+
+
+def generate(path, users, campaigns, responses, contacts_per_campaign=25, messages=6, tool_calls=3,
+             seed=42, templates=None, log=print):
+    """
+    Build a database at path (which must not exist yet) and return a summary
+    dict: the parameters, row counts, build seconds and file size.
+    """
+    if os.path.exists(path):
+        raise FileExistsError(f'{path} already exists')
+    if templates is None:
+        templates = load_templates()
+    rng = random.Random(seed)
+    population = max(1, campaigns * contacts_per_campaign // CONTACT_REUSE)
+    start = time.perf_counter()
+    previous = use_database(path)
+    try:
+        conn = db.get_db_connection()
+        conn.execute('PRAGMA synchronous = OFF')
+        user_ids = [user_id_for(u) for u in range(users)]
+        conn.executemany(
+            'INSERT INTO users (id, email, name, picture, created_at) VALUES (?, ?, ?, ?, ?)',
+            [(user_id, f'user{u}@example.com', f'User {u}', None,
+              (END - timedelta(days=SPAN_DAYS + 30)).isoformat()) for u, user_id in enumerate(user_ids)]
+        )
+        conn.commit()
+
+        owner_weights = _skewed_cum_weights(users, USER_SKEW)
+        executed = []  # (campaign index, campaign id, created_at) of sent campaigns
+        stored_people = set()  # person ids already in the contacts table
+        for first in range(0, campaigns, CAMPAIGN_BATCH):
+            campaign_rows, contact_rows, person_rows, message_rows, tool_call_rows, analytics_rows = [], [], [], [], [], []
+            for k in range(first, min(first + CAMPAIGN_BATCH, campaigns)):
+                created_at = END - timedelta(seconds=SPAN_DAYS * 86400 * (campaigns - k) / campaigns)
+                campaign_id = campaign_id_for(created_at, k)
+                user_id = user_ids[rng.choices(range(users), cum_weights=owner_weights)[0]]
+                is_executed = rng.random() < EXECUTED_RATIO
+                person_ids = [campaign_person_id(k, position, contacts_per_campaign, population)
+                              for position in range(contacts_per_campaign)]
+                contacts = [person(person_id, templates) for person_id in person_ids]
+                for person_id, contact in zip(person_ids, contacts):
+                    if person_id not in stored_people:
+                        stored_people.add(person_id)
+                        person_rows.append((person_id + 1, *db._contact_identity(contact), contact.get('name'),
+                                            db.encode_json_column(contact), db._contact_hash(contact),
+                                            created_at.isoformat(), created_at.isoformat()))
+                campaign_rows.append((
+                    campaign_id, campaign_name_for(created_at), created_at.isoformat(), is_executed,
+                    round(0.01 * contacts_per_campaign, 2) if is_executed else None,
+                    'active' if is_executed else 'draft', user_id,
+                ))
+                contact_rows.extend(
+                    (campaign_id, position, db._normalize_email(contact.get('email')), contact.get('name'),
+                     *db._contact_page_fields(contact), person_id + 1, created_at.isoformat())
+                    for position, (person_id, contact) in enumerate(zip(person_ids, contacts))
+                )
+                topic = f"{contacts[0].get('title', 'leaders')} in {contacts[0].get('city', 'the Bay Area')}"
+                message_rows.extend(
+                    (campaign_id, seq, message['role'], db.encode_json_column(message), created_at.isoformat())
+                    for seq, message in enumerate(synthetic_messages(messages, topic))
+                )
+                tool_call_rows.extend(
+                    (campaign_id, seq, call['tool_name'], db.encode_json_column(call), created_at.isoformat())
+                    for seq, call in enumerate(synthetic_tool_calls(tool_calls, contacts))
+                )
+                if is_executed:
+                    executed.append((k, campaign_id, created_at))
+                    sent = contacts_per_campaign
+                    analytics_rows.append((campaign_id, sent, int(sent * rng.uniform(0.15, 0.6)),
+                                           round(rng.uniform(0.5, 5.0), 1), created_at.isoformat()))
+            conn.executemany('''
+                INSERT INTO campaigns (id, name, created_at, executed, cost, status, user_id)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            ''', campaign_rows)
+            conn.executemany('''
+                INSERT INTO contacts (id, apollo_id, email, linkedin_url, name, data, content_hash, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', person_rows)
+            conn.executemany('''
+                INSERT INTO campaign_contacts (campaign_id, position, email, name, organization, city, contact_id, added_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', contact_rows)
+            conn.executemany('''
+                INSERT INTO campaign_messages (campaign_id, seq, role, data, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', message_rows)
+            conn.executemany('''
+                INSERT INTO campaign_tool_calls (campaign_id, seq, tool_name, data, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', tool_call_rows)
+            conn.executemany('''
+                INSERT INTO analytics (campaign_id, emails_sent, emails_opened, bounce_rate, updated_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', analytics_rows)
+            conn.commit()
+            if log and (first // CAMPAIGN_BATCH) % 20 == 19:
+                log(f'  {first + CAMPAIGN_BATCH:,} campaigns')
+
+        if executed and responses:
+            # Shuffle so the busiest campaigns are spread over the year, not all the oldest
+            busiest = executed[:]
+            rng.shuffle(busiest)
+            reply_weights = _skewed_cum_weights(len(busiest), REPLY_SKEW)
+            for first in range(0, responses, RESPONSE_BATCH):
+                rows = []
+                for k, campaign_id, created_at in rng.choices(
+                        busiest, cum_weights=reply_weights, k=min(RESPONSE_BATCH, responses - first)):
+                    sender = person(campaign_person_id(k, rng.randrange(contacts_per_campaign),
+                                                       contacts_per_campaign, population), templates)
+                    received_at = created_at + timedelta(seconds=rng.randrange(14 * 86400))
+                    rows.append((campaign_id, sender['email'], rng.choice(_REPLIES), received_at.isoformat()))
+                conn.executemany('''
+                    INSERT INTO campaign_responses (campaign_id, email, response, received_at)
+                    VALUES (?, ?, ?, ?)
+                ''', rows)
+                conn.commit()
+                if log and (first // RESPONSE_BATCH) % 25 == 24:
+                    log(f'  {first + RESPONSE_BATCH:,} responses')
+            conn.execute('''
+                UPDATE analytics SET replies = r.n
+                FROM (SELECT campaign_id, COUNT(*) AS n FROM campaign_responses GROUP BY campaign_id) AS r
+                WHERE analytics.campaign_id = r.campaign_id
+            ''')
+            conn.commit()
+
+        conn.execute('ANALYZE')
+        conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+        conn.close()
+    finally:
+        restore_database(previous)
+
+    return {
+        'users': users,
+        'campaigns': campaigns,
+        'executed_campaigns': len(executed),
+        'responses': responses if executed else 0,
+        'unique_contacts': len(stored_people),
+        'contacts_per_campaign': contacts_per_campaign,
+        'messages_per_campaign': messages,
+        'tool_calls_per_campaign': tool_calls,
+        'seed': seed,
+        'seconds': round(time.perf_counter() - start, 1),
+        'db_bytes': os.path.getsize(path),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--output', required=True, help='database file to create')
+    parser.add_argument('--size', choices=sorted(SIZES), default='small', help='preset volumes')
+    parser.add_argument('--users', type=int, help='override the preset')
+    parser.add_argument('--campaigns', type=int, help='override the preset')
+    parser.add_argument('--responses', type=int, help='override the preset')
+    parser.add_argument('--contacts-per-campaign', type=int, default=25)
+    parser.add_argument('--messages', type=int, default=6, help='conversation turns per campaign')
+    parser.add_argument('--tool-calls', type=int, default=3, help='tool calls per campaign')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--template', default=TEMPLATE_PATH, help='exported campaigns whose contacts are copied')
+    args = parser.parse_args()
+
+    users, campaigns, responses = SIZES[args.size]
+    summary = generate(
+        args.output,
+        users=args.users or users,
+        campaigns=args.campaigns or campaigns,
+        responses=args.responses if args.responses is not None else responses,
+        contacts_per_campaign=args.contacts_per_campaign,
+        messages=args.messages,
+        tool_calls=args.tool_calls,
+        seed=args.seed,
+        templates=load_templates(args.template),
+    )
+    print(serializer.dumps(summary, indent=2))
+
+
+if __name__ == '__main__':
+    main()
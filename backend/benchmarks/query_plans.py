@@ -0,0 +1,162 @@
+"""
+Query-plan regression check for core/db.py.
+
+Exercises every public helper against a seeded scratch database, captures
+each SQL statement it issues (via the connection trace callback) and runs
+EXPLAIN QUERY PLAN on it. Exits non-zero if any statement falls back to a
+full table scan, so index regressions are caught before deploy.
+
+Usage:
+    python -m benchmarks.query_plans [-v]
+"""
+
+import os
+import re
+import sys
+import shutil
+import tempfile
+
+from benchmarks.common import db, use_database, restore_database, seed_users_and_campaigns
+from core import archive
+
+USER = 'user_0'
+CAMPAIGN = 'user_0_campaign_0'
+MESSAGES = [{'role': 'user' if i % 2 == 0 else 'assistant', 'content': f'Turn {i}'} for i in range(40)]
+TOOL_CALLS = [
+    {'tool_name': 'apollo_search_people', 'tool_args': {'query': 'HR'}, 'paid': True},
+    {'tool_name': 'gmail_tool', 'tool_args': {'action': 'send_to_list'}, 'paid': True},
+]
+CONTACTS = [{'name': f'Contact {i}', 'email': f'contact{i}@example.com'} for i in range(50)]
+
+# (label, callable) pairs covering every query in core/db.py and core/archive.py
+EXERCISES = [
+    ('create_user_if_not_exists', lambda: db.create_user_if_not_exists(
+        {'user_id': USER, 'email': f'{USER}@example.com', 'name': 'Renamed', 'picture': None})),
+    ('create_campaign', lambda: db.create_campaign(CAMPAIGN, 'Campaign 0', USER)),
+    ('get_all_campaigns', lambda: db.get_all_campaigns(USER)),
+    ('get_campaign_analytics', lambda: db.get_campaign_analytics(CAMPAIGN, USER)),
+    ('update_campaign', lambda: db.update_campaign(CAMPAIGN, USER, status='active', cost=1.0)),
+    ('create_or_update_analytics', lambda: db.create_or_update_analytics(CAMPAIGN, emails_sent=3)),
+    ('increment_analytics', lambda: db.increment_analytics(CAMPAIGN, replies=1)),
+    ('increment_analytics_batch', lambda: db.increment_analytics_batch(
+        [{'campaign_id': f'user_0_campaign_{i % 5}', 'emails_sent': 1} for i in range(50)])),
+    ('add_campaign_response', lambda: db.add_campaign_response(CAMPAIGN, 'a@example.com', 'yes')),
+    ('add_campaign_responses_batch', lambda: db.add_campaign_responses_batch(
+        [(CAMPAIGN, f'r{i}@example.com', 'yes', '2024-01-01T00:00:00') for i in range(20)])),
+    ('get_campaign_responses', lambda: db.get_campaign_responses(CAMPAIGN)),
+    ('get_campaign_responses_since', lambda: db.get_campaign_responses_since(CAMPAIGN, since_id=5, limit=10)),
+    ('save_campaign_contacts', lambda: db.save_campaign_contacts(CAMPAIGN, USER, CONTACTS)),
+    ('get_campaign_contacts', lambda: db.get_campaign_contacts(CAMPAIGN, limit=20, offset=20)),
+    ('get_campaign_contacts_page', lambda: db.get_campaign_contacts_page(CAMPAIGN, limit=10, offset=10)),
+    ('get_campaign_contacts_page(sort)', lambda: db.get_campaign_contacts_page(
+        CAMPAIGN, limit=10, offset=10, sort='organization', descending=True)),
+    ('get_campaign_contacts_page(sort, filters)', lambda: db.get_campaign_contacts_page(
+        CAMPAIGN, sort='city', filters={'name': 'contact 1', 'email': '%'})),
+    ('get_campaign_contact_by_email', lambda: db.get_campaign_contact_by_email(CAMPAIGN, 'contact7@example.com')),
+    ('count_campaign_contacts', lambda: db.count_campaign_contacts(CAMPAIGN)),
+    ('append_campaign_messages', lambda: db.append_campaign_messages(CAMPAIGN, USER, MESSAGES[:2])),
+    ('update_campaign(messages)', lambda: db.update_campaign(CAMPAIGN, USER, messages=MESSAGES)),
+    ('get_campaign_messages', lambda: db.get_campaign_messages(CAMPAIGN, last_n=10)),
+    ('get_campaign_analytics(messages_limit)', lambda: db.get_campaign_analytics(CAMPAIGN, USER, messages_limit=10)),
+    ('user_owns_campaign', lambda: db.user_owns_campaign(CAMPAIGN, USER)),
+    ('append_tool_calls', lambda: db.append_tool_calls(CAMPAIGN, TOOL_CALLS)),
+    ('get_tool_calls', lambda: db.get_tool_calls(CAMPAIGN)),
+    ('get_tool_calls(tool_name)', lambda: db.get_tool_calls(CAMPAIGN, tool_name='gmail_tool')),
+    ('set_pending_action', lambda: db.set_pending_action(CAMPAIGN, {'tool_name': 'gmail_tool', 'tool_args': {}})),
+    ('get_pending_action', lambda: db.get_pending_action(CAMPAIGN)),
+    ('claim_pending_action', lambda: db.claim_pending_action(CAMPAIGN)),
+    ('get_campaign_summaries', lambda: db.get_campaign_summaries(USER, limit=5)),
+    ('get_campaign_summaries(cursor, include)', lambda: db.get_campaign_summaries(
+        USER, limit=5, cursor=db.encode_campaign_cursor('9999', 'z'), include=list(db.CAMPAIGN_SUMMARY_INCLUDES))),
+    ('search_campaign_text', lambda: db.search_campaign_text(USER, 'turn interest*', limit=5)),
+    ('search_campaign_text(responses, offset)', lambda: db.search_campaign_text(USER, 'interested', types=['responses'], offset=5)),
+    ('archive.find_archive_candidates', lambda: archive.find_archive_candidates(older_than_days=0, statuses=['draft'])),
+    ('archive.archive_campaign', lambda: archive.archive_campaign('user_0_campaign_3')),
+    ('get_campaign_messages(archived)', lambda: db.get_campaign_messages('user_0_campaign_3')),
+    ('archive.archive_campaigns', lambda: archive.archive_campaigns(older_than_days=0, limit=2)),
+    ('delete_campaign(archived)', lambda: db.delete_campaign('user_0_campaign_4', USER)),
+    ('delete_campaign', lambda: db.delete_campaign('user_0_campaign_1', USER)),
+]
+
+# Statements with no query plan worth checking ('--' marks statements run
+# inside triggers and the FTS5 module, which are traced but cannot be EXPLAINed)
+_SKIP = re.compile(r'^\s*(--|(PRAGMA|BEGIN|COMMIT|ROLLBACK|SAVEPOINT|RELEASE|CREATE|ALTER|DROP)\b)', re.I)
+_VIRTUAL_INDEX = re.compile(r'VIRTUAL TABLE INDEX \d+:\S')
+_PLAIN_INSERT = re.compile(r'^\s*INSERT\b(?!.*\bSELECT\b)', re.I | re.S)
+
+
+def full_scans(conn, sql):
+    """Return the plan rows of sql that scan a whole table"""
+    plan = conn.execute(f'EXPLAIN QUERY PLAN {sql}').fetchall()
+    # 'SCAN (subquery-N)' walks an already-filtered co-routine, not a table, and
+    # 'SCAN t VIRTUAL TABLE INDEX n:<idxStr>' is a constrained FTS5 lookup (an
+    # empty idxStr would be a full scan)
+    return [
+        row[3] for row in plan
+        if row[3].startswith('SCAN ') and row[3] != 'SCAN CONSTANT ROW' and not row[3].startswith('SCAN (')
+        and not _VIRTUAL_INDEX.search(row[3])
+    ]
+
+
+def seed():
+    seed_users_and_campaigns(users=5, campaigns_per_user=20)
+    for c in range(20):
+        campaign_id = f'{USER}_campaign_{c}'
+        db.create_or_update_analytics(campaign_id, emails_sent=c)
+        db.add_campaign_response(campaign_id, f'reply{c}@example.com', 'Interested')
+        db.save_campaign_contacts(campaign_id, USER, CONTACTS)
+        db.append_campaign_messages(campaign_id, USER, MESSAGES[:30])
+        db.append_tool_calls(campaign_id, TOOL_CALLS * 5)
+    conn = db.get_db_connection()
+    conn.execute('ANALYZE')
+    conn.close()
+
+
+def check(verbose=False):
+    """Run every exercise and return a list of (label, sql, scans) failures"""
+    captured = []
+    conn = db.get_db_connection()
+    failures = []
+    for label, exercise in EXERCISES:
+        captured.clear()
+        conn.set_trace_callback(captured.append)
+        try:
+            exercise()
+        finally:
+            conn.set_trace_callback(None)
+
+        for sql in captured:
+            if _SKIP.match(sql) or _PLAIN_INSERT.match(sql):
+                continue
+            scans = full_scans(conn, sql)
+            if verbose:
+                print(f"[{label}] {' '.join(sql.split())[:100]}")
+            if scans:
+                failures.append((label, sql, scans))
+    conn.close()
+    return failures
+
+
+def main():
+    verbose = '-v' in sys.argv
+    workdir = tempfile.mkdtemp(prefix='arc_plans_')
+    previous = use_database(os.path.join(workdir, 'plans.db'))
+    try:
+        seed()
+        failures = check(verbose)
+    finally:
+        restore_database(previous)
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    if failures:
+        print(f"{len(failures)} statement(s) degrade to a full table scan:")
+        for label, sql, scans in failures:
+            print(f"\n[{label}] {' '.join(sql.split())}")
+            for detail in scans:
+                print(f"    {detail}")
+        sys.exit(1)
+    print(f"OK: no full table scans across {len(EXERCISES)} core/db.py helpers")
+
+
+if __name__ == '__main__':
+    main()
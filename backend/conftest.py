@@ -0,0 +1,21 @@
+"""
+pytest fixtures shared by the backend's tests (see core/testing.py).
+"""
+
+import pytest
+
+from core.testing import fresh_database
+
+
+@pytest.fixture
+def database():
+    """A new, migrated in-memory database for one test; yields its DB_PATH"""
+    with fresh_database() as path:
+        yield path
+
+
+@pytest.fixture
+def file_database():
+    """Like database, but a temporary file, for tests that write from several threads"""
+    with fresh_database(memory=False) as path:
+        yield path
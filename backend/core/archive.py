@@ -0,0 +1,348 @@
+"""
+Cold storage for finished campaigns.
+
+archive_campaigns() moves the heavy rows of old campaigns (contacts, messages,
+tool calls and customer responses) out of the hot database into a separate
+archive database, one compressed record per campaign, and leaves the
+campaigns row behind as a stub (archived_at is set). rehydrate_campaign()
+moves them back; core.db calls it automatically the first time anything
+reads or writes those rows again. After large moves the hot file is shrunk
+with incremental VACUUM. The shared `contacts` identity rows stay in the hot
+database (other campaigns may list the same people); the record keeps a full
+copy of each contact so it can be restored on its own. With sharding on,
+every shard archives into the same archive database.
+
+Run it periodically with `python -m core.archive` (from backend/) or set
+ARCHIVE_INTERVAL_HOURS to let the API server run it in the background.
+"""
+
+import argparse
+import os
+import zlib
+from datetime import datetime, timedelta
+
+from core import db, serializer
+
+# Defaults to <hot db name>_archive.db next to the hot database
+ARCHIVE_DB_PATH = os.getenv('ARCHIVE_DB_PATH')
+ARCHIVE_AFTER_DAYS = int(os.getenv('ARCHIVE_AFTER_DAYS', '90'))
+# Comma-separated statuses eligible for archiving; empty means any status
+ARCHIVE_STATUSES = tuple(s.strip() for s in os.getenv('ARCHIVE_STATUSES', '').split(',') if s.strip())
+ARCHIVE_BATCH_SIZE = int(os.getenv('ARCHIVE_BATCH_SIZE', '100'))
+ARCHIVE_INTERVAL_HOURS = float(os.getenv('ARCHIVE_INTERVAL_HOURS', '0'))
+# Free pages in the hot file that trigger an incremental VACUUM after a run
+ARCHIVE_VACUUM_MIN_FREE_PAGES = int(os.getenv('ARCHIVE_VACUUM_MIN_FREE_PAGES', '256'))
+
+
+class ArchiveRecordMissingError(RuntimeError):
+    """A campaign is marked archived but its record is not in the archive database"""
+
+
+def archive_path():
+    if ARCHIVE_DB_PATH:
+        return ARCHIVE_DB_PATH
+    return db.companion_db_path('_archive')
+
+
+_initialized_paths = set()
+
+
+def _archive_connection():
+    path = archive_path()
+    conn = db.get_db_connection(path)
+    if path not in _initialized_paths:
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS archived_campaigns (
+                campaign_id TEXT PRIMARY KEY,
+                user_id TEXT,
+                archived_at TEXT NOT NULL,
+                payload BLOB NOT NULL
+            )
+        ''')
+        conn.commit()
+        _initialized_paths.add(path)
+    return conn
+
+
+def _pack(payload):
+    return zlib.compress(serializer.dumpb(payload), 6)
+
+
+def _unpack(blob):
+    return serializer.loads(zlib.decompress(blob))
+
+
+def _read_record(campaign_id):
+    conn = _archive_connection()
+    try:
+        row = conn.execute('SELECT payload FROM archived_campaigns WHERE campaign_id = ?', (campaign_id,)).fetchone()
+        return _unpack(row['payload']) if row else None
+    finally:
+        conn.close()
+
+
+def _write_record(campaign_id, user_id, archived_at, payload):
+    conn = _archive_connection()
+    try:
+        conn.execute('''
+            INSERT OR REPLACE INTO archived_campaigns (campaign_id, user_id, archived_at, payload)
+            VALUES (?, ?, ?, ?)
+        ''', (campaign_id, user_id, archived_at, _pack(payload)))
+        conn.commit()
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def delete_archive_record(campaign_id):
+    conn = _archive_connection()
+    try:
+        conn.execute('DELETE FROM archived_campaigns WHERE campaign_id = ?', (campaign_id,))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def archive_campaign(campaign_id):
+    """
+    Move one campaign's heavy rows to the archive and leave a stub.
+
+    The archive record is committed before the hot rows are deleted, so a
+    crash in between leaves the data in both places, never in neither.
+    Returns False if the campaign does not exist or is already archived.
+    """
+    conn = db.get_db_connection(db.campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT user_id, archived_at FROM campaigns WHERE id = ?', (campaign_id,))
+        row = cursor.fetchone()
+        if not row or row['archived_at']:
+            return False
+        user_id = row['user_id']
+
+        cursor.execute('''
+            SELECT cc.position, cc.email, cc.name, ct.data, cc.added_at
+            FROM campaign_contacts cc JOIN contacts ct ON ct.id = cc.contact_id
+            WHERE cc.campaign_id = ? ORDER BY cc.position
+        ''', (campaign_id,))
+        contacts = [[r['position'], r['email'], r['name'], db.decode_json_text(r['data']), r['added_at']] for r in cursor.fetchall()]
+        cursor.execute('SELECT seq, role, data, created_at FROM campaign_messages WHERE campaign_id = ? ORDER BY seq', (campaign_id,))
+        messages = [[r['seq'], r['role'], db.decode_json_text(r['data']), r['created_at']] for r in cursor.fetchall()]
+        cursor.execute('SELECT seq, tool_name, data, created_at FROM campaign_tool_calls WHERE campaign_id = ? ORDER BY seq', (campaign_id,))
+        tool_calls = [[r['seq'], r['tool_name'], db.decode_json_text(r['data']), r['created_at']] for r in cursor.fetchall()]
+        cursor.execute('SELECT id, email, response, received_at FROM campaign_responses WHERE campaign_id = ? ORDER BY id', (campaign_id,))
+        responses = [[r['id'], r['email'], r['response'], r['received_at']] for r in cursor.fetchall()]
+
+        archived_at = datetime.now().isoformat()
+        _write_record(campaign_id, user_id, archived_at, {
+            'contacts': contacts,
+            'messages': messages,
+            'tool_calls': tool_calls,
+            'responses': responses,
+        })
+
+        # Contact JSON no other campaign uses leaves the hot database too; the record has its own copy
+        db._delete_unreferenced_contacts(cursor, db._unlink_campaign_contacts(cursor, campaign_id))
+        for table in ('campaign_messages', 'campaign_tool_calls', 'campaign_responses'):
+            cursor.execute(f'DELETE FROM {table} WHERE campaign_id = ?', (campaign_id,))
+        cursor.execute(
+            'UPDATE campaigns SET archived_at = ?, archived_contacts_count = ? WHERE id = ?',
+            (archived_at, len(contacts), campaign_id)
+        )
+        conn.commit()
+        db.invalidate_campaign_cache(campaign_id, user_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def rehydrate_campaign(campaign_id):
+    """Move an archived campaign's rows back into the hot tables; returns False if it was not archived"""
+    conn = db.get_db_connection(db.campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        cursor.execute('SELECT user_id, created_at, archived_at FROM campaigns WHERE id = ?', (campaign_id,))
+        row = cursor.fetchone()
+        if not row or not row['archived_at']:
+            return False
+        record = _read_record(campaign_id)
+        if record is None:
+            raise ArchiveRecordMissingError(f"Campaign {campaign_id} is archived but has no archive record in {archive_path()}")
+
+        # Records written before contacts carried added_at have four fields (same fallback as migration 10).
+        # Contacts share a contacts row again with identical copies saved by other campaigns.
+        now = datetime.now().isoformat()
+        contacts = [(position, email, name, serializer.loads(text), added_at[0] if added_at else row['created_at'])
+                    for position, email, name, text, *added_at in record['contacts']]
+        cursor.executemany('''
+            INSERT INTO campaign_contacts (campaign_id, position, email, name, organization, city, contact_id, added_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        ''', [(campaign_id, position, email, name, *db._contact_page_fields(contact),
+               db._upsert_contact(cursor, contact, now), added_at)
+              for position, email, name, contact, added_at in contacts])
+        cursor.executemany('''
+            INSERT INTO campaign_messages (campaign_id, seq, role, data, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(campaign_id, seq, role, db.encode_json_text(text), created_at) for seq, role, text, created_at in record['messages']])
+        cursor.executemany('''
+            INSERT INTO campaign_tool_calls (campaign_id, seq, tool_name, data, created_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(campaign_id, seq, tool_name, db.encode_json_text(text), created_at) for seq, tool_name, text, created_at in record['tool_calls']])
+        # Original ids are kept so id-based polling sees them as old replies
+        cursor.executemany('''
+            INSERT OR IGNORE INTO campaign_responses (id, campaign_id, email, response, received_at)
+            VALUES (?, ?, ?, ?, ?)
+        ''', [(response_id, campaign_id, email, response, received_at) for response_id, email, response, received_at in record['responses']])
+        cursor.execute(
+            'UPDATE campaigns SET archived_at = NULL, archived_contacts_count = NULL WHERE id = ?',
+            (campaign_id,)
+        )
+        conn.commit()
+        db.invalidate_campaign_cache(campaign_id, row['user_id'])
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+    # The hot copy is committed; a leftover record would only be overwritten by the next archive
+    delete_archive_record(campaign_id)
+    return True
+
+
+def find_archive_candidates(older_than_days=None, statuses=None, limit=ARCHIVE_BATCH_SIZE, after=None, path=None):
+    """
+    Hot campaigns created and last active (newest message or customer reply)
+    more than older_than_days ago, optionally restricted to statuses, oldest
+    first. after is the (created_at, id) of the last candidate of the
+    previous page. path picks a shard (DB_PATH by default).
+    """
+    older_than_days = ARCHIVE_AFTER_DAYS if older_than_days is None else older_than_days
+    statuses = ARCHIVE_STATUSES if statuses is None else tuple(statuses)
+    cutoff = (datetime.now() - timedelta(days=older_than_days)).isoformat()
+
+    where = ['c.archived_at IS NULL', 'c.created_at < ?']
+    params = [cutoff]
+    if after:
+        where.append('(c.created_at, c.id) > (?, ?)')
+        params.extend(after)
+    if statuses:
+        where.append(f"c.status IN ({', '.join('?' * len(statuses))})")
+        params.extend(statuses)
+    params.extend([cutoff, cutoff, limit])
+
+    conn = db.get_db_connection(path)
+    rows = conn.execute(f'''
+        SELECT c.id, c.created_at FROM campaigns c
+        WHERE {' AND '.join(where)}
+          AND COALESCE(
+              (SELECT created_at FROM campaign_messages WHERE campaign_id = c.id ORDER BY seq DESC LIMIT 1),
+              c.created_at
+          ) < ?
+          AND COALESCE(
+              (SELECT MAX(received_at) FROM campaign_responses WHERE campaign_id = c.id),
+              c.created_at
+          ) < ?
+        ORDER BY c.created_at, c.id
+        LIMIT ?
+    ''', params).fetchall()
+    conn.close()
+    return [(row['created_at'], row['id']) for row in rows]
+
+
+def enable_incremental_vacuum():
+    """
+    Switch an existing hot database (every shard) to auto_vacuum=INCREMENTAL.
+
+    Requires one full VACUUM (rewrites the file and takes the write lock for
+    its duration); databases created by init_db() already have it.
+    Returns True if the mode was changed.
+    """
+    return any([_enable_incremental_vacuum(path) for path in db.all_db_paths()])
+
+
+def _enable_incremental_vacuum(path):
+    conn = db.get_db_connection(path)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] == 2:
+            return False
+        conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        conn.execute('VACUUM')
+        return True
+    finally:
+        conn.close()
+
+
+def incremental_vacuum(min_free_pages=ARCHIVE_VACUUM_MIN_FREE_PAGES, path=None):
+    """Return free pages of DB_PATH (or the shard at path) to the filesystem if there are at least min_free_pages; returns pages released"""
+    conn = db.get_db_connection(path)
+    try:
+        if conn.execute('PRAGMA auto_vacuum').fetchone()[0] != 2:
+            return 0
+        free = conn.execute('PRAGMA freelist_count').fetchone()[0]
+        if free < min_free_pages:
+            return 0
+        # executescript steps the pragma to completion; execute() would free a single page
+        conn.executescript('PRAGMA incremental_vacuum;')
+        return free - conn.execute('PRAGMA freelist_count').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def archive_campaigns(older_than_days=None, statuses=None, limit=None, batch_size=ARCHIVE_BATCH_SIZE, vacuum=True):
+    """
+    Archive every eligible campaign (at most limit), then shrink the hot file
+    (each shard in turn when sharding is on). Returns {'archived': n, 'freedPages': pages}.
+    """
+    archived = 0
+    freed = 0
+    for path in db.all_db_paths():
+        archived_here = 0
+        after = None
+        while limit is None or archived < limit:
+            candidates = find_archive_candidates(older_than_days, statuses, batch_size, after, path)
+            if not candidates:
+                break
+            for created_at, campaign_id in candidates:
+                if limit is not None and archived >= limit:
+                    break
+                if archive_campaign(campaign_id):
+                    archived += 1
+                    archived_here += 1
+            after = candidates[-1]
+        if vacuum and archived_here:
+            freed += incremental_vacuum(path=path)
+    return {'archived': archived, 'freedPages': freed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Move old campaigns to cold storage')
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--status', action='append', help='Only archive campaigns with this status (repeatable)')
+    parser.add_argument('--limit', type=int, default=None)
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='One-time full VACUUM to switch an existing database to incremental auto_vacuum')
+    parser.add_argument('--rehydrate', metavar='CAMPAIGN_ID', help='Bring one campaign back instead of archiving')
+    args = parser.parse_args()
+
+    db.init_db()
+    if args.enable_incremental_vacuum and enable_incremental_vacuum():
+        print("Switched database to incremental auto_vacuum")
+    if args.rehydrate:
+        print(f"Rehydrated {args.rehydrate}" if rehydrate_campaign(args.rehydrate) else f"{args.rehydrate} is not archived")
+        return
+    result = archive_campaigns(args.older_than_days, args.status, args.limit)
+    print(f"Archived {result['archived']} campaigns, released {result['freedPages']} pages")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,108 @@
+"""
+Async data-access layer for the FastAPI endpoints.
+
+Every public core/db.py helper has an awaitable twin here with the same name
+and arguments. Calls run on a small dedicated thread pool, so a slow SQLite
+query blocks only its DB thread and never the event loop. Each DB thread keeps
+its own pooled connection (see core.db.get_db_connection).
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from core import db
+
+DB_ASYNC_WORKERS = int(os.getenv('DB_ASYNC_WORKERS', '4'))
+
+_executor = None
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=DB_ASYNC_WORKERS, thread_name_prefix='db')
+    return _executor
+
+
+async def run_in_db_thread(func, *args, **kwargs):
+    """Run a blocking DB callable on the DB thread pool and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_get_executor(), functools.partial(func, *args, **kwargs))
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Run a long blocking call that makes its own DB calls among slow external
+    ones (an agent run: tools, HTTP, the LLM) on the default executor, with
+    the caller's context variables. Neither the event loop nor a DB thread
+    waits on it.
+    """
+    return await asyncio.to_thread(func, *args, **kwargs)
+
+
+def shutdown():
+    """Stop the DB thread pool, waiting for queued calls to finish"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=True)
+        _executor = None
+
+
+def _make_async(func):
+    @functools.wraps(func)
+    async def wrapper(*args, **kwargs):
+        return await run_in_db_thread(func, *args, **kwargs)
+    return wrapper
+
+
+init_db = _make_async(db.init_db)
+recode_json_rows = _make_async(db.recode_json_rows)
+
+# Users
+create_user_if_not_exists = _make_async(db.create_user_if_not_exists)
+
+# Campaigns
+get_all_campaigns = _make_async(db.get_all_campaigns)
+get_campaign_summaries = _make_async(db.get_campaign_summaries)
+get_campaign_analytics = _make_async(db.get_campaign_analytics)
+user_owns_campaign = _make_async(db.user_owns_campaign)
+create_campaign = _make_async(db.create_campaign)
+update_campaign = _make_async(db.update_campaign)
+delete_campaign = _make_async(db.delete_campaign)
+
+# Analytics
+create_or_update_analytics = _make_async(db.create_or_update_analytics)
+increment_analytics = _make_async(db.increment_analytics)
+increment_analytics_batch = _make_async(db.increment_analytics_batch)
+
+# Responses
+add_campaign_response = _make_async(db.add_campaign_response)
+add_campaign_responses_batch = _make_async(db.add_campaign_responses_batch)
+get_campaign_responses = _make_async(db.get_campaign_responses)
+get_campaign_responses_since = _make_async(db.get_campaign_responses_since)
+
+# Contacts
+save_campaign_contacts = _make_async(db.save_campaign_contacts)
+get_campaign_contacts = _make_async(db.get_campaign_contacts)
+get_campaign_contacts_page = _make_async(db.get_campaign_contacts_page)
+get_campaign_contact_by_email = _make_async(db.get_campaign_contact_by_email)
+count_campaign_contacts = _make_async(db.count_campaign_contacts)
+
+# Conversation history
+append_campaign_messages = _make_async(db.append_campaign_messages)
+get_campaign_messages = _make_async(db.get_campaign_messages)
+
+# Tool call log
+append_tool_calls = _make_async(db.append_tool_calls)
+get_tool_calls = _make_async(db.get_tool_calls)
+
+# Pending paid action
+get_pending_action = _make_async(db.get_pending_action)
+claim_pending_action = _make_async(db.claim_pending_action)
+set_pending_action = _make_async(db.set_pending_action)
+
+# Full-text search
+search_campaign_text = _make_async(db.search_campaign_text)
+rebuild_search_index = _make_async(db.rebuild_search_index)
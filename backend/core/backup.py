@@ -0,0 +1,197 @@
+"""
+Online backups of the hot (and shard) and archive databases.
+
+backup_snapshot() copies the live database to BACKUP_DIR with the SQLite
+backup API while the server keeps running. The copy is taken
+BACKUP_PAGES_PER_STEP pages at a time with a BACKUP_STEP_SLEEP_MS pause after
+each step, so it never monopolizes the disk and request latency stays flat.
+The source connection holds one read transaction for the whole copy: in WAL
+mode that does not block writers, and it pins a single consistent snapshot
+(without it, every write by another connection would restart the backup from
+page 0, and under steady traffic a large file would never finish). The WAL
+cannot be checkpointed past that snapshot until the copy ends, so it grows
+by whatever is written in the meantime.
+
+Snapshots are written as <name>.partial and renamed once complete, so a
+crash never leaves a truncated file that looks like a backup. After each
+snapshot, rotate_snapshots() keeps the BACKUP_KEEP newest plus the newest of
+each of the last BACKUP_KEEP_DAILY days, and deletes the rest. To restore,
+stop the server and copy a snapshot over campaigns.db (and the archive
+snapshot taken with it over campaigns_archive.db), deleting any -wal/-shm
+files left next to them.
+
+Run it with `python -m core.backup` (from backend/) or set
+BACKUP_INTERVAL_HOURS to let the API server take snapshots in the background.
+"""
+
+import argparse
+import os
+import re
+import time
+from datetime import datetime, timedelta
+
+from core import archive, db
+
+# Defaults to backups/ next to the hot database
+BACKUP_DIR = os.getenv('BACKUP_DIR')
+BACKUP_PAGES_PER_STEP = int(os.getenv('BACKUP_PAGES_PER_STEP', '256'))
+BACKUP_STEP_SLEEP_MS = float(os.getenv('BACKUP_STEP_SLEEP_MS', '10'))
+BACKUP_KEEP = int(os.getenv('BACKUP_KEEP', '24'))
+BACKUP_KEEP_DAILY = int(os.getenv('BACKUP_KEEP_DAILY', '7'))
+BACKUP_INTERVAL_HOURS = float(os.getenv('BACKUP_INTERVAL_HOURS', '0'))
+
+# Microseconds keep two snapshots taken in the same second apart; names without
+# them (written before) are still listed and rotated
+_TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S%f'
+_LEGACY_TIMESTAMP_FORMAT = '%Y%m%dT%H%M%S'
+
+
+def backup_dir():
+    if BACKUP_DIR:
+        return BACKUP_DIR
+    if db.is_memory_path(db.DB_PATH):
+        raise ValueError('DB_PATH is an in-memory database; set BACKUP_DIR to back it up')
+    return os.path.join(os.path.dirname(os.path.abspath(db.DB_PATH)), 'backups')
+
+
+def _stem(path):
+    """File name of a database without its extension (the name of an in-memory database for URIs)"""
+    if path.startswith('file:'):
+        path = path[len('file:'):].partition('?')[0]
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _exists(path):
+    if db.is_memory_path(path):
+        return db._resolve_path(path) in db._memory_anchors
+    return os.path.exists(path.partition('?')[0].removeprefix('file:'))
+
+
+def backup_database(source_path, target_path, pages_per_step=BACKUP_PAGES_PER_STEP, step_sleep_ms=BACKUP_STEP_SLEEP_MS):
+    """
+    Copy the database at source_path to target_path, pages_per_step pages at a
+    time with a pause after each step. Returns the number of pages copied.
+    """
+    partial_path = target_path + '.partial'
+    if os.path.exists(partial_path):
+        os.remove(partial_path)
+    copied = 0
+
+    def progress(status, remaining, total):
+        nonlocal copied
+        copied = total
+        if remaining and step_sleep_ms > 0:
+            time.sleep(step_sleep_ms / 1000)
+
+    source = db._connect(source_path, isolation_level=None)
+    target = db._connect(partial_path)
+    try:
+        # Pin one snapshot for every step (see the module docstring)
+        source.execute('BEGIN')
+        source.execute('SELECT 1 FROM sqlite_master LIMIT 1').fetchall()
+        source.backup(target, pages=pages_per_step, progress=progress)
+        source.execute('COMMIT')
+    except BaseException:
+        target.close()
+        os.remove(partial_path)
+        raise
+    finally:
+        source.close()
+    # The copy keeps the source's journal mode; a snapshot is a single self-contained file
+    target.execute('PRAGMA journal_mode = DELETE')
+    target.close()
+    os.replace(partial_path, target_path)
+    return copied
+
+
+def list_snapshots(directory=None, stem=None):
+    """[(taken_at, path)] of the snapshots of one database (the hot one by default), newest first"""
+    directory = directory or backup_dir()
+    stem = stem or _stem(db.DB_PATH)
+    pattern = re.compile(rf'^{re.escape(stem)}-(\d{{8}}T\d{{6}}(?:\d{{6}})?)\.db$')
+    snapshots = []
+    if os.path.isdir(directory):
+        for name in os.listdir(directory):
+            match = pattern.match(name)
+            if match:
+                stamp = match.group(1)
+                taken_at = datetime.strptime(stamp, _TIMESTAMP_FORMAT if len(stamp) > 15 else _LEGACY_TIMESTAMP_FORMAT)
+                snapshots.append((taken_at, os.path.join(directory, name)))
+    snapshots.sort(reverse=True)
+    return snapshots
+
+
+def rotate_snapshots(directory=None, stem=None, keep=BACKUP_KEEP, keep_daily=BACKUP_KEEP_DAILY):
+    """
+    Delete snapshots of one database except the keep newest and the newest of
+    each of the last keep_daily days that have one. Returns the deleted paths.
+    """
+    snapshots = list_snapshots(directory, stem)
+    kept = {path for _, path in snapshots[:keep]}
+    days = set()
+    for taken_at, path in snapshots:
+        if len(days) >= keep_daily:
+            break
+        if taken_at.date() not in days:
+            days.add(taken_at.date())
+            kept.add(path)
+    deleted = []
+    for _, path in snapshots:
+        if path not in kept:
+            os.remove(path)
+            deleted.append(path)
+    return deleted
+
+
+def _snapshot_timestamp(directory, sources):
+    """Timestamp for a new set of snapshots, moved on a microsecond at a time until no name is taken"""
+    taken_at = datetime.now()
+    while any(os.path.exists(os.path.join(directory, f'{_stem(source)}-{taken_at.strftime(_TIMESTAMP_FORMAT)}.db'))
+              for source in sources):
+        taken_at += timedelta(microseconds=1)
+    return taken_at.strftime(_TIMESTAMP_FORMAT)
+
+
+def backup_snapshot(directory=None, rotate=True):
+    """
+    Snapshot the hot database, every shard when sharding is on and, if it
+    exists, the archive database, then rotate old snapshots.
+    Returns {'snapshots': [paths], 'pages': n, 'deleted': [paths]}.
+    """
+    directory = directory or backup_dir()
+    os.makedirs(directory, exist_ok=True)
+    sources = [db.DB_PATH] + [path for path in db.all_db_paths() if path != db.DB_PATH]
+    if _exists(archive.archive_path()):
+        sources.append(archive.archive_path())
+    taken_at = _snapshot_timestamp(directory, sources)
+
+    result = {'snapshots': [], 'pages': 0, 'deleted': []}
+    for source in sources:
+        target = os.path.join(directory, f'{_stem(source)}-{taken_at}.db')
+        result['pages'] += backup_database(source, target)
+        result['snapshots'].append(target)
+    if rotate:
+        for source in sources:
+            result['deleted'] += rotate_snapshots(directory, _stem(source))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Take an online snapshot of the campaign databases')
+    parser.add_argument('--dir', help='Snapshot directory (default: BACKUP_DIR or backups/ next to the database)')
+    parser.add_argument('--no-rotate', action='store_true', help='Keep every snapshot')
+    parser.add_argument('--list', action='store_true', help='List existing snapshots instead of taking one')
+    args = parser.parse_args()
+
+    if args.list:
+        for taken_at, path in list_snapshots(args.dir):
+            print(f"{taken_at.isoformat()}  {os.path.getsize(path):>14,} bytes  {path}")
+        return
+    start = time.perf_counter()
+    result = backup_snapshot(args.dir, rotate=not args.no_rotate)
+    print(f"Wrote {', '.join(result['snapshots'])} ({result['pages']} pages) "
+          f"in {time.perf_counter() - start:.1f}s; removed {len(result['deleted'])} old snapshots")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,630 @@
 import sqlite3
 import os
+import base64
+import glob
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 import random
+import re
+import zlib
 
-DB_PATH = os.path.join(os.path.dirname(__file__), '..', 'campaigns.db')
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
 
-def init_db():
-    """Initialize the database with schema and sample data"""
-    conn = sqlite3.connect(DB_PATH)
+from core import serializer
+from core.cache import TTLCache, MISSING
+
+# A file path, ':memory:' for an in-memory database shared by every connection
+# in the process (tests, throwaway runs), or an SQLite 'file:' URI
+DB_PATH = os.getenv('DB_PATH') or os.path.join(os.path.dirname(__file__), '..', 'campaigns.db')
+MEMORY_DB_PATH = ':memory:'
+
+# Connection mode: 'pooled' keeps one tuned connection open per thread,
+# 'per_call' opens and closes a fresh connection for every helper (legacy behaviour)
+DB_CONNECTION_MODE = os.getenv('DB_CONNECTION_MODE', 'pooled')
+
+# Pragmas applied to every pooled connection
+DB_BUSY_TIMEOUT_MS = int(os.getenv('DB_BUSY_TIMEOUT_MS', '5000'))
+DB_MMAP_SIZE = int(os.getenv('DB_MMAP_SIZE', str(256 * 1024 * 1024)))
+DB_CACHE_SIZE_KB = int(os.getenv('DB_CACHE_SIZE_KB', str(64 * 1024)))
+# Pooled connections each thread keeps open at most (one per database file;
+# only reached with many shards), least recently used closed first
+DB_MAX_THREAD_CONNECTIONS = int(os.getenv('DB_MAX_THREAD_CONNECTIONS', '64'))
+
+_local = threading.local()
+_open_connections = []
+_open_connections_lock = threading.Lock()
+
+
+class PooledConnection:
+    """
+    Proxy around a thread-local sqlite3 connection.
+
+    Behaves like the connection it wraps, except that close() only releases it
+    back to the thread (rolling back anything left uncommitted) so existing
+    `conn = get_db_connection(); ...; conn.close()` call sites keep working.
+    """
+
+    def __init__(self, conn):
+        self._conn = conn
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return self._conn.__exit__(exc_type, exc, tb)
+
+    def close(self):
+        """Release the connection without closing it"""
+        if self._conn.in_transaction:
+            self._conn.rollback()
+
+
+def _configure_connection(conn):
+    """Apply WAL mode and performance pragmas to a new connection"""
+    conn.execute(f'PRAGMA busy_timeout = {DB_BUSY_TIMEOUT_MS}')
+    # Only takes effect on a brand-new file (so it must precede the WAL switch);
+    # existing databases are converted by core.archive.enable_incremental_vacuum()
+    conn.execute('PRAGMA auto_vacuum = INCREMENTAL')
+    conn.execute('PRAGMA journal_mode = WAL')
+    conn.execute('PRAGMA synchronous = NORMAL')
+    conn.execute(f'PRAGMA mmap_size = {DB_MMAP_SIZE}')
+    conn.execute(f'PRAGMA cache_size = -{DB_CACHE_SIZE_KB}')
+    conn.execute('PRAGMA temp_store = MEMORY')
+    _register_functions(conn)
+
+
+def _register_functions(conn):
+    """SQL functions the queries in this module rely on"""
+    conn.create_function('json_text', 1, decode_json_text, deterministic=True)
+
+
+# In-memory databases live while any connection to them is open, so each gets
+# an idle anchor connection that outlives pool resets (close_all_connections).
+_memory_anchors = {}
+
+
+def memory_db_path(name):
+    """DB_PATH value of a named in-memory database shared by every connection in this process"""
+    return f'file:{name}?mode=memory&cache=shared'
+
+
+def is_memory_path(path):
+    return path == MEMORY_DB_PATH or (path.startswith('file:') and 'mode=memory' in path)
+
+
+def _resolve_path(path):
+    return memory_db_path('arc_wardens') if path == MEMORY_DB_PATH else path
+
+
+def _connect(path, **kwargs):
+    """sqlite3.connect() for a DB_PATH-style value: a file path, ':memory:' or a 'file:' URI"""
+    path = _resolve_path(path)
+    if is_memory_path(path):
+        with _open_connections_lock:
+            if path not in _memory_anchors:
+                _memory_anchors[path] = sqlite3.connect(path, uri=True, check_same_thread=False)
+    kwargs.setdefault('timeout', DB_BUSY_TIMEOUT_MS / 1000)
+    return sqlite3.connect(path, uri=path.startswith('file:'), **kwargs)
+
+
+def drop_memory_database(path):
+    """Free an in-memory database (after closing the connections to it); no-op for files"""
+    with _open_connections_lock:
+        anchor = _memory_anchors.pop(_resolve_path(path), None)
+    if anchor is not None:
+        anchor.close()
+
+
+def companion_db_path(suffix, path=None):
+    """
+    Location of a database kept next to DB_PATH (or path), e.g.
+    companion_db_path('_archive'): campaigns.db -> campaigns_archive.db. An
+    in-memory database gets an in-memory companion.
+    """
+    path = _resolve_path(path or DB_PATH)
+    if path.startswith('file:'):
+        location, _, query = path[len('file:'):].partition('?')
+        root, ext = os.path.splitext(location)
+        return f'file:{root}{suffix}{ext}' + (f'?{query}' if query else '')
+    root, ext = os.path.splitext(path)
+    return f'{root}{suffix}{ext or ".db"}'
+
+
+def _get_thread_connection(path):
+    """Return this thread's persistent connection for path, opening it on first use"""
+    connections = getattr(_local, 'connections', None)
+    if connections is None:
+        connections = _local.connections = OrderedDict()
+
+    conn = connections.get(path)
+    if conn is None:
+        conn = _connect(path)
+        conn.row_factory = sqlite3.Row
+        _configure_connection(conn)
+        connections[path] = conn
+        with _open_connections_lock:
+            _open_connections.append(conn)
+        if len(connections) > DB_MAX_THREAD_CONNECTIONS:
+            _, evicted = connections.popitem(last=False)
+            with _open_connections_lock:
+                _open_connections.remove(evicted)
+            evicted.close()
+    else:
+        connections.move_to_end(path)
+    return conn
+
+
+def close_all_connections():
+    """Close every pooled connection (call on shutdown or after changing DB_PATH)"""
+    with _open_connections_lock:
+        conns = list(_open_connections)
+        _open_connections.clear()
+    for conn in conns:
+        try:
+            conn.close()
+        except sqlite3.ProgrammingError:
+            # Connection owned by another thread; it is released when that thread exits
+            pass
+    if getattr(_local, 'connections', None):
+        _local.connections.clear()
+    _migrated_paths.clear()
+    _campaign_owner_cache.clear()
+
+# =============================================================================
+# Sharding
+# =============================================================================
+
+# Optional write scaling. DB_SHARDS=N spreads users over N database files next
+# to DB_PATH (campaigns_shard00.db, ...) by a hash of the user id;
+# DB_SHARDS=tenant gives every user a file of their own
+# (campaigns_tenant_<user_id>.db). Each shard has the full schema and all of
+# its users' rows, so writes of users on different shards never wait on the
+# same lock. DB_PATH then only serves as the catalog: campaign_directory maps
+# each campaign to its owner for the helpers that get just a campaign id.
+# Unset or 0 keeps everything in DB_PATH.
+DB_SHARDS = os.getenv('DB_SHARDS', '0')
+TENANT_SHARDS = 'tenant'
+# Threads that run a cross-shard query against several shards at once
+DB_SHARD_FANOUT_WORKERS = int(os.getenv('DB_SHARD_FANOUT_WORKERS', '8'))
+
+# campaign id -> owner user id; a campaign never changes owner, so entries only
+# go when the campaign is deleted
+_campaign_owner_cache = TTLCache(int(os.getenv('CAMPAIGN_OWNER_CACHE_SIZE', '100000')), 24 * 3600)
+# Databases brought up to SCHEMA_VERSION by this process
+_migrated_paths = set()
+_fan_out_executor = None
+
+
+def sharding_enabled():
+    return DB_SHARDS == TENANT_SHARDS or int(DB_SHARDS) > 0
+
+
+def _tenant_suffix(user_id):
+    if re.fullmatch(r'[A-Za-z0-9_-]{1,64}', user_id):
+        return f'_tenant_{user_id}'
+    return f'_tenant_{hashlib.sha1(user_id.encode("utf-8")).hexdigest()}'
+
+
+def _shard_path(index):
+    return companion_db_path(f'_shard{index:02d}')
+
+
+def user_db_path(user_id):
+    """Database holding user_id's rows: their shard, or DB_PATH when sharding is off"""
+    if DB_SHARDS == TENANT_SHARDS:
+        path = companion_db_path(_tenant_suffix(str(user_id)))
+    elif int(DB_SHARDS) > 0:
+        path = _shard_path(zlib.crc32(str(user_id).encode('utf-8')) % int(DB_SHARDS))
+    else:
+        return DB_PATH
+    if path not in _migrated_paths:
+        _migrate(path)
+    return path
+
+
+def campaign_db_path(campaign_id):
+    """
+    Database holding campaign_id's rows. With sharding on, the owner comes from
+    the catalog (cached); unknown campaigns resolve to DB_PATH, where reads
+    find nothing as they would without sharding.
+    """
+    if not sharding_enabled():
+        return DB_PATH
+    owner = _campaign_owner_cache.get(campaign_id)
+    if owner is MISSING:
+        conn = get_db_connection(DB_PATH)
+        row = conn.execute('SELECT user_id FROM campaign_directory WHERE campaign_id = ?', (campaign_id,)).fetchone()
+        conn.close()
+        if row is None:
+            return DB_PATH
+        owner = row['user_id']
+        _campaign_owner_cache.put(campaign_id, owner, [('campaign', campaign_id)])
+    return user_db_path(owner)
+
+
+def _register_campaign(campaign_id, user_id):
+    """Record a new campaign's owner in the catalog; returns the owner on record (user_id without sharding)"""
+    if not sharding_enabled():
+        return user_id
+    conn = get_db_connection(DB_PATH)
+    try:
+        cursor = conn.execute('INSERT OR IGNORE INTO campaign_directory (campaign_id, user_id) VALUES (?, ?)',
+                              (campaign_id, user_id))
+        conn.commit()
+        if cursor.rowcount:
+            return user_id
+        return conn.execute('SELECT user_id FROM campaign_directory WHERE campaign_id = ?',
+                            (campaign_id,)).fetchone()['user_id']
+    finally:
+        conn.close()
+
+
+def _unregister_campaign(campaign_id):
+    if not sharding_enabled():
+        return
+    conn = get_db_connection(DB_PATH)
+    try:
+        conn.execute('DELETE FROM campaign_directory WHERE campaign_id = ?', (campaign_id,))
+        conn.commit()
+    finally:
+        conn.close()
+    _campaign_owner_cache.invalidate(('campaign', campaign_id))
+
+
+def all_db_paths():
+    """Every database holding user rows: each shard, or just DB_PATH when sharding is off"""
+    if DB_SHARDS == TENANT_SHARDS:
+        pattern = companion_db_path('_tenant_*')
+        if is_memory_path(pattern):
+            prefix = pattern.partition('*')[0]
+            with _open_connections_lock:
+                return sorted(path for path in _memory_anchors if path.startswith(prefix))
+        return sorted(glob.glob(pattern))
+    if int(DB_SHARDS) > 0:
+        return [_shard_path(index) for index in range(int(DB_SHARDS))]
+    return [DB_PATH]
+
+
+def fan_out(fn, *args, **kwargs):
+    """
+    Run fn(path, *args, **kwargs) against every database in all_db_paths(),
+    up to DB_SHARD_FANOUT_WORKERS at a time, and return the results in that
+    order. fn opens its own connection with get_db_connection(path).
+    """
+    global _fan_out_executor
+    paths = all_db_paths()
+    if len(paths) <= 1 or DB_SHARD_FANOUT_WORKERS <= 1:
+        return [fn(path, *args, **kwargs) for path in paths]
+    with _open_connections_lock:
+        if _fan_out_executor is None:
+            # Long-lived threads, so their pooled connections are reused across calls
+            _fan_out_executor = ThreadPoolExecutor(max_workers=DB_SHARD_FANOUT_WORKERS, thread_name_prefix='db-shard')
+    return list(_fan_out_executor.map(lambda path: fn(path, *args, **kwargs), paths))
+
+# =============================================================================
+# Unit of work
+# =============================================================================
+
+class UnitOfWorkConnection(PooledConnection):
+    """
+    The connection handed to helpers called with a unit of work. commit(),
+    rollback() and close() are left to the unit of work, and an explicit
+    BEGIN is skipped when its transaction is already open.
+    """
+
+    def execute(self, sql, *args):
+        if self._conn.in_transaction and sql.lstrip()[:5].upper() == 'BEGIN':
+            return self._conn.cursor()
+        return self._conn.execute(sql, *args)
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def commit(self):
+        pass
+
+    def rollback(self):
+        pass
+
+    def close(self):
+        pass
+
+
+class UnitOfWork:
+    """
+    One connection and one write transaction shared by several helpers.
+
+    Pass it as uow= to the helpers that accept one. Reads run on its
+    connection straight away; the first write opens a BEGIN IMMEDIATE
+    transaction that lasts until commit(), so do slow work (tool calls, HTTP)
+    before writing. Cache invalidations are held back until the commit.
+    Used as a context manager it commits on success and rolls back on error.
+    The connection may be used from any thread, but by one at a time.
+    """
+
+    def __init__(self, path=None, user_id=None):
+        # With sharding on, pass user_id to work on that user's shard
+        if path is None and user_id is not None:
+            path = user_db_path(user_id)
+        conn = _connect(path or DB_PATH, isolation_level='IMMEDIATE', check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        _configure_connection(conn)
+        self._conn = conn
+        self.connection = UnitOfWorkConnection(conn)
+        self._campaign_ids = set()
+        self._user_ids = set()
+
+    def invalidate_on_commit(self, campaign_ids=(), user_id=None):
+        if isinstance(campaign_ids, str):
+            campaign_ids = (campaign_ids,)
+        self._campaign_ids.update(campaign_ids)
+        if user_id is not None:
+            self._user_ids.add(user_id)
+
+    def commit(self):
+        """Commit everything written so far, then drop the affected cached reads"""
+        self._conn.commit()
+        invalidate_campaign_cache(self._campaign_ids)
+        for user_id in self._user_ids:
+            invalidate_campaign_cache(user_id=user_id)
+        self._campaign_ids.clear()
+        self._user_ids.clear()
+
+    def rollback(self):
+        self._conn.rollback()
+        self._campaign_ids.clear()
+        self._user_ids.clear()
+
+    def close(self):
+        """Roll back anything uncommitted and close the connection"""
+        if self._conn.in_transaction:
+            self.rollback()
+        self._conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            if exc_type is None:
+                self.commit()
+        finally:
+            self.close()
+        return False
+
+
+def _connection_for(uow, path=None):
+    """The unit of work's connection if one is given, else this thread's own (to path)"""
+    return uow.connection if uow is not None else get_db_connection(path)
+
+
+def _invalidate_after_commit(uow, campaign_ids=(), user_id=None):
+    if uow is not None:
+        uow.invalidate_on_commit(campaign_ids, user_id)
+    else:
+        invalidate_campaign_cache(campaign_ids, user_id)
+
+# =============================================================================
+# Campaign read cache
+# =============================================================================
+
+# Campaign reads (detail and list pages) are cached per user for a short TTL.
+# Every helper that changes what they return invalidates the affected entries
+# after committing; the TTL only bounds staleness across worker processes.
+CAMPAIGN_CACHE_SIZE = int(os.getenv('CAMPAIGN_CACHE_SIZE', '1024'))
+CAMPAIGN_CACHE_TTL_SECONDS = float(os.getenv('CAMPAIGN_CACHE_TTL_SECONDS', '30'))
+
+_campaign_cache = TTLCache(CAMPAIGN_CACHE_SIZE, CAMPAIGN_CACHE_TTL_SECONDS)
+
+
+def _cached_campaign_read(key, fetch, tags):
+    """Return the cached result for key, or fetch() it and cache it under tags(result)"""
+    if not _campaign_cache.enabled:
+        return fetch()
+    value = _campaign_cache.get(key)
+    if value is not MISSING:
+        return value
+    generation = _campaign_cache.generation()
+    value = fetch()
+    _campaign_cache.put(key, value, tags(value), generation)
+    return value
+
+
+def invalidate_campaign_cache(campaign_ids=(), user_id=None):
+    """
+    Drop cached reads of the given campaigns (and any list page containing
+    them), plus every cached read of user_id when its campaign set changed.
+    """
+    if isinstance(campaign_ids, str):
+        campaign_ids = (campaign_ids,)
+    tags = [('campaign', campaign_id) for campaign_id in campaign_ids]
+    if user_id is not None:
+        tags.append(('user', user_id))
+    if tags:
+        _campaign_cache.invalidate(*tags)
+
+
+def clear_campaign_cache():
+    _campaign_cache.clear()
+
+
+def campaign_cache_stats():
+    """Hit/miss/eviction counters of the campaign read cache"""
+    return _campaign_cache.stats()
+
+
+def _campaign_list_tags(user_id, campaigns):
+    return [('user', user_id)] + [('campaign', campaign['id']) for campaign in campaigns]
+
+# =============================================================================
+# Archived campaigns
+# =============================================================================
+
+def _rehydrate_if_archived(campaign_id):
+    """
+    Bring an archived campaign's rows back before they are read or written
+    (see core.archive). Costs one primary-key lookup for hot campaigns. Must
+    be called before the caller opens its own transaction.
+    """
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    row = conn.execute('SELECT archived_at FROM campaigns WHERE id = ?', (campaign_id,)).fetchone()
+    conn.close()
+    if row and row['archived_at']:
+        from core.archive import rehydrate_campaign
+        rehydrate_campaign(campaign_id)
+
+# =============================================================================
+# JSON column codec
+# =============================================================================
+
+# Opt-in compression of the per-row JSON in contacts, campaign_messages and
+# campaign_tool_calls ('none', 'zlib' or 'zstd'). Plain JSON is stored as
+# TEXT; compressed JSON is a BLOB whose first byte names the codec, so both
+# forms coexist in a column and changing the setting needs no rewrite.
+# recode_json_rows() converts existing rows in the background.
+DB_JSON_COMPRESSION = os.getenv('DB_JSON_COMPRESSION', 'none')
+DB_JSON_COMPRESSION_MIN_BYTES = int(os.getenv('DB_JSON_COMPRESSION_MIN_BYTES', '256'))
+DB_JSON_COMPRESSION_LEVEL = int(os.getenv('DB_JSON_COMPRESSION_LEVEL', '6'))
+
+_CODEC_MARKERS = {'zlib': 1, 'zstd': 2}
+
+# Tables whose `data` column goes through the codec
+JSON_DATA_TABLES = ('contacts', 'campaign_messages', 'campaign_tool_calls')
+
+# The stored JSON text of a data column, decompressed inside SQLite when needed
+_JSON_TEXT_SQL = "CASE WHEN typeof(data) = 'blob' THEN json_text(data) ELSE data END"
+
+
+def _compress(text, codec):
+    raw = text.encode('utf-8')
+    if codec == 'zlib':
+        body = zlib.compress(raw, DB_JSON_COMPRESSION_LEVEL)
+    elif codec == 'zstd':
+        if zstandard is None:
+            raise RuntimeError("DB_JSON_COMPRESSION=zstd requires the 'zstandard' package")
+        body = zstandard.ZstdCompressor(level=DB_JSON_COMPRESSION_LEVEL).compress(raw)
+    else:
+        raise ValueError(f"Unknown DB_JSON_COMPRESSION codec '{codec}'")
+    return bytes([_CODEC_MARKERS[codec]]) + body
+
+
+def encode_json_text(text, codec=None):
+    """Store-ready form of a JSON string: compressed BLOB if enabled and worth it, else the text"""
+    codec = codec or DB_JSON_COMPRESSION
+    if codec == 'none' or len(text) < DB_JSON_COMPRESSION_MIN_BYTES:
+        return text
+    packed = _compress(text, codec)
+    return packed if len(packed) < len(text) else text
+
+
+def encode_json_column(value):
+    return encode_json_text(serializer.dumps(value))
+
+
+def decode_json_text(data):
+    """JSON text of a stored data value, whichever form it was written in"""
+    if data is None or isinstance(data, str):
+        return data
+    marker, body = data[0], bytes(data[1:])
+    if marker == _CODEC_MARKERS['zlib']:
+        return zlib.decompress(body).decode('utf-8')
+    if marker == _CODEC_MARKERS['zstd']:
+        if zstandard is None:
+            raise RuntimeError("Row is zstd-compressed but the 'zstandard' package is not installed")
+        return zstandard.ZstdDecompressor().decompress(body).decode('utf-8')
+    raise ValueError(f"Unknown JSON column codec marker {marker}")
+
+
+def decode_json_column(data):
+    return serializer.loads(decode_json_text(data))
+
+
+def _needs_recode(data, codec):
+    if isinstance(data, str):
+        return codec != 'none' and len(data) >= DB_JSON_COMPRESSION_MIN_BYTES
+    return codec == 'none' or data[0] != _CODEC_MARKERS[codec]
+
+
+def recode_json_rows(table, after_id=0, batch_size=500, path=None):
+    """
+    Re-encode one batch of a JSON_DATA_TABLES table with the current codec.
+
+    Walks the table (in DB_PATH, or the shard at path) in id order starting
+    after after_id; returns (last_id_seen, rows_rewritten), with last_id_seen
+    None once the end is reached.
+    """
+    if table not in JSON_DATA_TABLES:
+        raise ValueError(f"{table} has no codec-managed data column")
+    codec = DB_JSON_COMPRESSION
+    conn = get_db_connection(path)
     cursor = conn.cursor()
     
-    # Create campaigns table
+    try:
+        cursor.execute(f'SELECT id, data FROM {table} WHERE id > ? ORDER BY id LIMIT ?', (after_id, batch_size))
+        rows = cursor.fetchall()
+        updates = []
+        for row in rows:
+            if _needs_recode(row['data'], codec):
+                text = decode_json_text(row['data'])
+                new_data = encode_json_text(text, codec) if codec != 'none' else text
+                if new_data != row['data']:
+                    updates.append((new_data, row['id'], row['data']))
+        # Guard on the old value so a concurrent rewrite of the row wins
+        cursor.executemany(f'UPDATE {table} SET data = ? WHERE id = ? AND data = ?', updates)
+        conn.commit()
+        return (rows[-1]['id'] if len(rows) == batch_size else None), len(updates)
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def recode_all_json_rows(batch_size=500, pause_seconds=0.0):
+    """Lazily bring every codec-managed row (on every shard) to the current DB_JSON_COMPRESSION; returns rows rewritten"""
+    return sum(fan_out(_recode_all_json_rows, batch_size, pause_seconds))
+
+
+def _recode_all_json_rows(path, batch_size, pause_seconds):
+    total = 0
+    for table in JSON_DATA_TABLES:
+        after_id = 0
+        while after_id is not None:
+            after_id, changed = recode_json_rows(table, after_id, batch_size, path)
+            total += changed
+            if pause_seconds:
+                time.sleep(pause_seconds)
+    return total
+
+# =============================================================================
+# Schema migrations
+# =============================================================================
+
+def _column_names(cursor, table):
+    """Return the set of column names on table"""
+    cursor.execute(f'PRAGMA table_info({table})')
+    return {row[1] for row in cursor.fetchall()}
+
+
+def _add_column_if_missing(cursor, table, column, definition):
+    """ALTER TABLE ... ADD COLUMN unless the column already exists"""
+    if column not in _column_names(cursor, table):
+        cursor.execute(f'ALTER TABLE {table} ADD COLUMN {column} {definition}')
+
+
+def _migration_001_base_schema(cursor):
+    """Base tables; also brings pre-migration databases up to the same shape"""
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS campaigns (
             id TEXT PRIMARY KEY,
@@ -23,13 +637,12 @@ def init_db():
     ''')
     
     # Migrate old 'paid' column to 'executed' if it exists
-    try:
+    columns = _column_names(cursor, 'campaigns')
+    if 'executed' not in columns:
         cursor.execute('ALTER TABLE campaigns ADD COLUMN executed BOOLEAN DEFAULT 0')
-        cursor.execute('UPDATE campaigns SET executed = paid WHERE paid IS NOT NULL')
-    except sqlite3.OperationalError:
-        pass
-
-    # Create users table
+        if 'paid' in columns:
+            cursor.execute('UPDATE campaigns SET executed = paid WHERE paid IS NOT NULL')
+    
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS users (
             id TEXT PRIMARY KEY,
@@ -39,44 +652,19 @@ def init_db():
             created_at TEXT NOT NULL
         )
     ''')
-
-    # Add user_id column to campaigns if not exists
-    try:
-        cursor.execute('ALTER TABLE campaigns ADD COLUMN user_id TEXT')
-    except sqlite3.OperationalError:
-        pass
-    
-    # Add contacts column to campaigns if not exists
-    try:
-        cursor.execute('ALTER TABLE campaigns ADD COLUMN contacts TEXT')
-    except sqlite3.OperationalError:
-        pass
-    
-    # Add tool_calls column to campaigns for workflow state
-    try:
-        cursor.execute('ALTER TABLE campaigns ADD COLUMN tool_calls TEXT')
-    except sqlite3.OperationalError:
-        pass
-    
-    # Add messages column to campaigns for conversation history
-    try:
-        cursor.execute('ALTER TABLE campaigns ADD COLUMN messages TEXT')
-    except sqlite3.OperationalError:
-        pass
-    
-    # Add pending_cost column to campaigns for payment state
-    try:
-        cursor.execute('ALTER TABLE campaigns ADD COLUMN pending_cost REAL DEFAULT 0')
-    except sqlite3.OperationalError:
-        pass
     
-    # Add pending_action column to campaigns for pre-payment tool execution
-    try:
-        cursor.execute('ALTER TABLE campaigns ADD COLUMN pending_action TEXT')
-    except sqlite3.OperationalError:
-        pass
+    _add_column_if_missing(cursor, 'campaigns', 'user_id', 'TEXT')
+    # Filtered contacts
+    _add_column_if_missing(cursor, 'campaigns', 'contacts', 'TEXT')
+    # Workflow state
+    _add_column_if_missing(cursor, 'campaigns', 'tool_calls', 'TEXT')
+    # Conversation history
+    _add_column_if_missing(cursor, 'campaigns', 'messages', 'TEXT')
+    # Payment state
+    _add_column_if_missing(cursor, 'campaigns', 'pending_cost', 'REAL DEFAULT 0')
+    # Pre-payment tool execution
+    _add_column_if_missing(cursor, 'campaigns', 'pending_action', 'TEXT')
     
-    # Create analytics table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS analytics (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -90,7 +678,6 @@ def init_db():
         )
     ''')
     
-    # Create responses table
     cursor.execute('''
         CREATE TABLE IF NOT EXISTS campaign_responses (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -101,136 +688,1547 @@ def init_db():
             FOREIGN KEY (campaign_id) REFERENCES campaigns(id)
         )
     ''')
+
+
+def _migration_002_hot_query_indexes(cursor):
+    """Indexes for the campaign list, analytics join and response listing"""
+    # Campaign list: WHERE user_id = ? ORDER BY created_at DESC
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_campaigns_user_created ON campaigns(user_id, created_at)')
+    
+    # One analytics row per campaign (the LEFT JOIN in get_all_campaigns relies on it).
+    # Collapse any duplicates left by the old SELECT-then-INSERT path before enforcing it.
+    cursor.execute('''
+        DELETE FROM analytics
+        WHERE id NOT IN (SELECT MAX(id) FROM analytics GROUP BY campaign_id)
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_analytics_campaign ON analytics(campaign_id)')
+    
+    # Responses per campaign, newest first
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_responses_campaign_received ON campaign_responses(campaign_id, received_at)')
+
+
+def _migration_003_campaign_contacts(cursor):
+    """One row per filtered contact instead of a JSON blob on campaigns.contacts"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS campaign_contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            campaign_id TEXT NOT NULL,
+            position INTEGER NOT NULL,
+            email TEXT,
+            name TEXT,
+            data TEXT NOT NULL,
+            FOREIGN KEY (campaign_id) REFERENCES campaigns(id)
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_contacts_campaign_position ON campaign_contacts(campaign_id, position)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_campaign_email ON campaign_contacts(campaign_id, email)')
+    
+    # Move existing blobs into rows and drop them from the hot table
+    cursor.execute("SELECT id, contacts FROM campaigns WHERE contacts IS NOT NULL AND contacts != ''")
+    for campaign_id, contacts in cursor.fetchall():
+        _replace_campaign_contacts_v3(cursor, campaign_id, contacts)
+    cursor.execute('UPDATE campaigns SET contacts = NULL WHERE contacts IS NOT NULL')
+
+
+# Migrations call frozen copies of the helpers they shipped with, so every
+# database runs a step the same way however the live helpers change later.
+
+def _replace_campaign_contacts_v3(cursor, campaign_id, contacts):
+    """_replace_campaign_contacts as migration 3 shipped with it (rows with their own JSON)"""
+    rows = [
+        (campaign_id, position, _normalize_email(contact.get('email')), contact.get('name'), serializer.dumps(contact))
+        for position, contact in enumerate(_parse_contacts(contacts))
+        if isinstance(contact, dict)
+    ]
+    cursor.execute('DELETE FROM campaign_contacts WHERE campaign_id = ?', (campaign_id,))
+    cursor.executemany('''
+        INSERT INTO campaign_contacts (campaign_id, position, email, name, data)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    return len(rows)
+
+
+def _migration_004_campaign_messages(cursor):
+    """Append-only conversation turns instead of rewriting campaigns.messages"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS campaign_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            campaign_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            role TEXT,
+            data TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (campaign_id) REFERENCES campaigns(id)
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_campaign_seq ON campaign_messages(campaign_id, seq)')
+    
+    cursor.execute("SELECT id, messages FROM campaigns WHERE messages IS NOT NULL AND messages != ''")
+    for campaign_id, messages in cursor.fetchall():
+        try:
+            messages = serializer.loads(messages)
+        except serializer.JSONDecodeError:
+            continue
+        if isinstance(messages, list):
+            _append_campaign_messages(cursor, campaign_id, messages)
+    cursor.execute('UPDATE campaigns SET messages = NULL WHERE messages IS NOT NULL')
+
+
+def _migration_005_campaign_tool_calls(cursor):
+    """Append-only tool call log instead of a read-modify-write JSON array"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS campaign_tool_calls (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            campaign_id TEXT NOT NULL,
+            seq INTEGER NOT NULL,
+            tool_name TEXT NOT NULL,
+            data TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            FOREIGN KEY (campaign_id) REFERENCES campaigns(id)
+        )
+    ''')
+    cursor.execute('CREATE UNIQUE INDEX IF NOT EXISTS idx_tool_calls_campaign_seq ON campaign_tool_calls(campaign_id, seq)')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_tool_calls_campaign_tool ON campaign_tool_calls(campaign_id, tool_name, seq)')
     
-    conn.commit()
+    cursor.execute("SELECT id, tool_calls FROM campaigns WHERE tool_calls IS NOT NULL AND tool_calls != ''")
+    for campaign_id, tool_calls in cursor.fetchall():
+        try:
+            tool_calls = serializer.loads(tool_calls)
+        except serializer.JSONDecodeError:
+            continue
+        if isinstance(tool_calls, list):
+            _append_tool_calls(cursor, campaign_id, tool_calls)
+    cursor.execute('UPDATE campaigns SET tool_calls = NULL WHERE tool_calls IS NOT NULL')
+
+
+def _migration_006_campaign_keyset_index(cursor):
+    """(user_id, created_at, id) so keyset pages over the campaign list are index range scans"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_campaigns_user_created_id ON campaigns(user_id, created_at, id)')
+    cursor.execute('DROP INDEX IF EXISTS idx_campaigns_user_created')
+
+
+def _migration_007_campaign_archive_stub(cursor):
+    """Stub columns for campaigns whose heavy rows were moved to the archive database"""
+    _add_column_if_missing(cursor, 'campaigns', 'archived_at', 'TEXT')
+    _add_column_if_missing(cursor, 'campaigns', 'archived_contacts_count', 'INTEGER')
+    # Archive candidates: still-hot campaigns by age
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_campaigns_archived_created ON campaigns(archived_at, created_at)')
+
+
+def _migration_008_responses_campaign_id_index(cursor):
+    """(campaign_id, id) so polling for replies newer than a known id reads only the new rows"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_responses_campaign_id ON campaign_responses(campaign_id, id)')
+
+
+def _migration_009_full_text_search(cursor):
+    """FTS5 indexes over customer responses and conversation turns, kept in sync by triggers"""
+    for statement in _SEARCH_SCHEMA:
+        cursor.execute(statement)
+    _populate_search_index(cursor)
+
+
+def _migration_010_contacts_added_at(cursor):
+    """When each contact row was written, so exports can pick up only what changed since the last run"""
+    _add_column_if_missing(cursor, 'campaign_contacts', 'added_at', 'TEXT')
+    cursor.execute('''
+        UPDATE campaign_contacts
+        SET added_at = (SELECT created_at FROM campaigns WHERE id = campaign_contacts.campaign_id)
+        WHERE added_at IS NULL
+    ''')
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_contacts_added_at ON campaign_contacts(added_at)')
+
+
+def _migration_011_contact_identity(cursor):
+    """One global row per person in `contacts`; campaign_contacts keeps only a reference"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS contacts (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            apollo_id TEXT,
+            email TEXT,
+            linkedin_url TEXT,
+            name TEXT,
+            data TEXT NOT NULL,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL
+        )
+    ''')
+    for column in CONTACT_IDENTITY_KEYS:
+        cursor.execute(
+            f'CREATE UNIQUE INDEX IF NOT EXISTS idx_contact_identity_{column} ON contacts({column}) '
+            f'WHERE {column} IS NOT NULL'
+        )
+    _add_column_if_missing(cursor, 'campaign_contacts', 'contact_id', 'INTEGER REFERENCES contacts(id)')
+
+    # Fold the per-campaign copies into identities, in batches so a large table
+    # is never loaded at once. Differing copies of one person are merged, the
+    # most recently written one winning field by field.
+    now = datetime.now().isoformat()
+    last_id = 0
+    while True:
+        cursor.execute(
+            'SELECT id, data FROM campaign_contacts WHERE id > ? ORDER BY id LIMIT 1000', (last_id,)
+        )
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany('UPDATE campaign_contacts SET contact_id = ? WHERE id = ?', [
+            (_upsert_contact_v11(cursor, decode_json_column(data), now), row_id) for row_id, data in rows
+        ])
+        last_id = rows[-1][0]
+    cursor.execute('ALTER TABLE campaign_contacts DROP COLUMN data')
+
+
+def _upsert_contact_v11(cursor, contact, now, refresh=True):
+    """
+    _upsert_contact as migration 11 shipped with it: id of the identity row
+    for a contact dict, inside the caller's transaction.
+
+    A known person is matched by the first identity key that finds a row.
+    With refresh, the contact's fields are merged into the stored ones (new
+    values win, fields it lacks are kept) and written only if that changes
+    anything. Anyone else gets a new row, as does a contact with no identity
+    key at all.
+    """
+    keys = _contact_identity(contact)
+    row = None
+    for column, value in zip(CONTACT_IDENTITY_KEYS, keys):
+        if value is not None:
+            cursor.execute(f'SELECT id, apollo_id, email, linkedin_url, data FROM contacts WHERE {column} = ?', (value,))
+            row = cursor.fetchone()
+            if row is not None:
+                break
+    if row is None:
+        cursor.execute('''
+            INSERT INTO contacts (apollo_id, email, linkedin_url, name, data, created_at, updated_at)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (*keys, contact.get('name'), encode_json_column(contact), now, now))
+        return cursor.lastrowid
+    if refresh:
+        stored = decode_json_column(row['data'])
+        merged = {**stored, **contact}
+        if merged != stored:
+            cursor.execute(
+                'UPDATE contacts SET name = ?, data = ?, updated_at = ? WHERE id = ?',
+                (merged.get('name'), encode_json_column(merged), now, row['id'])
+            )
+            # Take over changed keys, unless another person already holds them
+            for column, value in zip(CONTACT_IDENTITY_KEYS, _contact_identity(merged)):
+                if value is not None and value != row[column]:
+                    cursor.execute(f'UPDATE OR IGNORE contacts SET {column} = ? WHERE id = ?', (value, row['id']))
+    return row['id']
+
+
+def _migration_012_contact_page_columns(cursor):
+    """Organization and city on campaign_contacts, with indexes that serve sorted contact pages"""
+    _add_column_if_missing(cursor, 'campaign_contacts', 'organization', 'TEXT')
+    _add_column_if_missing(cursor, 'campaign_contacts', 'city', 'TEXT')
+    contact_json = f"(SELECT {_JSON_TEXT_SQL} FROM contacts WHERE id = campaign_contacts.contact_id)"
+    cursor.execute(f'''
+        UPDATE campaign_contacts SET
+            organization = COALESCE(json_extract({contact_json}, '$.organization_name'),
+                                    json_extract({contact_json}, '$.organization.name')),
+            city = json_extract({contact_json}, '$.city')
+    ''')
+    for column in CONTACT_SORT_COLUMNS:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS idx_contacts_campaign_{column} '
+            f'ON campaign_contacts(campaign_id, {column} COLLATE NOCASE, position)'
+        )
+
+
+def _create_contact_identity_indexes(cursor):
+    """Non-unique: each campaign's differing copy of a person has its own row"""
+    for column in CONTACT_IDENTITY_KEYS:
+        cursor.execute(
+            f'CREATE INDEX IF NOT EXISTS idx_contact_identity_{column} ON contacts({column}) '
+            f'WHERE {column} IS NOT NULL'
+        )
+
+
+def _migration_013_campaign_directory(cursor):
+    """Campaign owners in the catalog, so a campaign id alone finds its shard"""
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS campaign_directory (
+            campaign_id TEXT PRIMARY KEY,
+            user_id TEXT NOT NULL
+        )
+    ''')
+
+
+def _migration_014_contact_snapshots(cursor):
+    """
+    Drop migration 11's unique identity indexes, so differing copies of a
+    person can each have a row, and resync campaign_contacts' email, name,
+    organization and city with the contact JSON each row points at (rows
+    migration 11 merged left them stale)
+    """
+    for column in CONTACT_IDENTITY_KEYS:
+        cursor.execute(f'DROP INDEX IF EXISTS idx_contact_identity_{column}')
+    _create_contact_identity_indexes(cursor)
+    last_id = 0
+    while True:
+        cursor.execute('''
+            SELECT cc.id, cc.email, cc.name, cc.organization, cc.city, ct.data
+            FROM campaign_contacts cc JOIN contacts ct ON ct.id = cc.contact_id
+            WHERE cc.id > ? ORDER BY cc.id LIMIT 1000
+        ''', (last_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        updates = []
+        for row_id, email, name, organization, city, data in rows:
+            contact = decode_json_column(data)
+            fields = (_normalize_email(contact.get('email')), contact.get('name'), *_contact_page_fields(contact))
+            if fields != (email, name, organization, city):
+                updates.append((*fields, row_id))
+        cursor.executemany(
+            'UPDATE campaign_contacts SET email = ?, name = ?, organization = ?, city = ? WHERE id = ?', updates
+        )
+        last_id = rows[-1][0]
+
+
+def _migration_015_contact_content_hash(cursor):
+    """A hash of each contact's JSON, indexed with its identity keys, so finding an identical copy is one probe"""
+    _add_column_if_missing(cursor, 'contacts', 'content_hash', 'TEXT')
+    last_id = 0
+    while True:
+        cursor.execute('SELECT id, data FROM contacts WHERE id > ? ORDER BY id LIMIT 1000', (last_id,))
+        rows = cursor.fetchall()
+        if not rows:
+            break
+        cursor.executemany('UPDATE contacts SET content_hash = ? WHERE id = ?', [
+            (_contact_hash(decode_json_column(data)), row_id) for row_id, data in rows
+        ])
+        last_id = rows[-1][0]
+    cursor.execute(
+        'CREATE INDEX IF NOT EXISTS idx_contacts_content ON contacts(content_hash, apollo_id, email, linkedin_url)'
+    )
+
+
+def _migration_016_contact_garbage_collection(cursor):
+    """Index contacts references so unreferenced contacts rows can be found and deleted, and delete today's"""
+    cursor.execute('CREATE INDEX IF NOT EXISTS idx_campaign_contacts_contact ON campaign_contacts(contact_id)')
+    cursor.execute('''
+        DELETE FROM contacts
+        WHERE NOT EXISTS (SELECT 1 FROM campaign_contacts WHERE contact_id = contacts.id)
+    ''')
+
+
+# Ordered (version, description, step). Append new steps; never edit or reorder applied ones.
+MIGRATIONS = [
+    (1, 'base schema', _migration_001_base_schema),
+    (2, 'hot query indexes', _migration_002_hot_query_indexes),
+    (3, 'campaign_contacts table', _migration_003_campaign_contacts),
+    (4, 'campaign_messages table', _migration_004_campaign_messages),
+    (5, 'campaign_tool_calls table', _migration_005_campaign_tool_calls),
+    (6, 'campaign keyset index', _migration_006_campaign_keyset_index),
+    (7, 'campaign archive stub', _migration_007_campaign_archive_stub),
+    (8, 'responses (campaign_id, id) index', _migration_008_responses_campaign_id_index),
+    (9, 'full-text search', _migration_009_full_text_search),
+    (10, 'campaign_contacts.added_at', _migration_010_contacts_added_at),
+    (11, 'contact identity table', _migration_011_contact_identity),
+    (12, 'campaign contact page columns', _migration_012_contact_page_columns),
+    (13, 'campaign directory', _migration_013_campaign_directory),
+    (14, 'contact snapshots', _migration_014_contact_snapshots),
+    (15, 'contact content hash', _migration_015_contact_content_hash),
+    (16, 'contact garbage collection', _migration_016_contact_garbage_collection),
+]
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(conn):
+    """Return the highest applied migration version (0 for a fresh or pre-migration database)"""
+    try:
+        row = conn.execute('SELECT MAX(version) FROM schema_version').fetchone()
+    except sqlite3.OperationalError:
+        return 0
+    return row[0] or 0
+
+
+def init_db():
+    """
+    Bring the database schema up to date, and every existing shard's when
+    sharding is on (shards created later are migrated on first use).
+
+    Costs a single version query per database when nothing is pending.
+    Pending migrations run in one write transaction, so concurrent workers
+    booting together apply them exactly once.
+    """
+    _migrate(DB_PATH)
+    if sharding_enabled():
+        for path in all_db_paths():
+            _migrate(path)
+
+
+def _migrate(path):
+    conn = get_db_connection(path)
+    try:
+        if get_schema_version(conn) >= SCHEMA_VERSION:
+            _migrated_paths.add(path)
+            return
+        
+        conn.execute('BEGIN IMMEDIATE')
+        cursor = conn.cursor()
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS schema_version (
+                version INTEGER PRIMARY KEY,
+                description TEXT NOT NULL,
+                applied_at TEXT NOT NULL
+            )
+        ''')
+        # Re-check under the write lock in case another worker just migrated
+        current = get_schema_version(conn)
+        for version, description, step in MIGRATIONS:
+            if version <= current:
+                continue
+            step(cursor)
+            cursor.execute(
+                'INSERT INTO schema_version (version, description, applied_at) VALUES (?, ?, ?)',
+                (version, description, datetime.now().isoformat())
+            )
+            print(f"Applied database migration {version}: {description}")
+        conn.commit()
+        _migrated_paths.add(path)
+        clear_campaign_cache()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+# ... (existing functions) ...
+
+def add_campaign_response(campaign_id, email, response):
+    """Add a customer response to the database"""
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO campaign_responses (campaign_id, email, response, received_at)
+            VALUES (?, ?, ?, ?)
+        ''', (campaign_id, email, response, datetime.now().isoformat()))
+        conn.commit()
+        return True
+    except Exception as e:
+        print(f"Error adding response: {e}")
+        return False
+    finally:
+        conn.close()
+
+def add_campaign_responses_batch(responses):
+    """
+    Insert many customer responses and bump each campaign's reply counter in one transaction.
+
+    responses is a list of (campaign_id, email, response, received_at) tuples.
+    Either every row is written or none is (the error is raised); with
+    sharding on, that holds per shard, each in its own transaction.
+    """
+    if not responses:
+        return 0
+    by_path = {}
+    for row in responses:
+        by_path.setdefault(campaign_db_path(row[0]), []).append(row)
+    return sum(_add_campaign_responses(path, rows) for path, rows in by_path.items())
+
+def _add_campaign_responses(path, responses):
+    replies = {}
+    for campaign_id, _, _, _ in responses:
+        replies.setdefault(campaign_id, {'replies': 0})['replies'] += 1
+
+    conn = get_db_connection(path)
+    cursor = conn.cursor()
+
+    try:
+        cursor.executemany('''
+            INSERT INTO campaign_responses (campaign_id, email, response, received_at)
+            VALUES (?, ?, ?, ?)
+        ''', responses)
+        _upsert_analytics_increments(cursor, replies)
+        conn.commit()
+        invalidate_campaign_cache(replies.keys())
+        return len(responses)
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def get_campaign_responses(campaign_id):
+    """Get all responses for a campaign"""
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    
+    cursor.execute('''
+        SELECT * FROM campaign_responses 
+        WHERE campaign_id = ?
+        ORDER BY received_at DESC
+    ''', (campaign_id,))
+    
+    rows = cursor.fetchall()
+    conn.close()
+    
+    return [_response_to_dict(row) for row in rows]
+
+def get_campaign_responses_since(campaign_id, since_id=0, limit=100):
+    """
+    Responses with an id greater than since_id, oldest first, at most limit.
+
+    Served by the (campaign_id, id) index, so a poll costs O(new rows).
+    Returns {'replies': [...], 'latestId': id to pass as the next since_id,
+    'hasMore': True if more than limit rows were waiting}.
+    """
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT * FROM campaign_responses
+        WHERE campaign_id = ? AND id > ?
+        ORDER BY id
+        LIMIT ?
+    ''', (campaign_id, since_id or 0, limit + 1))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return {
+        'replies': [_response_to_dict(row) for row in rows],
+        'latestId': rows[-1]['id'] if rows else (since_id or 0),
+        'hasMore': has_more
+    }
+
+def _response_to_dict(row):
+    return {
+        'id': row['id'],
+        'campaignId': row['campaign_id'],
+        'email': row['email'],
+        'response': row['response'], # This maps to 'snippet' for frontend compatibility
+        'snippet': row['response'],
+        'receivedAt': row['received_at'],
+        'subject': 'Customer Response'
+    }
+
+def get_db_connection(path=None):
+    """
+    Get a database connection (to DB_PATH unless another file is given).
+
+    In 'pooled' mode this returns the calling thread's persistent, WAL-enabled
+    connection; close() releases it instead of tearing it down.
+    """
+    path = path or DB_PATH
+    if DB_CONNECTION_MODE == 'per_call':
+        conn = _connect(path)
+        conn.row_factory = sqlite3.Row
+        _register_functions(conn)
+        return conn
+    return PooledConnection(_get_thread_connection(path))
+
+def generate_sample_analytics(campaign_id):
+    """Generate sample analytics data for a campaign"""
+    # Use campaign_id as seed for consistent random data per campaign
+    random.seed(hash(campaign_id) % (2**32))
+    emails_sent = random.randint(500, 5000)
+    emails_opened = random.randint(int(emails_sent * 0.15), int(emails_sent * 0.35))
+    replies = random.randint(int(emails_opened * 0.05), int(emails_opened * 0.15))
+    bounce_rate = round(random.uniform(1.0, 5.0), 1)
+    return {
+        'emailsSent': emails_sent,
+        'emailsOpened': emails_opened,
+        'replies': replies,
+        'bounceRate': bounce_rate
+    }
+
+# Users synced recently, as user_id -> (name, picture) last written. Every
+# authenticated request syncs its user; while the profile is unchanged and
+# cached, that costs no database write at all.
+USER_SYNC_CACHE_SIZE = int(os.getenv('USER_SYNC_CACHE_SIZE', '10000'))
+USER_SYNC_CACHE_TTL_SECONDS = float(os.getenv('USER_SYNC_CACHE_TTL_SECONDS', '300'))
+
+_user_sync_cache = TTLCache(USER_SYNC_CACHE_SIZE, USER_SYNC_CACHE_TTL_SECONDS)
+
+
+def create_user_if_not_exists(user_data):
+    """
+    Create a user if they don't exist, otherwise update their name and picture.
+
+    One upsert that only writes when the profile changed, skipped entirely
+    when this user was synced recently with the same profile. Returns True
+    if the database was written.
+    """
+    user_id = user_data['user_id']
+    profile = (user_data['name'], user_data['picture'])
+    if _user_sync_cache.get(user_id) == profile:
+        return False
+
+    conn = get_db_connection(user_db_path(user_id))
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO users (id, email, name, picture, created_at)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET name = excluded.name, picture = excluded.picture
+            WHERE users.name IS NOT excluded.name OR users.picture IS NOT excluded.picture
+        ''', (user_id, user_data['email'], profile[0], profile[1], datetime.now().isoformat()))
+        written = cursor.rowcount > 0
+        conn.commit()
+    except sqlite3.IntegrityError:
+        # Email already taken by another account id: nothing to sync, as before
+        conn.rollback()
+        written = False
+    finally:
+        conn.close()
+    _user_sync_cache.put(user_id, profile)
+    return written
+
+def get_all_campaigns(user_id, messages_limit=None):
+    """Get all campaigns for a specific user (messages_limit keeps only the last N turns)"""
+    return _cached_campaign_read(
+        ('all_campaigns', user_id, messages_limit),
+        lambda: _load_all_campaigns(user_id, messages_limit),
+        lambda campaigns: _campaign_list_tags(user_id, campaigns)
+    )
+
+def _load_all_campaigns(user_id, messages_limit):
+    conn = get_db_connection(user_db_path(user_id))
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT c.*, 
+               a.emails_sent, a.emails_opened, a.replies, a.bounce_rate,
+               {_CONTACTS_JSON_SQL} AS contacts_json,
+               {_CONTACTS_COUNT_SQL} AS contacts_count,
+               {_messages_json_sql(messages_limit)} AS messages_json
+        FROM campaigns c
+        LEFT JOIN analytics a ON c.id = a.campaign_id
+        WHERE c.user_id = ?
+        ORDER BY c.created_at DESC
+    ''', (user_id,))
+    rows = cursor.fetchall()
+    conn.close()
+    
+    campaigns = []
+    for row in rows:
+        row_dict = dict(row)
+        executed = bool(row_dict.get('executed') or row_dict.get('paid') or False)
+        
+        messages = serializer.loads(row['messages_json']) if row['messages_json'] else []
+        
+        campaign = {
+            'id': row['id'],
+            'name': row['name'],
+            'createdAt': row['created_at'],
+            'paid': executed,
+            'executed': executed,
+            'cost': row['cost'],
+            'status': row['status'],
+            'contacts': row['contacts_json'],
+            'contactsCount': row['contacts_count'],
+            'messages': messages,  # Include conversation history
+            'pendingCost': row_dict.get('pending_cost') or 0  # Include pending payment cost
+        }
+        if row['emails_sent'] is not None:
+            campaign['analytics'] = {
+                'emailsSent': row['emails_sent'],
+                'emailsOpened': row['emails_opened'],
+                'replies': row['replies'],
+                'bounceRate': row['bounce_rate']
+            }
+        elif executed:
+            campaign['analytics'] = generate_sample_analytics(row['id'])
+        campaigns.append(campaign)
+    
+    return campaigns
+
+def get_campaign_analytics(campaign_id, user_id, messages_limit=None, uow=None):
+    """
+    Get analytics for a specific campaign belonging to a user (messages_limit keeps only the last N turns).
+    Served from the campaign read cache when possible; treat the result as read-only.
+    With a unit of work it is read on that connection (seeing its uncommitted writes), bypassing the cache.
+    """
+    if uow is not None:
+        return _load_campaign_analytics(campaign_id, user_id, messages_limit, uow)
+    return _cached_campaign_read(
+        ('campaign', campaign_id, user_id, messages_limit),
+        lambda: _load_campaign_analytics(campaign_id, user_id, messages_limit),
+        lambda campaign: [('campaign', campaign_id), ('user', user_id)]
+    )
+
+def _load_campaign_analytics(campaign_id, user_id, messages_limit, uow=None):
+    conn = _connection_for(uow, user_db_path(user_id))
+    cursor = conn.cursor()
+    cursor.execute(f'''
+        SELECT c.*, 
+               a.emails_sent, a.emails_opened, a.replies, a.bounce_rate,
+               {_CONTACTS_JSON_SQL} AS contacts_json,
+               {_CONTACTS_COUNT_SQL} AS contacts_count,
+               {_messages_json_sql(messages_limit)} AS messages_json,
+               {_TOOL_CALLS_JSON_SQL} AS tool_calls_json
+        FROM campaigns c
+        LEFT JOIN analytics a ON c.id = a.campaign_id
+        WHERE c.id = ? AND c.user_id = ?
+    ''', (campaign_id, user_id))
+    row = cursor.fetchone()
+    conn.close()
+    
+    if not row:
+        return None
+    if row['archived_at']:
+        from core.archive import rehydrate_campaign
+        rehydrate_campaign(campaign_id)
+        return _load_campaign_analytics(campaign_id, user_id, messages_limit, uow)
+    
+    row_dict = dict(row)
+    executed = bool(row_dict.get('executed') or row_dict.get('paid') or False)
+    
+    messages = serializer.loads(row['messages_json']) if row['messages_json'] else []
+    
+    campaign = {
+        'id': row['id'],
+        'name': row['name'],
+        'createdAt': row['created_at'],
+        'paid': executed,
+        'executed': executed,
+        'cost': row['cost'],
+        'status': row['status'],
+        'contacts': row['contacts_json'],
+        'contactsCount': row['contacts_count'],
+        'tool_calls': row['tool_calls_json'],
+        'messages': messages,  # Include conversation history
+        'pendingCost': row_dict.get('pending_cost') or 0  # Include pending payment cost
+    }
+    
+    if row['emails_sent'] is not None:
+        campaign['analytics'] = {
+            'emailsSent': row['emails_sent'],
+            'emailsOpened': row['emails_opened'],
+            'replies': row['replies'],
+            'bounceRate': row['bounce_rate']
+        }
+    elif executed:
+        campaign['analytics'] = generate_sample_analytics(campaign_id)
+    
+    return campaign
+
+def create_campaign(campaign_id, name, user_id, cost=None):
+    """Create a new campaign for a user"""
+    if _register_campaign(campaign_id, user_id) != user_id:
+        # Another user's campaign id, held on their shard: nothing to update, as below
+        return True
+    conn = get_db_connection(user_db_path(user_id))
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO campaigns (id, name, created_at, executed, cost, status, user_id)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        ''', (
+            campaign_id,
+            name,
+            datetime.now().isoformat(),
+            False,
+            cost,
+            'draft',
+            user_id
+        ))
+        conn.commit()
+        invalidate_campaign_cache(campaign_id, user_id)
+        return True
+    except sqlite3.IntegrityError:
+        # If it exists, verify ownership before update (or assume it's fine for now)
+        cursor.execute('''
+            UPDATE campaigns 
+            SET name = ?, cost = ?
+            WHERE id = ? AND user_id = ?
+        ''', (name, cost, campaign_id, user_id))
+        conn.commit()
+        invalidate_campaign_cache(campaign_id, user_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def update_campaign(campaign_id, user_id, name=None, executed=None, cost=None, status=None, contacts=None, messages=None, pending_cost=None, uow=None):
+    """Update an existing campaign for a user"""
+    if contacts is not None or messages is not None:
+        _rehydrate_if_archived(campaign_id)
+    conn = _connection_for(uow, user_db_path(user_id))
+    cursor = conn.cursor()
+    
+    updates = []
+    values = []
+    
+    if name is not None:
+        updates.append('name = ?')
+        values.append(name)
+    if executed is not None:
+        updates.append('executed = ?')
+        values.append(executed)
+    if cost is not None:
+        updates.append('cost = ?')
+        values.append(cost)
+    if status is not None:
+        updates.append('status = ?')
+        values.append(status)
+    if pending_cost is not None:
+        updates.append('pending_cost = ?')
+        values.append(pending_cost)
+    
+    if not updates and contacts is None and messages is None:
+        conn.close()
+        return True
+    
+    # Add WHERE clause values
+    values.append(campaign_id)
+    values.append(user_id)
+    
+    query = f'UPDATE campaigns SET {", ".join(updates)} WHERE id = ? AND user_id = ?'
+    
+    try:
+        if updates:
+            cursor.execute(query, values)
+        if (contacts is not None or messages is not None) and _owns_campaign(cursor, campaign_id, user_id):
+            if contacts is not None:
+                _replace_campaign_contacts(cursor, campaign_id, contacts)
+            if messages is not None:
+                _sync_campaign_messages(cursor, campaign_id, messages)
+        conn.commit()
+        _invalidate_after_commit(uow, campaign_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def delete_campaign(campaign_id, user_id):
+    """Delete a campaign and its analytics if owned by user"""
+    conn = get_db_connection(user_db_path(user_id))
+    cursor = conn.cursor()
+    
+    try:
+        # Check ownership first
+        cursor.execute('SELECT archived_at FROM campaigns WHERE id = ? AND user_id = ?', (campaign_id, user_id))
+        owned = cursor.fetchone()
+        if not owned:
+            return False
+
+        # Delete dependent rows first (foreign key constraint)
+        cursor.execute('DELETE FROM analytics WHERE campaign_id = ?', (campaign_id,))
+        _delete_unreferenced_contacts(cursor, _unlink_campaign_contacts(cursor, campaign_id))
+        cursor.execute('DELETE FROM campaign_messages WHERE campaign_id = ?', (campaign_id,))
+        cursor.execute('DELETE FROM campaign_tool_calls WHERE campaign_id = ?', (campaign_id,))
+        # Delete campaign
+        cursor.execute('DELETE FROM campaigns WHERE id = ? AND user_id = ?', (campaign_id, user_id))
+        conn.commit()
+        invalidate_campaign_cache(campaign_id, user_id)
+        _unregister_campaign(campaign_id)
+        if owned['archived_at']:
+            from core.archive import delete_archive_record
+            delete_archive_record(campaign_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+def create_or_update_analytics(campaign_id, emails_sent=None, emails_opened=None, replies=None, bounce_rate=None, uow=None):
+    """
+    Create or update analytics for a campaign in a single UPSERT.
+    Fields left as None keep their stored value (or start at 0 on insert).
+    """
+    conn = _connection_for(uow, campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    
+    try:
+        cursor.execute('''
+            INSERT INTO analytics (campaign_id, emails_sent, emails_opened, replies, bounce_rate, updated_at)
+            VALUES (?, COALESCE(?, 0), COALESCE(?, 0), COALESCE(?, 0), COALESCE(?, 0.0), ?)
+            ON CONFLICT(campaign_id) DO UPDATE SET
+                emails_sent = COALESCE(?, emails_sent),
+                emails_opened = COALESCE(?, emails_opened),
+                replies = COALESCE(?, replies),
+                bounce_rate = COALESCE(?, bounce_rate),
+                updated_at = excluded.updated_at
+        ''', (
+            campaign_id, emails_sent, emails_opened, replies, bounce_rate, datetime.now().isoformat(),
+            emails_sent, emails_opened, replies, bounce_rate
+        ))
+        conn.commit()
+        _invalidate_after_commit(uow, campaign_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+# Counters that can be incremented atomically
+ANALYTICS_COUNTERS = ('emails_sent', 'emails_opened', 'replies')
+
+# Rows per multi-row UPSERT, keeping well under SQLite's bound-parameter limit
+_ANALYTICS_BATCH_ROWS = 500
+
+
+def _upsert_analytics_increments(cursor, totals):
+    """Apply {campaign_id: {counter: delta}} as relative increments, one statement per chunk"""
+    now = datetime.now().isoformat()
+    items = list(totals.items())
+    for start in range(0, len(items), _ANALYTICS_BATCH_ROWS):
+        chunk = items[start:start + _ANALYTICS_BATCH_ROWS]
+        params = []
+        for campaign_id, deltas in chunk:
+            params.extend([campaign_id] + [deltas.get(name, 0) for name in ANALYTICS_COUNTERS] + [now])
+        placeholders = ', '.join(['(?, ?, ?, ?, ?)'] * len(chunk))
+        cursor.execute(f'''
+            INSERT INTO analytics (campaign_id, emails_sent, emails_opened, replies, updated_at)
+            VALUES {placeholders}
+            ON CONFLICT(campaign_id) DO UPDATE SET
+                emails_sent = emails_sent + excluded.emails_sent,
+                emails_opened = emails_opened + excluded.emails_opened,
+                replies = replies + excluded.replies,
+                updated_at = excluded.updated_at
+        ''', params)
+
+
+def increment_analytics(campaign_id, emails_sent=0, emails_opened=0, replies=0):
+    """Atomically add to a campaign's counters (creating its analytics row if needed)"""
+    return increment_analytics_batch([{
+        'campaign_id': campaign_id,
+        'emails_sent': emails_sent,
+        'emails_opened': emails_opened,
+        'replies': replies
+    }])
+
+
+def increment_analytics_batch(events):
+    """
+    Fold many counter events into one UPSERT.
+
+    events is an iterable of dicts with a campaign_id and any of
+    ANALYTICS_COUNTERS, e.g. {'campaign_id': 'c1', 'replies': 1}. Events for
+    the same campaign are summed before anything is written.
+    """
+    totals = {}
+    for event in events:
+        deltas = totals.setdefault(event['campaign_id'], {})
+        for name in ANALYTICS_COUNTERS:
+            if event.get(name):
+                deltas[name] = deltas.get(name, 0) + event[name]
+    if not totals:
+        return True
+    by_path = {}
+    for campaign_id, deltas in totals.items():
+        by_path.setdefault(campaign_db_path(campaign_id), {})[campaign_id] = deltas
+    for path, shard_totals in by_path.items():
+        _increment_analytics(path, shard_totals)
+    return True
+
+
+def _increment_analytics(path, totals):
+    conn = get_db_connection(path)
+    cursor = conn.cursor()
+    
+    try:
+        _upsert_analytics_increments(cursor, totals)
+        conn.commit()
+        invalidate_campaign_cache(totals.keys())
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+# =============================================================================
+# Campaign contacts
+# =============================================================================
+
+# Contact JSON is stored in `contacts` and campaign_contacts rows point at it.
+# Campaigns that saved identical copies of a person share one row. Rows are
+# never rewritten, so what one campaign saves never changes what another
+# shows. Each row carries a hash of its JSON, indexed together with the
+# identity keys (Apollo id, normalized email, normalized LinkedIn URL), so
+# finding an identical copy is one index probe however many differing copies
+# of the person exist. A row is deleted in the same transaction as the last
+# campaign_contacts reference to it (replaced, deleted or archived).
+CONTACT_IDENTITY_KEYS = ('apollo_id', 'email', 'linkedin_url')
+
+# Columns a campaign's contact list can be sorted by (besides its own order) and
+# filtered on. Each sort column has a (campaign_id, column, position) index, so
+# a page is read in order straight off the index.
+CONTACT_SORT_COLUMNS = ('name', 'organization', 'city')
+CONTACT_FILTER_COLUMNS = ('name', 'email', 'organization', 'city')
+
+# Rebuild a campaign's contact list as a JSON array straight from the stored
+# per-contact JSON, without parsing it in Python
+_CONTACTS_JSON_SQL = f'''(
+    SELECT '[' || group_concat({_JSON_TEXT_SQL}, ',') || ']'
+    FROM (
+        SELECT ct.data FROM campaign_contacts cc JOIN contacts ct ON ct.id = cc.contact_id
+        WHERE cc.campaign_id = c.id ORDER BY cc.position
+    )
+)'''
+# Archived campaigns keep their count on the stub row
+_CONTACTS_COUNT_SQL = 'COALESCE(c.archived_contacts_count, (SELECT COUNT(*) FROM campaign_contacts WHERE campaign_id = c.id))'
+
+
+def _parse_contacts(contacts):
+    """Accept a list or a (possibly double-serialized) JSON string and return a list"""
+    if isinstance(contacts, str):
+        try:
+            contacts = serializer.loads(contacts) if contacts else []
+            if isinstance(contacts, str):
+                contacts = serializer.loads(contacts)
+        except serializer.JSONDecodeError:
+            return []
+    return contacts if isinstance(contacts, list) else []
+
+
+def _normalize_email(email):
+    return email.strip().lower() if isinstance(email, str) and email.strip() else None
+
+
+def _normalize_linkedin_url(url):
+    """'https://www.linkedin.com/in/Jane/' and 'http://linkedin.com/in/jane' are the same profile"""
+    if not isinstance(url, str) or not url.strip():
+        return None
+    url = re.sub(r'^https?://', '', url.strip().lower())
+    return url.removeprefix('www.').rstrip('/') or None
+
+
+def _contact_identity(contact):
+    """(apollo_id, email, linkedin_url) of a contact dict, each normalized or None"""
+    apollo_id = contact.get('id')
+    return (
+        str(apollo_id) if apollo_id not in (None, '') else None,
+        _normalize_email(contact.get('email')),
+        _normalize_linkedin_url(contact.get('linkedin_url')),
+    )
+
+
+def _contact_hash(contact):
+    """Hex digest of a contact dict's canonical JSON"""
+    return hashlib.sha1(serializer.canonical(contact)).hexdigest()
+
+
+def _contact_page_fields(contact):
+    """(organization, city) of a contact dict, in either the filtered or the raw Apollo shape"""
+    organization = contact.get('organization_name')
+    if organization is None and isinstance(contact.get('organization'), dict):
+        organization = contact['organization'].get('name')
+    return organization, contact.get('city')
+
+
+def _upsert_contact(cursor, contact, now):
+    """
+    Id of a contacts row holding exactly this contact dict, inside the caller's transaction.
+
+    A stored row is reused only if all three identity keys match (so two
+    Apollo ids behind one shared address are never confused) and its content
+    hash equals the contact's. Any other copy gets a new row; stored rows are
+    never changed.
+    """
+    keys = _contact_identity(contact)
+    content_hash = _contact_hash(contact)
+    cursor.execute(
+        'SELECT id FROM contacts WHERE content_hash = ? AND apollo_id IS ? AND email IS ? AND linkedin_url IS ? LIMIT 1',
+        (content_hash, *keys)
+    )
+    row = cursor.fetchone()
+    if row is not None:
+        return row[0]
+    cursor.execute('''
+        INSERT INTO contacts (apollo_id, email, linkedin_url, name, data, content_hash, created_at, updated_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (*keys, contact.get('name'), encode_json_column(contact), content_hash, now, now))
+    return cursor.lastrowid
+
+
+def _owns_campaign(cursor, campaign_id, user_id):
+    cursor.execute('SELECT 1 FROM campaigns WHERE id = ? AND user_id = ?', (campaign_id, user_id))
+    return cursor.fetchone() is not None
+
+
+def user_owns_campaign(campaign_id, user_id):
+    """Cheap ownership check (primary-key lookup, no heavy columns)"""
+    conn = get_db_connection(user_db_path(user_id))
+    owned = _owns_campaign(conn.cursor(), campaign_id, user_id)
+    conn.close()
+    return owned
+
+
+def _replace_campaign_contacts(cursor, campaign_id, contacts):
+    """Replace a campaign's contact references inside the caller's transaction"""
+    now = datetime.now().isoformat()
+    rows = [
+        (campaign_id, position, _normalize_email(contact.get('email')), contact.get('name'),
+         *_contact_page_fields(contact), _upsert_contact(cursor, contact, now), now)
+        for position, contact in enumerate(c for c in _parse_contacts(contacts) if isinstance(c, dict))
+    ]
+    previous = _unlink_campaign_contacts(cursor, campaign_id)
+    cursor.executemany('''
+        INSERT INTO campaign_contacts (campaign_id, position, email, name, organization, city, contact_id, added_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+    ''', rows)
+    _delete_unreferenced_contacts(cursor, previous)
+    return len(rows)
+
+
+def _unlink_campaign_contacts(cursor, campaign_id):
+    """Delete a campaign's campaign_contacts rows; returns the contacts ids they pointed at"""
+    cursor.execute('SELECT DISTINCT contact_id FROM campaign_contacts WHERE campaign_id = ?', (campaign_id,))
+    contact_ids = [row[0] for row in cursor.fetchall()]
+    cursor.execute('DELETE FROM campaign_contacts WHERE campaign_id = ?', (campaign_id,))
+    return contact_ids
+
+
+def _delete_unreferenced_contacts(cursor, contact_ids):
+    """Delete the contacts rows among contact_ids that no campaign points at any more (inside the caller's transaction)"""
+    cursor.executemany('''
+        DELETE FROM contacts WHERE id = ?
+        AND NOT EXISTS (SELECT 1 FROM campaign_contacts WHERE contact_id = ?)
+    ''', [(contact_id, contact_id) for contact_id in contact_ids])
+
+
+def save_campaign_contacts(campaign_id, user_id, contacts):
+    """Replace a campaign's filtered contacts in one transaction; returns the number stored"""
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(user_db_path(user_id))
+    cursor = conn.cursor()
+    
+    try:
+        if not _owns_campaign(cursor, campaign_id, user_id):
+            return 0
+        count = _replace_campaign_contacts(cursor, campaign_id, contacts)
+        conn.commit()
+        invalidate_campaign_cache(campaign_id)
+        return count
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def get_campaign_contacts(campaign_id, limit=None, offset=0):
+    """Get a campaign's contacts in their original order, optionally a single page"""
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT ct.data FROM campaign_contacts cc
+        JOIN contacts ct ON ct.id = cc.contact_id
+        WHERE cc.campaign_id = ?
+        ORDER BY cc.position
+        LIMIT ? OFFSET ?
+    ''', (campaign_id, -1 if limit is None else limit, offset))
+    rows = cursor.fetchall()
+    conn.close()
+    return [decode_json_column(row['data']) for row in rows]
+
+
+def _like_pattern(text):
+    """LIKE pattern matching text anywhere, with % and _ in it taken literally (ESCAPE '\\')"""
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f'%{escaped}%'
+
+
+def get_campaign_contacts_page(campaign_id, limit=20, offset=0, sort=None, descending=False, filters=None):
+    """
+    One page of a campaign's contacts for a table view.
+
+    sort is None (the campaign's own order) or one of CONTACT_SORT_COLUMNS,
+    compared case-insensitively; filters maps CONTACT_FILTER_COLUMNS to
+    case-insensitive substrings that must all match. Unfiltered pages are
+    read in order off an index, so they cost the page plus the offset, never
+    a sort of the whole list; filters scan the campaign's rows. Returns
+    {'contacts': [...], 'total': matching contacts, 'hasMore': bool}.
+    """
+    if sort is not None and sort not in CONTACT_SORT_COLUMNS:
+        raise ValueError(f"Unknown contact sort '{sort}', expected one of {CONTACT_SORT_COLUMNS}")
+    filters = {column: value for column, value in (filters or {}).items() if value}
+    unknown = set(filters) - set(CONTACT_FILTER_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown contact filter(s): {', '.join(sorted(unknown))}")
+
+    where = 'cc.campaign_id = ?'
+    params = [campaign_id]
+    for column, value in filters.items():
+        where += f" AND cc.{column} LIKE ? ESCAPE '\\'"
+        params.append(_like_pattern(value))
+    direction = 'DESC' if descending else 'ASC'
+    if sort is None:
+        sort_key, order = 'NULL', f'position {direction}'
+    else:
+        sort_key, order = f'cc.{sort}', f'sort_key COLLATE NOCASE {direction}, position {direction}'
+
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    cursor.execute(f'SELECT COUNT(*) FROM campaign_contacts cc WHERE {where}', params)
+    total = cursor.fetchone()[0]
+    # Page through the narrow campaign_contacts index first; fetch the contact JSON for that page only
+    cursor.execute(f'''
+        SELECT ct.data FROM (
+            SELECT cc.contact_id, cc.position, {sort_key} AS sort_key FROM campaign_contacts cc
+            WHERE {where}
+            ORDER BY {order}
+            LIMIT ? OFFSET ?
+        )
+        JOIN contacts ct ON ct.id = contact_id
+        ORDER BY {order}
+    ''', params + [limit, offset])
+    rows = cursor.fetchall()
+    conn.close()
+    return {
+        'contacts': [decode_json_column(row['data']) for row in rows],
+        'total': total,
+        'hasMore': offset + len(rows) < total,
+    }
+
+
+def get_campaign_contact_by_email(campaign_id, email):
+    """Look up a single contact of a campaign by email"""
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    cursor.execute('''
+        SELECT ct.data FROM campaign_contacts cc
+        JOIN contacts ct ON ct.id = cc.contact_id
+        WHERE cc.campaign_id = ? AND cc.email = ?
+        ORDER BY cc.position
+        LIMIT 1
+    ''', (campaign_id, _normalize_email(email)))
+    row = cursor.fetchone()
+    conn.close()
+    return decode_json_column(row['data']) if row else None
+
+
+def count_campaign_contacts(campaign_id):
+    """Number of contacts stored for a campaign"""
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    cursor.execute('SELECT COUNT(*) FROM campaign_contacts WHERE campaign_id = ?', (campaign_id,))
+    count = cursor.fetchone()[0]
+    conn.close()
+    return count
+
+
+# =============================================================================
+# Campaign messages (conversation history)
+# =============================================================================
+
+def _messages_json_sql(limit=None):
+    """Correlated subquery returning a campaign's turns (optionally the last N) as a JSON array"""
+    if limit is None:
+        inner = 'SELECT data FROM campaign_messages WHERE campaign_id = c.id ORDER BY seq'
+    else:
+        inner = (
+            'SELECT data FROM (SELECT data, seq FROM campaign_messages WHERE campaign_id = c.id '
+            f'ORDER BY seq DESC LIMIT {int(limit)}) ORDER BY seq'
+        )
+    return f"(SELECT '[' || group_concat({_JSON_TEXT_SQL}, ',') || ']' FROM ({inner}))"
+
+
+def _append_campaign_messages(cursor, campaign_id, messages):
+    """Append turns after the campaign's current last one, inside the caller's transaction"""
+    cursor.execute('SELECT COALESCE(MAX(seq), -1) FROM campaign_messages WHERE campaign_id = ?', (campaign_id,))
+    next_seq = cursor.fetchone()[0] + 1
+    now = datetime.now().isoformat()
+    rows = [
+        (campaign_id, next_seq + i, message.get('role'), encode_json_column(message), now)
+        for i, message in enumerate(m for m in messages if isinstance(m, dict))
+    ]
+    cursor.executemany('''
+        INSERT INTO campaign_messages (campaign_id, seq, role, data, created_at)
+        VALUES (?, ?, ?, ?, ?)
+    ''', rows)
+    return next_seq + len(rows)
+
+
+def _sync_campaign_messages(cursor, campaign_id, messages):
+    """
+    Accept a full history from older clients: append only the turns beyond what
+    is already stored, or rewrite the history if the client sent fewer turns.
+    """
+    if isinstance(messages, str):
+        messages = serializer.loads(messages) if messages else []
+    cursor.execute('SELECT COUNT(*) FROM campaign_messages WHERE campaign_id = ?', (campaign_id,))
+    stored = cursor.fetchone()[0]
+    if len(messages) < stored:
+        cursor.execute('DELETE FROM campaign_messages WHERE campaign_id = ?', (campaign_id,))
+        stored = 0
+    _append_campaign_messages(cursor, campaign_id, messages[stored:])
+
+
+def append_campaign_messages(campaign_id, user_id, messages):
+    """
+    Append new conversation turns to a campaign owned by user_id.
+    Cost is proportional to the new turns, not the length of the history.
+    Returns the total number of turns, or None if the campaign is not the user's.
+    """
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(user_db_path(user_id))
+    cursor = conn.cursor()
+    
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        if not _owns_campaign(cursor, campaign_id, user_id):
+            return None
+        total = _append_campaign_messages(cursor, campaign_id, messages)
+        conn.commit()
+        invalidate_campaign_cache(campaign_id)
+        return total
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def get_campaign_messages(campaign_id, last_n=None):
+    """Get a campaign's conversation turns in order, or only the last N"""
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    if last_n is None:
+        cursor.execute('''
+            SELECT data FROM campaign_messages
+            WHERE campaign_id = ?
+            ORDER BY seq
+        ''', (campaign_id,))
+        rows = cursor.fetchall()
+    else:
+        cursor.execute('''
+            SELECT data FROM campaign_messages
+            WHERE campaign_id = ?
+            ORDER BY seq DESC
+            LIMIT ?
+        ''', (campaign_id, last_n))
+        rows = cursor.fetchall()[::-1]
+    conn.close()
+    return [decode_json_column(row['data']) for row in rows]
+
+
+# =============================================================================
+# Campaign tool calls (workflow log)
+# =============================================================================
+
+_TOOL_CALLS_JSON_SQL = f'''(
+    SELECT '[' || group_concat({_JSON_TEXT_SQL}, ',') || ']'
+    FROM (SELECT data FROM campaign_tool_calls WHERE campaign_id = c.id ORDER BY seq)
+)'''
+
+
+def _append_tool_calls(cursor, campaign_id, tool_calls):
+    """Insert each call with the next per-campaign sequence number, one statement per call"""
+    now = datetime.now().isoformat()
+    cursor.executemany('''
+        INSERT INTO campaign_tool_calls (campaign_id, seq, tool_name, data, created_at)
+        SELECT ?, COALESCE(MAX(seq), -1) + 1, ?, ?, ?
+        FROM campaign_tool_calls WHERE campaign_id = ?
+    ''', [
+        (campaign_id, call.get('tool_name') or '', encode_json_column(call), now, campaign_id)
+        for call in tool_calls if isinstance(call, dict)
+    ])
+
+
+def append_tool_calls(campaign_id, tool_calls, uow=None):
+    """Append executed tool calls to a campaign's workflow log"""
+    _rehydrate_if_archived(campaign_id)
+    conn = _connection_for(uow, campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    
+    try:
+        _append_tool_calls(cursor, campaign_id, tool_calls)
+        conn.commit()
+        _invalidate_after_commit(uow, campaign_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.close()
+
+
+def get_tool_calls(campaign_id, tool_name=None):
+    """Get a campaign's tool calls in execution order, optionally only those of one tool"""
+    _rehydrate_if_archived(campaign_id)
+    conn = get_db_connection(campaign_db_path(campaign_id))
+    cursor = conn.cursor()
+    if tool_name is None:
+        cursor.execute('''
+            SELECT data FROM campaign_tool_calls
+            WHERE campaign_id = ?
+            ORDER BY seq
+        ''', (campaign_id,))
+    else:
+        cursor.execute('''
+            SELECT data FROM campaign_tool_calls
+            WHERE campaign_id = ? AND tool_name = ?
+            ORDER BY seq
+        ''', (campaign_id, tool_name))
+    rows = cursor.fetchall()
+    conn.close()
+    return [decode_json_column(row['data']) for row in rows]
+
+
+# =============================================================================
+# Pending paid action
+# =============================================================================
+
+def get_pending_action(campaign_id, uow=None):
+    """The tool call waiting for payment on a campaign, or None"""
+    conn = _connection_for(uow, campaign_db_path(campaign_id))
+    row = conn.execute('SELECT pending_action FROM campaigns WHERE id = ?', (campaign_id,)).fetchone()
     conn.close()
+    if not row or not row['pending_action']:
+        return None
+    return serializer.loads(row['pending_action'])
 
-# ... (existing functions) ...
 
-def add_campaign_response(campaign_id, email, response):
-    """Add a customer response to the database"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
+def claim_pending_action(campaign_id):
+    """
+    Take the tool call waiting for payment so it runs once: clear it with a
+    compare-and-set and return it, or None if there is none or a concurrent
+    payment claimed it first. The claim commits on its own straight away
+    (never inside a unit of work), so no write lock is held while the claimed
+    tool runs.
+    """
+    conn = get_db_connection(campaign_db_path(campaign_id))
     try:
-        cursor.execute('''
-            INSERT INTO campaign_responses (campaign_id, email, response, received_at)
-            VALUES (?, ?, ?, ?)
-        ''', (campaign_id, email, response, datetime.now().isoformat()))
+        row = conn.execute('SELECT pending_action FROM campaigns WHERE id = ?', (campaign_id,)).fetchone()
+        if not row or not row['pending_action']:
+            return None
+        cursor = conn.execute(
+            'UPDATE campaigns SET pending_action = NULL WHERE id = ? AND pending_action = ?',
+            (campaign_id, row['pending_action'])
+        )
         conn.commit()
-        return True
+        if cursor.rowcount != 1:
+            return None
+        invalidate_campaign_cache(campaign_id)
+        return serializer.loads(row['pending_action'])
     except Exception as e:
-        print(f"Error adding response: {e}")
-        return False
+        conn.rollback()
+        raise e
     finally:
         conn.close()
 
-def get_campaign_responses(campaign_id):
-    """Get all responses for a campaign"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        SELECT * FROM campaign_responses 
-        WHERE campaign_id = ?
-        ORDER BY received_at DESC
-    ''', (campaign_id,))
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
-    responses = []
-    for row in rows:
-        responses.append({
-            'id': row['id'],
-            'campaignId': row['campaign_id'],
-            'email': row['email'],
-            'response': row['response'], # This maps to 'snippet' for frontend compatibility
-            'snippet': row['response'],
-            'receivedAt': row['received_at'],
-            'subject': 'Customer Response'
-        })
-    return responses
-
-def get_db_connection():
-
-    """Get a database connection"""
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
-
-def generate_sample_analytics(campaign_id):
-    """Generate sample analytics data for a campaign"""
-    # Use campaign_id as seed for consistent random data per campaign
-    random.seed(hash(campaign_id) % (2**32))
-    emails_sent = random.randint(500, 5000)
-    emails_opened = random.randint(int(emails_sent * 0.15), int(emails_sent * 0.35))
-    replies = random.randint(int(emails_opened * 0.05), int(emails_opened * 0.15))
-    bounce_rate = round(random.uniform(1.0, 5.0), 1)
-    return {
-        'emailsSent': emails_sent,
-        'emailsOpened': emails_opened,
-        'replies': replies,
-        'bounceRate': bounce_rate
-    }
 
-def create_user_if_not_exists(user_data):
-    """Create a user if they don't exist, otherwise update them"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+def set_pending_action(campaign_id, pending_action, uow=None):
+    """Store the tool call that needs payment before it runs (None clears it)"""
+    conn = _connection_for(uow, campaign_db_path(campaign_id))
     
     try:
-        cursor.execute('''
-            INSERT INTO users (id, email, name, picture, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (
-            user_data['user_id'],
-            user_data['email'],
-            user_data['name'],
-            user_data['picture'],
-            datetime.now().isoformat()
-        ))
-        conn.commit()
-    except sqlite3.IntegrityError:
-        # User exists, update info
-        cursor.execute('''
-            UPDATE users 
-            SET name = ?, picture = ?
-            WHERE id = ?
-        ''', (user_data['name'], user_data['picture'], user_data['user_id']))
+        conn.execute(
+            'UPDATE campaigns SET pending_action = ? WHERE id = ?',
+            (serializer.dumps(pending_action) if pending_action is not None else None, campaign_id)
+        )
         conn.commit()
+        _invalidate_after_commit(uow, campaign_id)
+        return True
+    except Exception as e:
+        conn.rollback()
+        raise e
     finally:
         conn.close()
 
-def get_all_campaigns(user_id):
-    """Get all campaigns for a specific user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT c.*, 
-               a.emails_sent, a.emails_opened, a.replies, a.bounce_rate
+
+# =============================================================================
+# Campaign list (summary projection with keyset pagination)
+# =============================================================================
+
+# Heavy fields a caller can opt into: include name -> (response key, SQL expression)
+CAMPAIGN_SUMMARY_INCLUDES = {
+    'messages': ('messages', _messages_json_sql()),
+    'contacts': ('contacts', _CONTACTS_JSON_SQL),
+    'tool_calls': ('tool_calls', _TOOL_CALLS_JSON_SQL),
+}
+
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+
+def encode_campaign_cursor(created_at, campaign_id):
+    """Opaque cursor for the position just after (created_at, campaign_id)"""
+    raw = serializer.dumps([created_at, campaign_id]).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii')
+
+
+def decode_campaign_cursor(cursor):
+    try:
+        created_at, campaign_id = serializer.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        return str(created_at), str(campaign_id)
+    except (ValueError, TypeError, UnicodeEncodeError) as e:
+        raise InvalidCursorError(f"Invalid cursor: {cursor}") from e
+
+
+def get_campaign_summaries(user_id, limit=50, cursor=None, include=()):
+    """
+    One page of a user's campaigns, newest first, without the heavy columns.
+
+    Pages are keyed on (created_at, id) so each page is an index range scan
+    regardless of how deep it is. include may name any of
+    CAMPAIGN_SUMMARY_INCLUDES to add those fields. Returns
+    {'campaigns': [...], 'nextCursor': str or None}. Pages are served from the
+    campaign read cache when possible; treat them as read-only.
+    """
+    include = tuple(include)
+    return _cached_campaign_read(
+        ('summaries', user_id, limit, cursor, include),
+        lambda: _load_campaign_summaries(user_id, limit, cursor, include),
+        lambda page: _campaign_list_tags(user_id, page['campaigns'])
+    )
+
+
+def _load_campaign_summaries(user_id, limit, cursor, include):
+    unknown = set(include) - set(CAMPAIGN_SUMMARY_INCLUDES)
+    if unknown:
+        raise ValueError(f"Unknown include field(s): {', '.join(sorted(unknown))}")
+    
+    extra_columns = ''.join(
+        f',\n               {CAMPAIGN_SUMMARY_INCLUDES[name][1]} AS include_{name}'
+        for name in include
+    )
+    where = 'c.user_id = ?'
+    params = [user_id]
+    if cursor:
+        where += ' AND (c.created_at, c.id) < (?, ?)'
+        params.extend(decode_campaign_cursor(cursor))
+    params.append(limit + 1)
+    
+    conn = get_db_connection(user_db_path(user_id))
+    db_cursor = conn.cursor()
+    db_cursor.execute(f'''
+        SELECT c.id, c.name, c.created_at, c.executed, c.cost, c.status, c.pending_cost, c.archived_at,
+               a.emails_sent, a.emails_opened, a.replies, a.bounce_rate,
+               {_CONTACTS_COUNT_SQL} AS contacts_count{extra_columns}
         FROM campaigns c
         LEFT JOIN analytics a ON c.id = a.campaign_id
-        WHERE c.user_id = ?
-        ORDER BY c.created_at DESC
-    ''', (user_id,))
-    rows = cursor.fetchall()
+        WHERE {where}
+        ORDER BY c.created_at DESC, c.id DESC
+        LIMIT ?
+    ''', params)
+    rows = db_cursor.fetchall()
     conn.close()
     
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_campaign_cursor(rows[-1]['created_at'], rows[-1]['id'])
+    
     campaigns = []
     for row in rows:
-        row_dict = dict(row)
-        executed = bool(row_dict.get('executed') or row_dict.get('paid') or False)
-        
-        # Parse messages from JSON if stored
-        messages = []
-        if row_dict.get('messages'):
-            import json
-            try:
-                messages = json.loads(row_dict.get('messages'))
-            except:
-                pass
-        
+        executed = bool(row['executed'])
         campaign = {
             'id': row['id'],
             'name': row['name'],
@@ -239,10 +2237,15 @@ def get_all_campaigns(user_id):
             'executed': executed,
             'cost': row['cost'],
             'status': row['status'],
-            'contacts': row_dict.get('contacts'),
-            'messages': messages,  # Include conversation history
-            'pendingCost': row_dict.get('pending_cost') or 0  # Include pending payment cost
+            'contactsCount': row['contacts_count'],
+            'pendingCost': row['pending_cost'] or 0,
+            'archived': row['archived_at'] is not None
         }
+        for name in include:
+            value = row[f'include_{name}']
+            if name == 'messages':
+                value = serializer.loads(value) if value else []
+            campaign[CAMPAIGN_SUMMARY_INCLUDES[name][0]] = value
         if row['emails_sent'] is not None:
             campaign['analytics'] = {
                 'emailsSent': row['emails_sent'],
@@ -254,222 +2257,210 @@ def get_all_campaigns(user_id):
             campaign['analytics'] = generate_sample_analytics(row['id'])
         campaigns.append(campaign)
     
-    return campaigns
+    return {'campaigns': campaigns, 'nextCursor': next_cursor}
 
-def get_campaign_analytics(campaign_id, user_id):
-    """Get analytics for a specific campaign belonging to a user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT c.*, 
-               a.emails_sent, a.emails_opened, a.replies, a.bounce_rate
-        FROM campaigns c
-        LEFT JOIN analytics a ON c.id = a.campaign_id
-        WHERE c.id = ? AND c.user_id = ?
-    ''', (campaign_id, user_id))
-    row = cursor.fetchone()
-    conn.close()
-    
-    if not row:
-        return None
-    
-    row_dict = dict(row)
-    executed = bool(row_dict.get('executed') or row_dict.get('paid') or False)
-    
-    # Parse messages from JSON if stored
-    messages = []
-    if row_dict.get('messages'):
-        import json
-        try:
-            messages = json.loads(row_dict.get('messages'))
-        except:
-            pass
-    
-    campaign = {
-        'id': row['id'],
-        'name': row['name'],
-        'createdAt': row['created_at'],
-        'paid': executed,
-        'executed': executed,
-        'cost': row['cost'],
-        'status': row['status'],
-        'contacts': row_dict.get('contacts'),
-        'tool_calls': row_dict.get('tool_calls'),
-        'messages': messages,  # Include conversation history
-        'pendingCost': row_dict.get('pending_cost') or 0  # Include pending payment cost
-    }
-    
-    if row['emails_sent'] is not None:
-        campaign['analytics'] = {
-            'emailsSent': row['emails_sent'],
-            'emailsOpened': row['emails_opened'],
-            'replies': row['replies'],
-            'bounceRate': row['bounce_rate']
-        }
-    elif executed:
-        campaign['analytics'] = generate_sample_analytics(campaign_id)
-    
-    return campaign
 
-def create_campaign(campaign_id, name, user_id, cost=None):
-    """Create a new campaign for a user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        cursor.execute('''
-            INSERT INTO campaigns (id, name, created_at, executed, cost, status, user_id)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            campaign_id,
-            name,
-            datetime.now().isoformat(),
-            False,
-            cost,
-            'draft',
-            user_id
-        ))
-        conn.commit()
-        return True
-    except sqlite3.IntegrityError:
-        # If it exists, verify ownership before update (or assume it's fine for now)
-        cursor.execute('''
-            UPDATE campaigns 
-            SET name = ?, cost = ?
-            WHERE id = ? AND user_id = ?
-        ''', (name, cost, campaign_id, user_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+# =============================================================================
+# Full-text search
+# =============================================================================
 
-def update_campaign(campaign_id, user_id, name=None, executed=None, cost=None, status=None, contacts=None, messages=None, pending_cost=None):
-    """Update an existing campaign for a user"""
-    conn = get_db_connection()
+# Stored FTS5 tables whose rowid is the source row's id. `owner` (the
+# campaign's user_id, hex-encoded) is an indexed column so a user-scoped query is a posting
+# list intersection rather than a filter over every match.
+SEARCH_TOKENIZER = "unicode61 remove_diacritics 2"
+SEARCH_TYPES = ('responses', 'messages')
+
+# Text of a conversation turn; compressed rows are decoded by json_text(), so
+# inserting compressed turns needs a connection from get_db_connection()
+_MESSAGE_TEXT_SQL = (
+    "json_extract(CASE WHEN typeof({data}) = 'blob' THEN json_text({data}) ELSE {data} END, '$.content')"
+)
+# hex() keeps any user id a single token, so the owner filter is one posting list
+_OWNER_SQL = '(SELECT hex(user_id) FROM campaigns WHERE id = {campaign_id})'
+
+_SEARCH_SCHEMA = [
+    f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS responses_fts USING fts5(
+            response, email, owner, campaign_id UNINDEXED,
+            tokenize = '{SEARCH_TOKENIZER}'
+        )
+    ''',
+    f'''
+        CREATE VIRTUAL TABLE IF NOT EXISTS messages_fts USING fts5(
+            content, owner, campaign_id UNINDEXED, role UNINDEXED,
+            tokenize = '{SEARCH_TOKENIZER}'
+        )
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS campaign_responses_fts_insert AFTER INSERT ON campaign_responses BEGIN
+            INSERT INTO responses_fts (rowid, response, email, owner, campaign_id)
+            VALUES (new.id, new.response, new.email, {_OWNER_SQL.format(campaign_id='new.campaign_id')}, new.campaign_id);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS campaign_responses_fts_delete AFTER DELETE ON campaign_responses BEGIN
+            DELETE FROM responses_fts WHERE rowid = old.id;
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS campaign_responses_fts_update AFTER UPDATE OF response, email ON campaign_responses BEGIN
+            DELETE FROM responses_fts WHERE rowid = old.id;
+            INSERT INTO responses_fts (rowid, response, email, owner, campaign_id)
+            VALUES (new.id, new.response, new.email, {_OWNER_SQL.format(campaign_id='new.campaign_id')}, new.campaign_id);
+        END
+    ''',
+    f'''
+        CREATE TRIGGER IF NOT EXISTS campaign_messages_fts_insert AFTER INSERT ON campaign_messages BEGIN
+            INSERT INTO messages_fts (rowid, content, owner, campaign_id, role)
+            VALUES (new.id, {_MESSAGE_TEXT_SQL.format(data='new.data')},
+                    {_OWNER_SQL.format(campaign_id='new.campaign_id')}, new.campaign_id, new.role);
+        END
+    ''',
+    '''
+        CREATE TRIGGER IF NOT EXISTS campaign_messages_fts_delete AFTER DELETE ON campaign_messages BEGIN
+            DELETE FROM messages_fts WHERE rowid = old.id;
+        END
+    ''',
+]
+
+
+def _populate_search_index(cursor):
+    """(Re)fill both FTS tables from their source tables"""
+    cursor.execute('DELETE FROM responses_fts')
+    cursor.execute(f'''
+        INSERT INTO responses_fts (rowid, response, email, owner, campaign_id)
+        SELECT r.id, r.response, r.email, {_OWNER_SQL.format(campaign_id='r.campaign_id')}, r.campaign_id
+        FROM campaign_responses r
+    ''')
+    cursor.execute('DELETE FROM messages_fts')
+    cursor.execute(f'''
+        INSERT INTO messages_fts (rowid, content, owner, campaign_id, role)
+        SELECT m.id, {_MESSAGE_TEXT_SQL.format(data='m.data')},
+               {_OWNER_SQL.format(campaign_id='m.campaign_id')}, m.campaign_id, m.role
+        FROM campaign_messages m
+    ''')
+
+
+def rebuild_search_index(optimize=True):
+    """
+    Rebuild the FTS tables (of every shard) from scratch, after bulk edits
+    made outside this module, and optionally merge their segments for faster queries.
+    """
+    fan_out(_rebuild_search_index, optimize)
+
+
+def _rebuild_search_index(path, optimize):
+    conn = get_db_connection(path)
     cursor = conn.cursor()
     
-    updates = []
-    values = []
-    
-    if name is not None:
-        updates.append('name = ?')
-        values.append(name)
-    if executed is not None:
-        updates.append('executed = ?')
-        values.append(executed)
-    if cost is not None:
-        updates.append('cost = ?')
-        values.append(cost)
-    if status is not None:
-        updates.append('status = ?')
-        values.append(status)
-    if contacts is not None:
-        updates.append('contacts = ?')
-        values.append(contacts)
-    if messages is not None:
-        updates.append('messages = ?')
-        values.append(messages)
-    if pending_cost is not None:
-        updates.append('pending_cost = ?')
-        values.append(pending_cost)
-    
-    if not updates:
-        conn.close()
-        return True
-    
-    # Add WHERE clause values
-    values.append(campaign_id)
-    values.append(user_id)
-    
-    query = f'UPDATE campaigns SET {", ".join(updates)} WHERE id = ? AND user_id = ?'
-    
     try:
-        cursor.execute(query, values)
+        conn.execute('BEGIN IMMEDIATE')
+        _populate_search_index(cursor)
+        if optimize:
+            cursor.execute("INSERT INTO responses_fts (responses_fts) VALUES ('optimize')")
+            cursor.execute("INSERT INTO messages_fts (messages_fts) VALUES ('optimize')")
         conn.commit()
-        return True
     except Exception as e:
         conn.rollback()
         raise e
     finally:
         conn.close()
 
-def delete_campaign(campaign_id, user_id):
-    """Delete a campaign and its analytics if owned by user"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    try:
-        # Check ownership first
-        cursor.execute('SELECT id FROM campaigns WHERE id = ? AND user_id = ?', (campaign_id, user_id))
-        if not cursor.fetchone():
-            return False
 
-        # Delete analytics first (foreign key constraint)
-        cursor.execute('DELETE FROM analytics WHERE campaign_id = ?', (campaign_id,))
-        # Delete campaign
-        cursor.execute('DELETE FROM campaigns WHERE id = ? AND user_id = ?', (campaign_id, user_id))
-        conn.commit()
-        return True
-    except Exception as e:
-        conn.rollback()
-        raise e
-    finally:
-        conn.close()
+def _fts_phrase(text):
+    return '"' + text.replace('"', '""') + '"'
 
-def create_or_update_analytics(campaign_id, emails_sent=None, emails_opened=None, replies=None, bounce_rate=None):
-    """Create or update analytics for a campaign"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
-    
-    # Check if analytics exist
-    cursor.execute('SELECT id FROM analytics WHERE campaign_id = ?', (campaign_id,))
-    existing = cursor.fetchone()
-    
-    if existing:
-        # Update existing analytics
-        updates = []
-        values = []
-        
-        if emails_sent is not None:
-            updates.append('emails_sent = ?')
-            values.append(emails_sent)
-        if emails_opened is not None:
-            updates.append('emails_opened = ?')
-            values.append(emails_opened)
-        if replies is not None:
-            updates.append('replies = ?')
-            values.append(replies)
-        if bounce_rate is not None:
-            updates.append('bounce_rate = ?')
-            values.append(bounce_rate)
-        
-        if updates:
-            updates.append('updated_at = ?')
-            values.append(datetime.now().isoformat())
-            values.append(campaign_id)
-            
-            query = f'UPDATE analytics SET {", ".join(updates)} WHERE campaign_id = ?'
-            cursor.execute(query, values)
-    else:
-        # Create new analytics
-        cursor.execute('''
-            INSERT INTO analytics (campaign_id, emails_sent, emails_opened, replies, bounce_rate, updated_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (
-            campaign_id,
-            emails_sent or 0,
-            emails_opened or 0,
-            replies or 0,
-            bounce_rate or 0.0,
-            datetime.now().isoformat()
-        ))
+
+def build_search_query(text):
+    """
+    FTS5 query for free text typed by a user: every word must appear (in any
+    order); a trailing '*' on a word makes it a prefix match. FTS5 operators
+    and punctuation are treated as plain text. Returns None if no words remain.
+    """
+    terms = []
+    for word in text.split():
+        prefix = word.endswith('*')
+        tokens = ' '.join(re.findall(r'\w+', word))
+        if tokens:
+            terms.append(_fts_phrase(tokens) + ('*' if prefix else ''))
+    return ' AND '.join(terms) or None
+
+
+_SEARCH_QUERIES = {
+    'responses': '''
+        SELECT f.rowid AS id, f.campaign_id, c.name AS campaign_name, r.email, r.received_at AS at,
+               snippet(responses_fts, 0, ?, ?, '…', 16) AS snippet,
+               bm25(responses_fts, 2.0, 1.0, 0.0) AS score
+        FROM responses_fts f
+        JOIN campaigns c ON c.id = f.campaign_id
+        JOIN campaign_responses r ON r.id = f.rowid
+        WHERE responses_fts MATCH ? AND c.user_id = ?
+        ORDER BY score
+        LIMIT ?
+    ''',
+    'messages': '''
+        SELECT f.rowid AS id, f.campaign_id, c.name AS campaign_name, f.role, m.seq, m.created_at AS at,
+               snippet(messages_fts, 0, ?, ?, '…', 16) AS snippet,
+               bm25(messages_fts, 1.0, 0.0) AS score
+        FROM messages_fts f
+        JOIN campaigns c ON c.id = f.campaign_id
+        JOIN campaign_messages m ON m.id = f.rowid
+        WHERE messages_fts MATCH ? AND c.user_id = ?
+        ORDER BY score
+        LIMIT ?
+    ''',
+}
+
+# Columns searched per table; owner only scopes the query and is weighted 0 in bm25()
+_SEARCH_COLUMNS = {'responses': '{response email}', 'messages': '{content}'}
+
+
+def search_campaign_text(user_id, query, types=SEARCH_TYPES, limit=20, offset=0,
+                         highlight=('<mark>', '</mark>')):
+    """
+    Ranked full-text search over a user's customer responses and conversation turns.
+
+    query is free text (see build_search_query). Results from all requested
+    types are merged by BM25 score, best first, and paged with limit/offset.
+    Archived campaigns are not searched until they are rehydrated. Returns
+    {'results': [...], 'hasMore': bool}.
+    """
+    unknown = set(types) - set(SEARCH_TYPES)
+    if unknown:
+        raise ValueError(f"Unknown search type(s): {', '.join(sorted(unknown))}")
+    match = build_search_query(query)
+    if match is None:
+        return {'results': [], 'hasMore': False}
     
-    conn.commit()
+    # Every type must supply enough rows to fill this page after the merge
+    wanted = offset + limit + 1
+    conn = get_db_connection(user_db_path(user_id))
+    cursor = conn.cursor()
+    results = []
+    for search_type in types:
+        owner = str(user_id).encode('utf-8').hex()
+        scoped = f'owner : {owner} AND {_SEARCH_COLUMNS[search_type]} : ({match})'
+        cursor.execute(_SEARCH_QUERIES[search_type], (*highlight, scoped, user_id, wanted))
+        for row in cursor.fetchall():
+            result = {
+                'type': search_type[:-1],
+                'id': row['id'],
+                'campaignId': row['campaign_id'],
+                'campaignName': row['campaign_name'],
+                'snippet': row['snippet'],
+                'score': -row['score'],
+                'at': row['at']
+            }
+            if search_type == 'responses':
+                result['email'] = row['email']
+            else:
+                result['role'] = row['role']
+                result['seq'] = row['seq']
+            results.append(result)
     conn.close()
-    return True
-
-# Initialize database on import
-init_db()
+    
+    results.sort(key=lambda r: r['score'], reverse=True)
+    return {
+        'results': results[offset:offset + limit],
+        'hasMore': len(results) > offset + limit
+    }
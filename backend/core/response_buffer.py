@@ -0,0 +1,173 @@
+"""
+Write-behind buffer for customer responses (/api/response).
+
+Clicks from a campaign arrive in bursts. Instead of one INSERT + commit per
+click, responses are queued in memory and a background thread writes them in
+batched transactions whenever RESPONSE_BATCH_SIZE rows are waiting or
+RESPONSE_FLUSH_INTERVAL_MS has passed, whichever comes first.
+
+RESPONSE_DURABILITY picks the trade-off:
+  'write_behind'  acknowledge as soon as the response is queued (fastest; a
+                  crash can lose up to one flush interval of responses)
+  'group_commit'  acknowledge once the batch holding the response has
+                  committed (durable on ack, still one transaction per batch)
+  'immediate'     write each response in its own transaction (legacy)
+
+close() flushes everything still queued; the server calls it on shutdown.
+"""
+
+import logging
+import os
+import threading
+from concurrent.futures import Future
+from datetime import datetime
+
+from core import db
+
+logger = logging.getLogger(__name__)
+
+RESPONSE_DURABILITY = os.getenv('RESPONSE_DURABILITY', 'write_behind')
+RESPONSE_BATCH_SIZE = int(os.getenv('RESPONSE_BATCH_SIZE', '500'))
+RESPONSE_FLUSH_INTERVAL_MS = int(os.getenv('RESPONSE_FLUSH_INTERVAL_MS', '200'))
+
+DURABILITY_MODES = ('write_behind', 'group_commit', 'immediate')
+
+
+class ResponseWriteBuffer:
+    """Queue customer responses and write them in batched transactions"""
+
+    def __init__(self, durability=RESPONSE_DURABILITY, batch_size=RESPONSE_BATCH_SIZE,
+                 flush_interval_ms=RESPONSE_FLUSH_INTERVAL_MS):
+        if durability not in DURABILITY_MODES:
+            raise ValueError(f"Unknown response durability mode '{durability}', expected one of {DURABILITY_MODES}")
+        self.durability = durability
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = max(1, flush_interval_ms) / 1000
+        self._pending = []
+        self._cond = threading.Condition()
+        self._flush_lock = threading.Lock()
+        self._closed = False
+        self._thread = None
+        self.written = 0
+        self.failed = 0
+
+    def start(self):
+        """Start the background flusher (not needed in 'immediate' mode)"""
+        if self.durability == 'immediate' or self._thread is not None:
+            return
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='response-flusher', daemon=True)
+        self._thread.start()
+
+    def submit(self, campaign_id, email, response):
+        """
+        Queue one response and return a Future.
+
+        The Future resolves to True once the response is committed (or False
+        if it could not be stored). In 'write_behind' mode callers need not
+        wait for it.
+        """
+        future = Future()
+        row = (campaign_id, email, response, datetime.now().isoformat())
+        if self.durability == 'immediate' or self._thread is None:
+            self._write([(row, future)])
+            return future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("Response buffer is closed")
+            self._pending.append((row, future))
+            # group_commit callers are waiting, so flush right away; rows that
+            # arrive while that commit runs form the next batch
+            if self._should_flush():
+                self._cond.notify()
+        return future
+
+    def pending_count(self):
+        with self._cond:
+            return len(self._pending)
+
+    def flush(self):
+        """Write everything queued so far; returns the number of rows committed"""
+        with self._flush_lock:
+            written = 0
+            while True:
+                with self._cond:
+                    batch = self._pending[:self.batch_size]
+                    del self._pending[:self.batch_size]
+                if not batch:
+                    return written
+                written += self._write(batch)
+
+    def close(self):
+        """Stop the flusher and write whatever is still queued"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.flush()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                if not self._closed and not self._should_flush():
+                    self._cond.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self.flush()
+            except Exception as e:
+                logger.exception(f"Response flush failed: {e}")
+            if closed:
+                return
+
+    def _should_flush(self):
+        if self.durability == 'group_commit':
+            return bool(self._pending)
+        return len(self._pending) >= self.batch_size
+
+    def _write(self, batch):
+        """Commit a batch in one transaction, falling back to row-by-row so one bad row can't sink the rest"""
+        rows = [row for row, _ in batch]
+        try:
+            db.add_campaign_responses_batch(rows)
+            results = [True] * len(batch)
+        except Exception as e:
+            logger.error(f"Batched response write failed, retrying {len(batch)} rows individually: {e}")
+            results = []
+            for row in rows:
+                try:
+                    db.add_campaign_responses_batch([row])
+                    results.append(True)
+                except Exception as row_error:
+                    logger.error(f"Dropping response for campaign {row[0]} from {row[1]}: {row_error}")
+                    results.append(False)
+        for (_, future), ok in zip(batch, results):
+            future.set_result(ok)
+        stored = sum(results)
+        self.written += stored
+        self.failed += len(results) - stored
+        return stored
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def get_response_buffer():
+    """Process-wide buffer, started on first use"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = ResponseWriteBuffer()
+            _buffer.start()
+        return _buffer
+
+
+def close_response_buffer():
+    """Flush and stop the process-wide buffer (server shutdown)"""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is not None:
+            _buffer.close()
+            _buffer = None
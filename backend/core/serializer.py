@@ -0,0 +1,114 @@
+"""
+JSON serialization for DB blobs, tool results and API responses.
+
+Uses orjson when it is installed and the standard library otherwise.
+JSON_BACKEND ('auto', 'orjson' or 'stdlib') forces one; set_backend() switches
+at runtime (benchmarks, debugging). Both backends accept and produce the same
+JSON, so data written by one is read by the other.
+"""
+
+import json
+import os
+from datetime import date, datetime, time
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+JSON_BACKEND = os.getenv('JSON_BACKEND', 'auto')
+
+JSONDecodeError = json.JSONDecodeError
+
+
+def _default(obj):
+    """Encode the non-JSON types our payloads carry (mirrors what orjson does natively)"""
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+class StdlibBackend:
+    name = 'stdlib'
+
+    def dumps(self, obj, indent=None):
+        return json.dumps(obj, indent=indent, default=_default)
+
+    def dumpb(self, obj, indent=None):
+        return json.dumps(obj, indent=indent, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+    def loads(self, data):
+        return json.loads(data)
+
+
+class OrjsonBackend:
+    name = 'orjson'
+
+    def __init__(self):
+        if orjson is None:
+            raise RuntimeError("JSON_BACKEND=orjson requires the 'orjson' package")
+        self._fallback = StdlibBackend()
+
+    def dumps(self, obj, indent=None):
+        return self.dumpb(obj, indent).decode('utf-8')
+
+    def dumpb(self, obj, indent=None):
+        option = orjson.OPT_NON_STR_KEYS | (orjson.OPT_INDENT_2 if indent else 0)
+        try:
+            return orjson.dumps(obj, default=_default, option=option)
+        except orjson.JSONEncodeError:
+            # e.g. integers wider than 64 bits, which the stdlib encoder handles
+            return self._fallback.dumpb(obj, indent)
+
+    def loads(self, data):
+        return orjson.loads(data)
+
+
+BACKENDS = {'stdlib': StdlibBackend, 'orjson': OrjsonBackend}
+
+_backend = None
+
+
+def set_backend(name='auto'):
+    """Select 'orjson', 'stdlib' or 'auto' (orjson if installed)"""
+    global _backend
+    if name == 'auto':
+        name = 'orjson' if orjson is not None else 'stdlib'
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown JSON backend '{name}', expected one of {sorted(BACKENDS)} or 'auto'")
+    _backend = BACKENDS[name]()
+    return _backend.name
+
+
+def backend_name():
+    return _backend.name
+
+
+def dumps(obj, indent=None):
+    """Serialize to a JSON str"""
+    return _backend.dumps(obj, indent)
+
+
+def dumpb(obj, indent=None):
+    """Serialize to compact UTF-8 JSON bytes (HTTP bodies)"""
+    return _backend.dumpb(obj, indent)
+
+
+def loads(data):
+    """Parse JSON from str or bytes"""
+    return _backend.loads(data)
+
+
+def canonical(obj):
+    """
+    Compact UTF-8 JSON bytes with sorted keys, the same whichever backend is
+    selected, so equal values always encode (and hash) the same
+    """
+    return json.dumps(obj, sort_keys=True, ensure_ascii=False, separators=(',', ':'), default=_default).encode('utf-8')
+
+
+set_backend(JSON_BACKEND)
@@ -0,0 +1,139 @@
+"""
+Administration of sharded databases (see "Sharding" in core/db.py).
+
+shard_stats() fans a row count out to every shard. split_into_shards() is the
+one-time move of an existing single-file database to DB_SHARDS: it copies
+each user's rows from DB_PATH into their shard and fills the catalog's
+campaign directory. Rows keep their ids, so it can be re-run after an
+interruption (rows already copied are skipped). The rows also stay in
+DB_PATH; nothing reads them there once the directory is filled, so they can
+be deleted after the shards have been checked and backed up.
+
+Usage (from backend/):
+    DB_SHARDS=8 python -m core.shards split
+    DB_SHARDS=8 python -m core.shards stats
+"""
+
+import argparse
+import os
+
+from core import db
+
+# Tables counted by shard_stats()
+STAT_TABLES = ('users', 'campaigns', 'contacts', 'campaign_messages', 'campaign_responses')
+
+# Copy order and the rows of each table that belong to the users in split_users
+_SPLIT_TABLES = (
+    ('users', 'id IN (SELECT id FROM split_users)'),
+    ('campaigns', 'user_id IN (SELECT id FROM split_users)'),
+    ('contacts', 'id IN (SELECT contact_id FROM source.campaign_contacts '
+                 'WHERE campaign_id IN (SELECT id FROM main.campaigns))'),
+    ('campaign_contacts', 'campaign_id IN (SELECT id FROM main.campaigns)'),
+    ('campaign_messages', 'campaign_id IN (SELECT id FROM main.campaigns)'),
+    ('campaign_tool_calls', 'campaign_id IN (SELECT id FROM main.campaigns)'),
+    ('campaign_responses', 'campaign_id IN (SELECT id FROM main.campaigns)'),
+    ('analytics', 'campaign_id IN (SELECT id FROM main.campaigns)'),
+)
+
+
+class ShardingDisabledError(RuntimeError):
+    """A sharding operation was asked for while DB_SHARDS is off"""
+
+
+def _count_rows(path):
+    conn = db.get_db_connection(path)
+    try:
+        counts = {table: conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0] for table in STAT_TABLES}
+    finally:
+        conn.close()
+    file_path = path.partition('?')[0].removeprefix('file:')
+    counts['bytes'] = os.path.getsize(file_path) if os.path.exists(file_path) else None
+    return counts
+
+
+def shard_stats():
+    """{path: row counts and file size} for every shard (or DB_PATH alone when sharding is off)"""
+    return dict(zip(db.all_db_paths(), db.fan_out(_count_rows)))
+
+
+def _copy_users(path, user_ids):
+    """Copy user_ids' rows from DB_PATH into the shard at path in one transaction; returns campaigns copied"""
+    conn = db.get_db_connection(path)
+    conn.execute('ATTACH DATABASE ? AS source', (db._resolve_path(db.DB_PATH),))
+    try:
+        conn.execute('BEGIN IMMEDIATE')
+        conn.execute('CREATE TEMP TABLE split_users (id TEXT PRIMARY KEY)')
+        conn.executemany('INSERT OR IGNORE INTO split_users (id) VALUES (?)', [(user_id,) for user_id in user_ids])
+        copied = 0
+        for table, where in _SPLIT_TABLES:
+            source_columns = {row[1] for row in conn.execute(f'PRAGMA source.table_info({table})')}
+            columns = ', '.join(row[1] for row in conn.execute(f'PRAGMA main.table_info({table})')
+                                if row[1] in source_columns)
+            # Triggers on the shard fill its search index as messages and responses arrive
+            cursor = conn.execute(f'INSERT OR IGNORE INTO main.{table} ({columns}) '
+                                  f'SELECT {columns} FROM source.{table} WHERE {where}')
+            if table == 'campaigns':
+                copied = cursor.rowcount
+        conn.execute('DROP TABLE split_users')
+        conn.commit()
+        return copied
+    except Exception as e:
+        conn.rollback()
+        raise e
+    finally:
+        conn.execute('DETACH DATABASE source')
+        conn.close()
+
+
+def split_into_shards():
+    """
+    Copy every user's rows from DB_PATH into their shard and record each
+    campaign's owner in the catalog. Returns {'users': n, 'campaigns': n, 'shards': n}.
+    """
+    if not db.sharding_enabled():
+        raise ShardingDisabledError('Set DB_SHARDS before splitting the database')
+    db.init_db()
+    conn = db.get_db_connection(db.DB_PATH)
+    try:
+        user_ids = [row[0] for row in conn.execute(
+            'SELECT id FROM users UNION SELECT user_id FROM campaigns WHERE user_id IS NOT NULL'
+        )]
+    finally:
+        conn.close()
+
+    by_path = {}
+    for user_id in user_ids:
+        by_path.setdefault(db.user_db_path(user_id), []).append(user_id)
+    campaigns = sum(_copy_users(path, shard_users) for path, shard_users in by_path.items())
+
+    conn = db.get_db_connection(db.DB_PATH)
+    try:
+        conn.execute('''
+            INSERT OR IGNORE INTO campaign_directory (campaign_id, user_id)
+            SELECT id, user_id FROM campaigns WHERE user_id IS NOT NULL
+        ''')
+        conn.commit()
+    finally:
+        conn.close()
+    db.clear_campaign_cache()
+    return {'users': len(user_ids), 'campaigns': campaigns, 'shards': len(by_path)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Inspect or populate the DB_SHARDS databases')
+    parser.add_argument('command', choices=('stats', 'split'))
+    args = parser.parse_args()
+
+    if args.command == 'split':
+        result = split_into_shards()
+        print(f"Copied {result['users']} users and {result['campaigns']} campaigns into {result['shards']} shards")
+        return
+    db.init_db()
+    for path, counts in shard_stats().items():
+        size = counts.pop('bytes')
+        size = f'{size / 1e6:,.1f} MB' if size is not None else 'in memory'
+        print(f"{path}  {size}  " + '  '.join(f'{table} {count:,}' for table, count in counts.items()))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+"""
+Throwaway databases for tests and scripts.
+
+    from core import db
+    from core.testing import fresh_database
+
+    with fresh_database():
+        db.create_user_if_not_exists({'user_id': '1', 'email': 'a@example.com', 'name': 'A', 'picture': None})
+
+fresh_database() points core.db at a new, empty, fully migrated database and
+puts the previous DB_PATH back afterwards; pooled connections and the
+in-process caches are reset on the way in and out. The schema is migrated once
+per process into a template that every fresh database is copied from with
+the SQLite backup API, so a test pays a page copy, not a dozen migrations.
+
+By default the database is in memory (shared cache, so every pooled
+connection in the process sees it). Shared-cache databases take table-level
+locks and fail with "database table is locked" instead of waiting, so tests
+that write from several threads at once should use memory=False, which gives
+a temporary file instead. With DB_SHARDS set, shards are created (and
+migrated) next to the fresh database as they are first used.
+
+backend/conftest.py wraps it as the pytest fixtures `database` (in memory)
+and `file_database` (memory=False); each yields the fresh DB_PATH.
+"""
+
+import contextlib
+import io
+import itertools
+import os
+import shutil
+import tempfile
+import threading
+
+from core import db
+
+_template = None
+_template_lock = threading.Lock()
+_counter = itertools.count()
+
+
+def _reset_state():
+    db.close_all_connections()
+    db.clear_campaign_cache()
+    db._user_sync_cache.clear()
+
+
+@contextlib.contextmanager
+def _using(path):
+    previous = db.DB_PATH
+    _reset_state()
+    db.DB_PATH = path
+    try:
+        yield
+    finally:
+        _reset_state()
+        db.DB_PATH = previous
+
+
+def _schema_template():
+    """Connection to an in-memory database with every migration applied, built on first use"""
+    global _template
+    with _template_lock:
+        if _template is None:
+            path = db.memory_db_path(f'arc_template_{os.getpid()}')
+            with _using(path), contextlib.redirect_stdout(io.StringIO()):
+                db._migrate(path)
+            _template = db._connect(path, check_same_thread=False)
+        return _template
+
+
+@contextlib.contextmanager
+def fresh_database(memory=True):
+    """Use a new schema-initialized database for the duration of the block; yields its DB_PATH"""
+    template = _schema_template()
+    workdir = None
+    if memory:
+        path = db.memory_db_path(f'arc_test_{os.getpid()}_{next(_counter)}')
+    else:
+        workdir = tempfile.mkdtemp(prefix='arc_test_')
+        path = os.path.join(workdir, 'campaigns.db')
+
+    target = db._connect(path)
+    try:
+        with _template_lock:
+            template.backup(target)
+    finally:
+        target.close()
+
+    shards = []
+    try:
+        with _using(path):
+            try:
+                yield path
+            finally:
+                shards = [shard for shard in db.all_db_paths() if shard != path]
+    finally:
+        if workdir is None:
+            for memory_path in (path, db.companion_db_path('_archive', path), *shards):
+                db.drop_memory_database(memory_path)
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
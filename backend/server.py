@@ -1,14 +1,14 @@
 from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel
 from typing import Optional
+import asyncio
 import sys
 import os
 import time
 import time
-import json
 import logging
 from dotenv import load_dotenv
 
@@ -45,21 +45,97 @@ from core.wallet_utils import (
     get_wallet_info,
     request_faucet
 )
-from core.db import (
-    get_all_campaigns, 
+from core.async_db import (
+    get_campaign_summaries,
     get_campaign_analytics,
     create_campaign,
     update_campaign,
     delete_campaign,
-    create_or_update_analytics,
     create_user_if_not_exists,
-    add_campaign_response,
-    get_campaign_responses
+    get_campaign_responses,
+    get_campaign_responses_since,
+    append_campaign_messages,
+    get_campaign_messages,
+    get_campaign_contacts_page,
+    user_owns_campaign,
+    search_campaign_text,
+    init_db,
+    recode_json_rows,
+    run_in_db_thread,
+    run_blocking,
+    shutdown as shutdown_db_executor
 )
+from core.response_buffer import get_response_buffer, close_response_buffer
+from core.db import campaign_cache_stats, all_db_paths, DB_JSON_COMPRESSION, JSON_DATA_TABLES, SEARCH_TYPES, UnitOfWork
+from core.archive import archive_campaigns, ARCHIVE_INTERVAL_HOURS
+from core.backup import backup_snapshot, BACKUP_INTERVAL_HOURS
+from core.export import export_stream, ExportFormatUnavailableError, MEDIA_TYPES as EXPORT_MEDIA_TYPES
 from core.auth import verify_google_token
+from core import serializer
 from fastapi import Header, Depends
 
-app = FastAPI(title="Arc Wardens API", version="1.0.0")
+class SerializerJSONResponse(JSONResponse):
+    """JSONResponse rendered through core.serializer (orjson when installed)"""
+
+    def render(self, content) -> bytes:
+        return serializer.dumpb(content)
+
+app = FastAPI(title="Arc Wardens API", version="1.0.0", default_response_class=SerializerJSONResponse)
+
+@app.on_event("startup")
+async def apply_database_migrations():
+    """Bring the database schema up to date once per worker"""
+    await init_db()
+    if DB_JSON_COMPRESSION != 'none':
+        asyncio.create_task(recode_stored_json())
+    if ARCHIVE_INTERVAL_HOURS > 0:
+        asyncio.create_task(archive_old_campaigns_periodically())
+    if BACKUP_INTERVAL_HOURS > 0:
+        asyncio.create_task(backup_database_periodically())
+
+async def archive_old_campaigns_periodically():
+    """Move old campaigns to cold storage every ARCHIVE_INTERVAL_HOURS"""
+    while True:
+        try:
+            result = await run_in_db_thread(archive_campaigns)
+            if result['archived']:
+                logger.info(f"Archived {result['archived']} campaigns, released {result['freedPages']} pages")
+        except Exception as e:
+            logger.error(f"Campaign archival failed: {e}")
+        await asyncio.sleep(ARCHIVE_INTERVAL_HOURS * 3600)
+
+async def backup_database_periodically():
+    """Take an online snapshot every BACKUP_INTERVAL_HOURS"""
+    while True:
+        await asyncio.sleep(BACKUP_INTERVAL_HOURS * 3600)
+        try:
+            # Its own thread rather than the DB pool: a large copy runs for minutes
+            result = await asyncio.to_thread(backup_snapshot)
+            logger.info(f"Backed up {result['pages']} pages to {', '.join(result['snapshots'])}")
+        except Exception as e:
+            logger.error(f"Database backup failed: {e}")
+
+async def recode_stored_json():
+    """Lazily compress JSON rows written before DB_JSON_COMPRESSION was enabled"""
+    changed = 0
+    try:
+        for path in all_db_paths():
+            for table in JSON_DATA_TABLES:
+                after_id = 0
+                while after_id is not None:
+                    after_id, rewritten = await recode_json_rows(table, after_id, batch_size=200, path=path)
+                    changed += rewritten
+                    await asyncio.sleep(0.05)  # leave the DB threads to requests
+        if changed:
+            logger.info(f"Re-encoded {changed} stored JSON rows with {DB_JSON_COMPRESSION}")
+    except Exception as e:
+        logger.error(f"Re-encoding stored JSON rows failed: {e}")
+
+@app.on_event("shutdown")
+async def stop_database_executor():
+    """Flush buffered responses, let queued DB calls finish and stop the DB thread pool"""
+    await run_in_db_thread(close_response_buffer)
+    shutdown_db_executor()
 
 # Add exception handler for validation errors
 
@@ -76,14 +152,15 @@ async def receive_customer_response(data: CustomerResponseRequest):
     """
     print(f"Received response from {data.email} for campaign {data.campaignId}: {data.response}")
     
-    # Save response to database
+    # Queue response for the batched writer (also bumps the campaign's reply counter)
     try:
-        success = add_campaign_response(data.campaignId, data.email, data.response)
-        if success:
+        buffer = get_response_buffer()
+        if buffer.durability == 'immediate':
+            future = await run_in_db_thread(buffer.submit, data.campaignId, data.email, data.response)
+        else:
+            future = buffer.submit(data.campaignId, data.email, data.response)
+        if buffer.durability != 'write_behind' and await asyncio.wrap_future(future):
             logger.info(f"Saved response for campaign {data.campaignId}")
-            
-            # TODO: Increment reply count in analytics properly
-            # For now, we rely on the list view
     except Exception as e:
         logger.error(f"Failed to save response: {e}")
 
@@ -163,7 +240,8 @@ class CampaignUpdateRequest(BaseModel):
     paid: Optional[bool] = None
     cost: Optional[float] = None
     status: Optional[str] = None
-    messages: Optional[list] = None
+    messages: Optional[list] = None  # Full history (legacy clients); only unseen turns are stored
+    newMessages: Optional[list] = None  # Turns to append to the stored history
     pendingCost: Optional[float] = None
 
 class AuthRequest(BaseModel):
@@ -189,7 +267,7 @@ async def get_current_user(authorization: Optional[str] = Header(None), x_google
         
     user_data['access_token'] = x_google_access_token
     # Create or update user in DB
-    create_user_if_not_exists(user_data)
+    await create_user_if_not_exists(user_data)
     
     return user_data
 
@@ -201,7 +279,7 @@ async def auth_google(request: AuthRequest):
     if not user_data:
          raise HTTPException(status_code=401, detail="Invalid token")
     
-    create_user_if_not_exists(user_data)
+    await create_user_if_not_exists(user_data)
     return {"user": user_data}
 
 @app.get("/api/wallet/balance")
@@ -338,7 +416,7 @@ async def campaign_chat(request: CampaignChatRequest, user: dict = Depends(get_c
     """Handle campaign chat messages using LangChain agent"""
     try:
         # Verify campaign ownership
-        campaign = get_campaign_analytics(request.campaignId, user['user_id'])
+        campaign = await get_campaign_analytics(request.campaignId, user['user_id'])
         if not campaign:
             raise HTTPException(status_code=403, detail="Access denied to this campaign")
 
@@ -369,8 +447,10 @@ async def campaign_chat(request: CampaignChatRequest, user: dict = Depends(get_c
                 agent = get_agent()
                 
                 logger.info(f"Calling CampaignAgent for campaign {request.campaignId}...")
-                # Pass campaign context so tools can associate data with the campaign
-                result = agent.chat(
+                # Pass campaign context so tools can associate data with the campaign; the
+                # agent run (tools, HTTP, the LLM) happens off the event loop with this context
+                result = await run_blocking(
+                    agent.chat,
                     message=request.message,
                     conversation_history=request.conversationHistory,
                     campaign_id=request.campaignId,
@@ -407,104 +487,128 @@ async def campaign_pay(request: CampaignPayRequest, user: dict = Depends(get_cur
         access_token = user.get('access_token')
         
         # Get conversation history from campaign
-        campaign = get_campaign_analytics(request.campaignId, user['user_id'])
-        conversation_history = []
-        if campaign and campaign.get('messages'):
-            try:
-                msgs = campaign.get('messages')
-                if isinstance(msgs, str):
-                    conversation_history = json.loads(msgs)
-                else:
-                    conversation_history = msgs
-            except:
-                pass
-        
-        # Set context for tool execution
-        token_reset = current_token_var.set(access_token)
-        user_reset = current_user_var.set(user)
-        
+        campaign = await get_campaign_analytics(request.campaignId, user['user_id'])
+        if not campaign:
+            raise HTTPException(status_code=404, detail="Campaign not found")
+
+        # The agent claims the pending action in its own short transaction, so a
+        # second payment cannot run the tool again. The writes that record the run
+        # (next pending action, tool log, paid flag and cost) share this unit of
+        # work and commit together; its transaction opens at the first of them,
+        # after the tools and the LLM have finished.
+        uow = await run_in_db_thread(UnitOfWork, user_id=user['user_id'])
         try:
-            agent = get_agent()
+            conversation_history = []
+            if campaign and campaign.get('messages'):
+                try:
+                    msgs = campaign.get('messages')
+                    if isinstance(msgs, str):
+                        conversation_history = serializer.loads(msgs)
+                    else:
+                        conversation_history = msgs
+                except:
+                    pass
             
-            # Execute the pending action and CONTINUE the workflow
-            result = agent.execute_pending_action(
-                campaign_id=request.campaignId,
-                user_id=user['user_id'],
-                conversation_history=conversation_history
-            )
+            # Set context for tool execution
+            token_reset = current_token_var.set(access_token)
+            user_reset = current_user_var.set(user)
             
-            if result.get('success'):
-                # Update campaign as paid/executed and add cost
-                update_campaign(
-                    request.campaignId,
+            try:
+                agent = get_agent()
+                
+                # Execute the pending action and CONTINUE the workflow, off the event loop
+                result = await run_blocking(
+                    agent.execute_pending_action,
+                    campaign_id=request.campaignId,
                     user_id=user['user_id'],
-                    executed=True,  # Mark as paid for analytics
-                    cost=request.amount
+                    conversation_history=conversation_history,
+                    uow=uow
                 )
                 
-                # Check if there's another payment required (e.g., filter after search)
-                if result.get('requires_payment'):
-                    return {
-                        'success': True,
-                        'message': result.get('message'),
-                        'response': result.get('response'),
-                        'cost': result.get('cost', 0),
-                        'requires_payment': True,
-                        'amount': request.amount,
-                        'transactionId': f'tx_{request.campaignId}_{int(time.time())}'
+                if result.get('success'):
+                    # Update campaign as paid/executed and add cost
+                    await update_campaign(
+                        request.campaignId,
+                        user_id=user['user_id'],
+                        executed=True,  # Mark as paid for analytics
+                        cost=request.amount,
+                        uow=uow
+                    )
+                    
+                    # Check if there's another payment required (e.g., filter after search)
+                    if result.get('requires_payment'):
+                        response = {
+                            'success': True,
+                            'message': result.get('message'),
+                            'response': result.get('response'),
+                            'cost': result.get('cost', 0),
+                            'requires_payment': True,
+                            'amount': request.amount,
+                            'transactionId': f'tx_{request.campaignId}_{int(time.time())}'
+                        }
+                    else:
+                        # Sent-email counts are recorded by gmail_tool itself as it sends
+                        response = {
+                            'success': True,
+                            'message': result.get('message', 'Payment processed and action completed.'),
+                            'response': result.get('response'),
+                            'amount': request.amount,
+                            'transactionId': f'tx_{request.campaignId}_{int(time.time())}'
+                        }
+                else:
+                    response = {
+                        'success': False,
+                        'message': result.get('message', 'Failed to execute action.'),
+                        'error': result.get('error')
                     }
                 
-                # If this was an email action, update analytics
-                if result.get('tool_name') == 'gmail_tool':
-                    try:
-                        response_data = json.loads(result.get('response', '{}'))
-                        if response_data.get('status') == 'success':
-                            results = response_data.get('results', [])
-                            emails_sent = sum(1 for r in results if r.get('result', {}).get('status') == 'success')
-                            create_or_update_analytics(
-                                request.campaignId,
-                                emails_sent=emails_sent,
-                                emails_opened=0,
-                                replies=0,
-                                bounce_rate=0.0
-                            )
-                    except:
-                        pass
-                
-                return {
-                    'success': True,
-                    'message': result.get('message', 'Payment processed and action completed.'),
-                    'response': result.get('response'),
-                    'amount': request.amount,
-                    'transactionId': f'tx_{request.campaignId}_{int(time.time())}'
-                }
-            else:
-                return {
-                    'success': False,
-                    'message': result.get('message', 'Failed to execute action.'),
-                    'error': result.get('error')
-                }
+                # A failed run may still have executed the paid tool; keep its record
+                await run_in_db_thread(uow.commit)
+                return response
+            finally:
+                current_token_var.reset(token_reset)
+                current_user_var.reset(user_reset)
         finally:
-            current_token_var.reset(token_reset)
-            current_user_var.reset(user_reset)
+            uow.close()
             
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error processing payment: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/campaigns/{campaign_id}/verify_status")
-async def verify_campaign_status(campaign_id: str, user: dict = Depends(get_current_user)):
-    """Check for replies and update status"""
+async def verify_campaign_status(
+    campaign_id: str,
+    since_id: Optional[int] = Query(None, ge=0, description="Only replies with a larger id (latest_id of the previous poll)"),
+    limit: Optional[int] = Query(None, ge=1, le=500, description="Maximum replies per poll"),
+    user: dict = Depends(get_current_user)
+):
+    """Check for replies; pass since_id to get only the ones not seen yet"""
     try:
-        # Fetch responses from our local database
-        db_replies = get_campaign_responses(campaign_id)
+        # Ownership first: reading replies can rehydrate an archived campaign
+        if not await user_owns_campaign(campaign_id, user['user_id']):
+            raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
+        if since_id is None and limit is None:
+            # Full list, newest first (original behaviour)
+            db_replies = await get_campaign_responses(campaign_id)
+            latest_id = max((r['id'] for r in db_replies), default=0)
+            has_more = False
+        else:
+            # Incremental poll: only rows after since_id, oldest first
+            page = await get_campaign_responses_since(campaign_id, since_id=since_id or 0, limit=limit or 100)
+            db_replies, latest_id, has_more = page['replies'], page['latestId'], page['hasMore']
         
-        return {
+        return SerializerJSONResponse({
             "success": True,
             "data": {
-                "replies": db_replies
+                "replies": db_replies,
+                "latest_id": latest_id,
+                "has_more": has_more
             }
-        }
+        })
+    except HTTPException:
+        raise
     except Exception as e:
         logger.exception(f"Error checking status: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
@@ -522,7 +626,7 @@ async def campaign_create(request: CampaignCreateRequest, user: dict = Depends(g
                 # Use first 50 chars as name
                 campaign_name = first_user_msg['content'][:50]
         
-        create_campaign(request.campaignId, campaign_name, user['user_id'])
+        await create_campaign(request.campaignId, campaign_name, user['user_id'])
         
         return {
             'success': True,
@@ -538,21 +642,18 @@ async def campaign_create(request: CampaignCreateRequest, user: dict = Depends(g
 async def campaign_update(request: CampaignUpdateRequest, user: dict = Depends(get_current_user)):
     """Update a campaign in the database"""
     try:
-        # Serialize messages to JSON if provided
-        messages_json = None
-        if request.messages is not None:
-            messages_json = json.dumps(request.messages)
-        
-        update_campaign(
+        await update_campaign(
             request.campaignId,
             user_id=user['user_id'],
             name=request.name,
             executed=request.paid,
             cost=request.cost,
             status=request.status,
-            messages=messages_json,
+            messages=request.messages,
             pending_cost=request.pendingCost
         )
+        if request.newMessages:
+            await append_campaign_messages(request.campaignId, user['user_id'], request.newMessages)
         return {
             'success': True,
             'message': f'Campaign {request.campaignId} updated successfully'
@@ -565,7 +666,7 @@ async def campaign_update(request: CampaignUpdateRequest, user: dict = Depends(g
 async def campaign_delete(campaignId: str = Query(..., description="Campaign ID to delete"), user: dict = Depends(get_current_user)):
     """Delete a campaign from the database"""
     try:
-        success = delete_campaign(campaignId, user['user_id'])
+        success = await delete_campaign(campaignId, user['user_id'])
         if not success:
             raise HTTPException(status_code=404, detail=f"Campaign {campaignId} not found or access denied")
             
@@ -581,36 +682,149 @@ async def campaign_delete(campaignId: str = Query(..., description="Campaign ID
 async def get_campaign_analytics_endpoint(campaign_id: str, user: dict = Depends(get_current_user)):
     """Get analytics for a specific campaign"""
     try:
-        campaign = get_campaign_analytics(campaign_id, user['user_id'])
+        campaign = await get_campaign_analytics(campaign_id, user['user_id'])
         if not campaign:
             raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
-        return {
+        # Plain JSON types straight from core.db; skip FastAPI's jsonable_encoder pass
+        return SerializerJSONResponse({
             'success': True,
             'campaign': campaign
-        }
+        })
     except HTTPException:
         raise
     except Exception as e:
         logger.exception(f"Error getting campaign analytics: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/campaigns/{campaign_id}/messages")
+async def get_campaign_messages_endpoint(
+    campaign_id: str,
+    limit: Optional[int] = Query(None, ge=1, description="Return only the last N turns"),
+    user: dict = Depends(get_current_user)
+):
+    """Get the conversation history of a campaign, optionally only the last N turns"""
+    try:
+        if not await user_owns_campaign(campaign_id, user['user_id']):
+            raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
+        return SerializerJSONResponse({
+            'success': True,
+            'messages': await get_campaign_messages(campaign_id, last_n=limit)
+        })
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.exception(f"Error getting campaign messages: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/campaigns/{campaign_id}/contacts")
+async def get_campaign_contacts_endpoint(
+    campaign_id: str,
+    limit: int = Query(20, ge=1, le=200, description="Contacts per page"),
+    offset: int = Query(0, ge=0, description="Contacts to skip"),
+    sort: Optional[str] = Query(None, description="name, organization or city (default: the campaign's own order)"),
+    order: str = Query("asc", pattern="^(asc|desc)$", description="asc or desc"),
+    name: Optional[str] = Query(None, max_length=200, description="Substring of the contact's name"),
+    email: Optional[str] = Query(None, max_length=200, description="Substring of the contact's email"),
+    organization: Optional[str] = Query(None, max_length=200, description="Substring of the organization"),
+    city: Optional[str] = Query(None, max_length=200, description="Substring of the city"),
+    user: dict = Depends(get_current_user)
+):
+    """One page of a campaign's contacts, sorted and filtered on the server"""
+    try:
+        if not await user_owns_campaign(campaign_id, user['user_id']):
+            raise HTTPException(status_code=404, detail=f"Campaign {campaign_id} not found")
+        page = await get_campaign_contacts_page(
+            campaign_id, limit=limit, offset=offset, sort=sort, descending=order == 'desc',
+            filters={'name': name, 'email': email, 'organization': organization, 'city': city}
+        )
+        return SerializerJSONResponse({
+            'success': True,
+            'contacts': page['contacts'],
+            'total': page['total'],
+            'hasMore': page['hasMore']
+        })
+    except HTTPException:
+        raise
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Error getting campaign contacts: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
 @app.get("/api/campaigns")
-async def get_campaigns(user: dict = Depends(get_current_user)):
-    """Get all campaigns for current user"""
+async def get_campaigns(
+    limit: int = Query(50, ge=1, le=200, description="Campaigns per page"),
+    cursor: Optional[str] = Query(None, description="nextCursor from the previous page"),
+    include: Optional[str] = Query(None, description="Comma-separated heavy fields: messages, contacts, tool_calls"),
+    user: dict = Depends(get_current_user)
+):
+    """Get a page of campaign summaries for current user, newest first"""
     try:
-        campaigns = get_all_campaigns(user['user_id'])
-        return {
+        include_fields = [f.strip() for f in include.split(',') if f.strip()] if include else []
+        page = await get_campaign_summaries(user['user_id'], limit=limit, cursor=cursor, include=include_fields)
+        return SerializerJSONResponse({
             'success': True,
-            'campaigns': campaigns
-        }
+            'campaigns': page['campaigns'],
+            'nextCursor': page['nextCursor']
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.exception(f"Error getting campaigns: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.get("/api/search")
+async def search(
+    q: str = Query(..., min_length=1, max_length=500, description="Words to find; a trailing * matches a prefix"),
+    type: Optional[str] = Query(None, description="Comma-separated: responses, messages (default both)"),
+    limit: int = Query(20, ge=1, le=100, description="Results per page"),
+    offset: int = Query(0, ge=0, le=1000, description="Results to skip"),
+    user: dict = Depends(get_current_user)
+):
+    """Ranked full-text search over the current user's customer responses and conversation history"""
+    try:
+        types = [t.strip() for t in type.split(',') if t.strip()] if type else SEARCH_TYPES
+        page = await search_campaign_text(user['user_id'], q, types=types, limit=limit, offset=offset)
+        return SerializerJSONResponse({
+            'success': True,
+            'results': page['results'],
+            'hasMore': page['hasMore']
+        })
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.exception(f"Error searching: {str(e)}")
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/export/{dataset}")
+async def export_dataset(
+    dataset: str,
+    format: str = Query('ndjson', description="ndjson or arrow (Arrow IPC stream, needs pyarrow)"),
+    since: Optional[str] = Query(None, description="ISO timestamp; only rows written at or after it"),
+    user: dict = Depends(get_current_user)
+):
+    """Stream the current user's campaigns or contacts; memory use does not grow with the export"""
+    try:
+        chunks, next_since = await run_in_db_thread(export_stream, dataset, format, since=since, user_id=user['user_id'])
+    except ExportFormatUnavailableError as e:
+        raise HTTPException(status_code=501, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = 'ndjson' if format == 'ndjson' else 'arrows'
+    return StreamingResponse(
+        chunks,
+        media_type=EXPORT_MEDIA_TYPES[format],
+        headers={
+            'Content-Disposition': f'attachment; filename="{dataset}.{extension}"',
+            # Pass back as since for the next incremental export; read with the rows
+            **({'X-Export-Next-Since': next_since} if next_since else {})
+        }
+    )
+
 @app.get("/health")
 async def health():
-    """Health check endpoint"""
-    return {'status': 'ok'}
+    """Health check endpoint (includes campaign read cache hit/miss counters)"""
+    return {'status': 'ok', 'campaignCache': campaign_cache_stats()}
 
 if __name__ == '__main__':
     import uvicorn
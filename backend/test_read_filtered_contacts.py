@@ -3,78 +3,61 @@ Test script to read filtered contacts from the database.
 This script reads all campaigns and displays their filtered contacts.
 """
 
-import sqlite3
-import json
 import os
-from typing import List, Dict, Any
+from typing import Dict, Any, Iterator
 
-# Database path
-DB_PATH = os.path.join(os.path.dirname(__file__), 'campaigns.db')
+from core import db, serializer
+from core.export import export_to_file
 
-def get_db_connection():
-    """Get a database connection"""
-    if not os.path.exists(DB_PATH):
-        print(f"Error: Database file not found at {DB_PATH}")
-        return None
-    
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+# Contacts are read and printed this many at a time, never a whole campaign at once
+PAGE_SIZE = 500
 
-def parse_contacts(contacts_str: str) -> List[Dict[str, Any]]:
-    """Parse contacts JSON string, handling potential double serialization"""
-    if not contacts_str:
-        return []
-    
-    try:
-        # Try parsing once
-        contacts = json.loads(contacts_str)
-        
-        # Handle double serialization (if contacts is still a string)
-        if isinstance(contacts, str):
-            contacts = json.loads(contacts)
-        
-        # Ensure it's a list
-        if isinstance(contacts, list):
-            return contacts
-        else:
-            print(f"Warning: Contacts is not a list: {type(contacts)}")
-            return []
-    except json.JSONDecodeError as e:
-        print(f"Error parsing contacts JSON: {e}")
-        return []
+def get_db_connections():
+    """A connection to core.db's database (every shard when sharding is on), migrated first"""
+    db.init_db()
+    return [db.get_db_connection(path) for path in db.all_db_paths()]
+
+def iter_contacts(campaign_id: str) -> Iterator[Dict[str, Any]]:
+    """Yield a campaign's contacts in order, one page at a time"""
+    offset = 0
+    while True:
+        page = db.get_campaign_contacts(campaign_id, limit=PAGE_SIZE, offset=offset)
+        yield from page
+        if len(page) < PAGE_SIZE:
+            return
+        offset += len(page)
+
+# Campaigns that have at least one stored contact, newest first (without the contacts themselves)
+CAMPAIGNS_WITH_CONTACTS_SQL = '''
+    SELECT c.id, c.name, c.created_at, c.user_id, c.status, c.executed,
+           (SELECT COUNT(*) FROM campaign_contacts cc WHERE cc.campaign_id = c.id) AS contacts_count
+    FROM campaigns c
+    WHERE EXISTS (SELECT 1 FROM campaign_contacts cc WHERE cc.campaign_id = c.id)
+    ORDER BY c.created_at DESC
+'''
+
+def campaign_to_dict(row) -> Dict[str, Any]:
+    """Build the display record for a campaign row; contacts are read lazily by iter_contacts()"""
+    return {
+        'campaign_id': row['id'],
+        'name': row['name'],
+        'created_at': row['created_at'],
+        'user_id': row['user_id'],
+        'status': row['status'],
+        'executed': bool(row['executed']),
+        'contacts_count': row['contacts_count'],
+    }
 
 def get_all_campaigns_with_contacts():
-    """Get all campaigns with their filtered contacts"""
-    conn = get_db_connection()
-    if not conn:
-        return []
-    
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT id, name, created_at, user_id, contacts, status, executed
-        FROM campaigns
-        WHERE contacts IS NOT NULL AND contacts != ''
-        ORDER BY created_at DESC
-    ''')
-    
-    rows = cursor.fetchall()
-    conn.close()
-    
+    """Get all campaigns that have filtered contacts (their contacts are not loaded)"""
     campaigns = []
-    for row in rows:
-        contacts = parse_contacts(row['contacts'])
-        campaigns.append({
-            'campaign_id': row['id'],
-            'name': row['name'],
-            'created_at': row['created_at'],
-            'user_id': row['user_id'],
-            'status': row['status'],
-            'executed': bool(row['executed']),
-            'contacts_count': len(contacts),
-            'contacts': contacts
-        })
+    for conn in get_db_connections():
+        cursor = conn.cursor()
+        cursor.execute(CAMPAIGNS_WITH_CONTACTS_SQL)
+        campaigns.extend(campaign_to_dict(row) for row in cursor.fetchall())
+        conn.close()
     
+    campaigns.sort(key=lambda c: c['created_at'] or '', reverse=True)
     return campaigns
 
 def display_contact(contact: Dict[str, Any], index: int):
@@ -101,45 +84,25 @@ def display_campaign(campaign: Dict[str, Any]):
     print(f"Filtered Contacts Count: {campaign['contacts_count']}")
     print("-" * 80)
     
-    if campaign['contacts']:
+    if campaign['contacts_count']:
         print("\nFiltered Contacts:")
-        for idx, contact in enumerate(campaign['contacts']):
+        for idx, contact in enumerate(iter_contacts(campaign['campaign_id'])):
             display_contact(contact, idx)
     else:
         print("\nNo contacts found (empty list)")
 
 def get_latest_campaign():
     """Get only the most recent campaign with contacts"""
-    conn = get_db_connection()
-    if not conn:
-        return None
-    
-    cursor = conn.cursor()
-    cursor.execute('''
-        SELECT id, name, created_at, user_id, contacts, status, executed
-        FROM campaigns
-        WHERE contacts IS NOT NULL AND contacts != ''
-        ORDER BY created_at DESC
-        LIMIT 1
-    ''')
+    campaign = None
+    for conn in get_db_connections():
+        cursor = conn.cursor()
+        cursor.execute(CAMPAIGNS_WITH_CONTACTS_SQL + ' LIMIT 1')
+        row = cursor.fetchone()
+        if row and (campaign is None or (row['created_at'] or '') > (campaign['created_at'] or '')):
+            campaign = campaign_to_dict(row)
+        conn.close()
     
-    row = cursor.fetchone()
-    conn.close()
-    
-    if not row:
-        return None
-    
-    contacts = parse_contacts(row['contacts'])
-    return {
-        'campaign_id': row['id'],
-        'name': row['name'],
-        'created_at': row['created_at'],
-        'user_id': row['user_id'],
-        'status': row['status'],
-        'executed': bool(row['executed']),
-        'contacts_count': len(contacts),
-        'contacts': contacts
-    }
+    return campaign
 
 
 def main():
@@ -166,14 +129,16 @@ def main():
         print(f"\nLatest campaign with contacts:")
         display_campaign(campaign)
         
-        # Export latest only
-        export_file = os.path.join(os.path.dirname(__file__), 'latest_campaign_export.json')
+        # Export latest only: the campaign on the first line, then one contact per line
+        export_file = os.path.join(os.path.dirname(__file__), 'latest_campaign_export.ndjson')
         try:
-            with open(export_file, 'w', encoding='utf-8') as f:
-                json.dump(campaign, f, indent=2, ensure_ascii=False)
+            with open(export_file, 'wb') as f:
+                f.write(serializer.dumpb(campaign) + b'\n')
+                for contact in iter_contacts(campaign['campaign_id']):
+                    f.write(serializer.dumpb(contact) + b'\n')
             print(f"\nExported to: {export_file}")
         except Exception as e:
-            print(f"\nCould not export to JSON: {e}")
+            print(f"\nCould not export contacts: {e}")
     else:
         campaigns = get_all_campaigns_with_contacts()
         
@@ -197,14 +162,14 @@ def main():
         print(f"Total filtered contacts: {total_contacts}")
         print(f"Average contacts per campaign: {total_contacts / len(campaigns):.1f}" if campaigns else "N/A")
         
-        # Option to export to JSON
-        export_file = os.path.join(os.path.dirname(__file__), 'filtered_contacts_export.json')
+        # Stream every contact to NDJSON (one per line) instead of building one big document
+        export_file = os.path.join(os.path.dirname(__file__), 'filtered_contacts_export.ndjson')
         try:
-            with open(export_file, 'w', encoding='utf-8') as f:
-                json.dump(campaigns, f, indent=2, ensure_ascii=False)
-            print(f"\nExported to: {export_file}")
+            result = export_to_file(export_file, 'contacts')
+            print(f"\nExported {result['rows']} contacts to: {export_file}")
+            print("(python -m core.export --help for Parquet/Arrow and incremental exports)")
         except Exception as e:
-            print(f"\nCould not export to JSON: {e}")
+            print(f"\nCould not export contacts: {e}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,37 @@
+"""
+Which campaigns core/archive.py considers idle enough to archive.
+"""
+
+from datetime import datetime, timedelta
+
+from core import archive, db
+
+USER_ID = 'user_1'
+
+
+def _create_old_campaign(campaign_id, days_ago=200):
+    db.create_user_if_not_exists({'user_id': USER_ID, 'email': 'a@example.com', 'name': 'A', 'picture': None})
+    db.create_campaign(campaign_id, campaign_id, USER_ID)
+    created_at = (datetime.now() - timedelta(days=days_ago)).isoformat()
+    conn = db.get_db_connection()
+    try:
+        conn.execute('UPDATE campaigns SET created_at = ? WHERE id = ?', (created_at, campaign_id))
+        conn.commit()
+    finally:
+        conn.close()
+
+
+def _candidates():
+    return [campaign_id for _, campaign_id in archive.find_archive_candidates(older_than_days=90)]
+
+
+def test_old_idle_campaign_is_a_candidate(database):
+    _create_old_campaign('idle')
+    assert _candidates() == ['idle']
+
+
+def test_recent_reply_keeps_campaign_hot(database):
+    _create_old_campaign('idle')
+    _create_old_campaign('replied')
+    db.add_campaign_response('replied', 'lead@example.com', 'Interested')
+    assert _candidates() == ['idle']
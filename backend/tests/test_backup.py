@@ -0,0 +1,24 @@
+"""
+Snapshot names and rotation in core/backup.py.
+"""
+
+import os
+
+from core import backup, db
+
+
+def test_snapshots_in_the_same_second_keep_their_own_files(file_database, tmp_path):
+    first = backup.backup_snapshot(str(tmp_path), rotate=False)['snapshots']
+    second = backup.backup_snapshot(str(tmp_path), rotate=False)['snapshots']
+    assert set(first).isdisjoint(second)
+    assert [path for _, path in backup.list_snapshots(str(tmp_path))] == [second[0], first[0]]
+
+
+def test_second_precision_names_are_still_listed_and_rotated(file_database, tmp_path):
+    stem = os.path.splitext(os.path.basename(db.DB_PATH))[0]
+    legacy = tmp_path / f'{stem}-20240101T120000.db'
+    legacy.write_bytes(b'')
+    taken = backup.backup_snapshot(str(tmp_path), rotate=False)['snapshots'][0]
+    assert [path for _, path in backup.list_snapshots(str(tmp_path))] == [taken, str(legacy)]
+
+    assert backup.rotate_snapshots(str(tmp_path), keep=1, keep_daily=0) == [str(legacy)]
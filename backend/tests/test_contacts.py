@@ -0,0 +1,89 @@
+"""
+Campaign contacts: shared contacts rows, per-campaign isolation and garbage collection.
+"""
+
+from core import archive, db
+
+USER_ID = 'user_1'
+
+
+def _create_campaigns(*campaign_ids):
+    db.create_user_if_not_exists({'user_id': USER_ID, 'email': 'a@example.com', 'name': 'A', 'picture': None})
+    for campaign_id in campaign_ids:
+        db.create_campaign(campaign_id, campaign_id, USER_ID)
+
+
+def _contact(n, **fields):
+    return {'id': f'apollo_{n}', 'name': f'Person {n}', 'email': f'person{n}@example.com', **fields}
+
+
+def _contacts_rows():
+    conn = db.get_db_connection()
+    try:
+        return conn.execute('SELECT COUNT(*) FROM contacts').fetchone()[0]
+    finally:
+        conn.close()
+
+
+def test_identical_copies_share_one_row(database):
+    _create_campaigns('a', 'b')
+    contacts = [_contact(n) for n in range(3)]
+    db.save_campaign_contacts('a', USER_ID, contacts)
+    db.save_campaign_contacts('b', USER_ID, [dict(contact) for contact in contacts])
+    assert _contacts_rows() == 3
+    assert db.get_campaign_contacts('b') == contacts
+
+
+def test_shared_email_with_different_apollo_ids_stays_separate(database):
+    _create_campaigns('a')
+    first = {'id': 'apollo_1', 'name': 'First', 'email': 'team@example.com'}
+    second = {'id': 'apollo_2', 'name': 'Second', 'email': 'team@example.com'}
+    db.save_campaign_contacts('a', USER_ID, [first, second])
+    assert _contacts_rows() == 2
+    assert db.get_campaign_contacts('a') == [first, second]
+
+
+def test_other_campaign_save_leaves_contacts_unchanged(database):
+    _create_campaigns('a', 'b')
+    original = _contact(1, title='Engineer')
+    db.save_campaign_contacts('a', USER_ID, [original])
+    db.save_campaign_contacts('b', USER_ID, [_contact(1, title='CTO')])
+    assert db.get_campaign_contacts('a') == [original]
+    assert db.get_campaign_contacts('b') == [_contact(1, title='CTO')]
+    assert _contacts_rows() == 2
+
+
+def test_replace_deletes_orphaned_contacts(database):
+    _create_campaigns('a', 'b')
+    db.save_campaign_contacts('a', USER_ID, [_contact(1), _contact(2)])
+    db.save_campaign_contacts('b', USER_ID, [_contact(2)])
+    db.save_campaign_contacts('a', USER_ID, [_contact(3)])
+    # 1 was only used by a; 2 is still used by b
+    assert _contacts_rows() == 2
+    assert db.get_campaign_contacts('b') == [_contact(2)]
+
+    db.save_campaign_contacts('a', USER_ID, [_contact(3)])
+    assert _contacts_rows() == 2
+
+
+def test_delete_campaign_deletes_orphaned_contacts(database):
+    _create_campaigns('a', 'b')
+    db.save_campaign_contacts('a', USER_ID, [_contact(1), _contact(2)])
+    db.save_campaign_contacts('b', USER_ID, [_contact(2)])
+    assert db.delete_campaign('a', USER_ID)
+    assert _contacts_rows() == 1
+    assert db.delete_campaign('b', USER_ID)
+    assert _contacts_rows() == 0
+
+
+def test_archive_deletes_orphaned_contacts_and_rehydrate_restores_them(database):
+    _create_campaigns('a', 'b')
+    contacts = [_contact(1), _contact(2)]
+    db.save_campaign_contacts('a', USER_ID, contacts)
+    db.save_campaign_contacts('b', USER_ID, [_contact(2)])
+    assert archive.archive_campaign('a')
+    assert _contacts_rows() == 1
+
+    assert archive.rehydrate_campaign('a')
+    assert db.get_campaign_contacts('a') == contacts
+    assert _contacts_rows() == 2
@@ -0,0 +1,31 @@
+"""
+A slow query run through core.async_db leaves the event loop free to tick.
+"""
+
+import asyncio
+
+from benchmarks.bench_event_loop_lag import measure, slow_query
+from core import async_db
+
+ROWS = 1_000_000
+MAX_LAG_MS = 50.0
+
+
+def test_offloaded_query_does_not_block_loop(file_database):
+    async def offloaded():
+        assert await async_db.run_in_db_thread(slow_query, ROWS) == ROWS
+
+    try:
+        lag = asyncio.run(measure('async_db', offloaded))
+    finally:
+        async_db.shutdown()
+    assert lag < MAX_LAG_MS
+
+
+def test_blocking_query_does_block_loop(file_database):
+    # The control case: without async_db the same query stalls every tick
+    async def blocking():
+        slow_query(ROWS)
+
+    lag = asyncio.run(measure('blocking', blocking))
+    assert lag >= MAX_LAG_MS
@@ -0,0 +1,13 @@
+"""
+Every core/db.py helper exercised by benchmarks/query_plans.py reads through an index.
+"""
+
+from benchmarks import query_plans
+
+
+def test_no_full_table_scans(file_database):
+    query_plans.seed()
+    failures = query_plans.check()
+    assert not failures, '\n'.join(
+        f"[{label}] {' '.join(sql.split())}: {'; '.join(scans)}" for label, sql, scans in failures
+    )
@@ -0,0 +1,124 @@
+"""
+UnitOfWork commit/rollback and the pending-action claim.
+"""
+
+import threading
+
+import pytest
+
+from core import db
+
+USER_ID = 'user_1'
+CAMPAIGN_ID = 'campaign_1'
+
+
+def _create_campaign():
+    db.create_user_if_not_exists({'user_id': USER_ID, 'email': 'a@example.com', 'name': 'A', 'picture': None})
+    db.create_campaign(CAMPAIGN_ID, 'Campaign', USER_ID)
+
+
+def _campaign_name():
+    return db.get_campaign_analytics(CAMPAIGN_ID, USER_ID)['name']
+
+
+def test_commit_persists_writes(database):
+    _create_campaign()
+    uow = db.UnitOfWork()
+    try:
+        db.update_campaign(CAMPAIGN_ID, USER_ID, name='Renamed', uow=uow)
+        db.set_pending_action(CAMPAIGN_ID, {'tool': 'search'}, uow=uow)
+        uow.commit()
+    finally:
+        uow.close()
+    assert _campaign_name() == 'Renamed'
+    assert db.get_pending_action(CAMPAIGN_ID) == {'tool': 'search'}
+
+
+def test_rollback_discards_writes(database):
+    _create_campaign()
+    uow = db.UnitOfWork()
+    try:
+        db.update_campaign(CAMPAIGN_ID, USER_ID, name='Renamed', uow=uow)
+        db.set_pending_action(CAMPAIGN_ID, {'tool': 'search'}, uow=uow)
+        uow.rollback()
+    finally:
+        uow.close()
+    assert _campaign_name() == 'Campaign'
+    assert db.get_pending_action(CAMPAIGN_ID) is None
+
+
+def test_close_without_commit_rolls_back(database):
+    _create_campaign()
+    uow = db.UnitOfWork()
+    db.update_campaign(CAMPAIGN_ID, USER_ID, name='Renamed', uow=uow)
+    uow.close()
+    assert _campaign_name() == 'Campaign'
+
+
+def test_context_manager_commits_on_success(database):
+    _create_campaign()
+    with db.UnitOfWork() as uow:
+        db.update_campaign(CAMPAIGN_ID, USER_ID, name='Renamed', uow=uow)
+    assert _campaign_name() == 'Renamed'
+
+
+def test_context_manager_rolls_back_on_error(database):
+    _create_campaign()
+    with pytest.raises(RuntimeError):
+        with db.UnitOfWork() as uow:
+            db.update_campaign(CAMPAIGN_ID, USER_ID, name='Renamed', uow=uow)
+            raise RuntimeError('tool failed')
+    assert _campaign_name() == 'Campaign'
+
+
+def test_cached_reads_refresh_only_after_commit(database):
+    _create_campaign()
+    assert _campaign_name() == 'Campaign'
+    with db.UnitOfWork() as uow:
+        db.update_campaign(CAMPAIGN_ID, USER_ID, name='Renamed', uow=uow)
+        assert _campaign_name() == 'Campaign'
+    assert _campaign_name() == 'Renamed'
+
+
+def test_claim_pending_action_runs_once(database):
+    _create_campaign()
+    db.set_pending_action(CAMPAIGN_ID, {'tool': 'search', 'args': {'q': 'cto'}})
+    assert db.claim_pending_action(CAMPAIGN_ID) == {'tool': 'search', 'args': {'q': 'cto'}}
+    assert db.claim_pending_action(CAMPAIGN_ID) is None
+    assert db.get_pending_action(CAMPAIGN_ID) is None
+
+
+def test_claim_without_pending_action(database):
+    _create_campaign()
+    assert db.claim_pending_action(CAMPAIGN_ID) is None
+    assert db.claim_pending_action('missing') is None
+
+
+def test_concurrent_claims_have_one_winner(file_database):
+    _create_campaign()
+    db.set_pending_action(CAMPAIGN_ID, {'tool': 'search'})
+    threads = 8
+    barrier = threading.Barrier(threads)
+    claimed = []
+
+    def claim():
+        barrier.wait()
+        claimed.append(db.claim_pending_action(CAMPAIGN_ID))
+
+    workers = [threading.Thread(target=claim) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+    assert [action for action in claimed if action is not None] == [{'tool': 'search'}]
+
+
+def test_claim_does_not_wait_for_an_open_unit_of_work_read(file_database):
+    # A unit of work that has only read holds no lock, so the claim commits straight away
+    _create_campaign()
+    db.set_pending_action(CAMPAIGN_ID, {'tool': 'search'})
+    with db.UnitOfWork() as uow:
+        assert db.get_pending_action(CAMPAIGN_ID, uow=uow) == {'tool': 'search'}
+        assert db.claim_pending_action(CAMPAIGN_ID) == {'tool': 'search'}
+    assert db.get_pending_action(CAMPAIGN_ID) is None
@@ -7,12 +7,12 @@ from typing import Dict, Any, Callable, List, Optional
 from langchain_core.tools import StructuredTool
 from pydantic import BaseModel, Field, create_model
 import logging
-import json
 import base64
 from email.mime.text import MIMEText
 from googleapiclient.discovery import build
 from google.oauth2.credentials import Credentials
 
+from core import serializer
 from .schema import ALL_TOOL_SCHEMAS, get_tool_by_name
 
 logger = logging.getLogger(__name__)
@@ -76,14 +76,13 @@ def execute_apollo_search_people(
     
     import os
     import requests
-    import json
     
     apollo_api_key = os.getenv('APOLLO_API_KEY')
     fetched_contacts = []
     
     if not apollo_api_key:
         logger.warning("APOLLO_API_KEY not set in .env")
-        return json.dumps({
+        return serializer.dumps({
             "status": "error",
             "message": "Apollo API key not configured",
             "results": [],
@@ -126,7 +125,7 @@ def execute_apollo_search_people(
 
         else:
             logger.error(f"Apollo API failed: {response.status_code} - {response.text}")
-            return json.dumps({
+            return serializer.dumps({
                 "status": "error",
                 "message": f"Apollo API error: {response.status_code}",
                 "results": [],
@@ -134,14 +133,14 @@ def execute_apollo_search_people(
             })
     except Exception as e:
         logger.error(f"Error calling Apollo API: {str(e)}")
-        return json.dumps({
+        return serializer.dumps({
             "status": "error",
             "message": str(e),
             "results": [],
             "count": 0
         })
 
-    return json.dumps({
+    return serializer.dumps({
         "status": "success",
         "message": "Apollo search completed. Contacts will be filtered based on your criteria.",
         "results": fetched_contacts,
@@ -157,16 +156,15 @@ def execute_filter_contacts_by_company_criteria(
 ) -> str:
     """Filter contacts by company criteria using Gemini AI."""
     import os
-    import json
     from langchain_google_genai import ChatGoogleGenerativeAI
     
     # Handle case where contacts might come as JSON string (from LangChain)
     if isinstance(contacts, str):
         try:
-            contacts = json.loads(contacts)
-        except json.JSONDecodeError:
+            contacts = serializer.loads(contacts)
+        except serializer.JSONDecodeError:
             logger.error(f"Failed to parse contacts as JSON: {contacts[:100]}")
-            return json.dumps({
+            return serializer.dumps({
                 "status": "error",
                 "message": "Invalid contacts format",
                 "results": [],
@@ -176,7 +174,7 @@ def execute_filter_contacts_by_company_criteria(
     logger.info(f"Filtering {len(contacts)} contacts by criteria from user prompt: {user_prompt[:100]}...")
     
     if not contacts:
-        return json.dumps({
+        return serializer.dumps({
             "status": "success",
             "message": "No contacts to filter",
             "results": [],
@@ -208,7 +206,7 @@ def execute_filter_contacts_by_company_criteria(
 User's Request: "{user_prompt}"
 
 Contact/Company Data (each contact has an "index" field for identification):
-{json.dumps(company_data, indent=2)}
+{serializer.dumps(company_data, indent=2)}
 
 Task: Analyze EACH contact and determine if they match ALL criteria mentioned in the user's request.
 
@@ -262,17 +260,17 @@ BE VERY STRICT: Only return contacts that genuinely match ALL criteria. Do not i
         
         # Extract JSON array
         try:
-            matched_ids = json.loads(response_text)
+            matched_ids = serializer.loads(response_text)
             if not isinstance(matched_ids, list):
                 logger.warning(f"Gemini returned non-list: {type(matched_ids)}")
                 matched_ids = []
-        except json.JSONDecodeError as e:
+        except serializer.JSONDecodeError as e:
             logger.warning(f"JSON decode error: {e}. Trying regex extraction...")
             # Try to extract array from text
             import re
             array_match = re.search(r'\[.*?\]', response_text, re.DOTALL)
             if array_match:
-                matched_ids = json.loads(array_match.group())
+                matched_ids = serializer.loads(array_match.group())
             else:
                 logger.error(f"Could not extract array from response: {response_text}")
                 matched_ids = []
@@ -308,13 +306,13 @@ BE VERY STRICT: Only return contacts that genuinely match ALL criteria. Do not i
         # Save filtered contacts to DB
         if campaign_id and user_id and filtered_contacts:
             try:
-                from core.db import update_campaign
+                from core.db import save_campaign_contacts
                 logger.info(f"Saving {len(filtered_contacts)} filtered contacts to campaign {campaign_id}")
-                update_campaign(campaign_id, user_id, contacts=json.dumps(filtered_contacts))
+                save_campaign_contacts(campaign_id, user_id, filtered_contacts)
             except Exception as e:
                 logger.error(f"Failed to save filtered contacts to DB: {e}")
         
-        return json.dumps({
+        return serializer.dumps({
             "status": "success",
             "message": f"Filtered contacts by criteria from user prompt",
             "results": filtered_contacts,
@@ -327,7 +325,7 @@ BE VERY STRICT: Only return contacts that genuinely match ALL criteria. Do not i
         logger.error(f"Error filtering contacts with Gemini: {str(e)}")
         # Fallback: return all contacts if filtering fails
         logger.warning("Filtering failed, returning all contacts as fallback")
-        return json.dumps({
+        return serializer.dumps({
             "status": "error",
             "message": f"Filtering failed: {str(e)}. Returning all contacts.",
             "results": contacts,
@@ -349,7 +347,7 @@ def gmail_tool(action: str, params: str) -> str:
         JSON string with results
     """
     try:
-        params_dict = json.loads(params) if isinstance(params, str) else params
+        params_dict = serializer.loads(params) if isinstance(params, str) else params
     except:
         params_dict = {}
 
@@ -357,7 +355,7 @@ def gmail_tool(action: str, params: str) -> str:
     
     if action == "send_to_list":
         if not access_token:
-            return json.dumps({"status": "error", "message": "Access token is required for Gmail actions"})
+            return serializer.dumps({"status": "error", "message": "Access token is required for Gmail actions"})
         
         subject = params_dict.get('subject', 'Test Campaign Title')
         body_template = params_dict.get('body', 'This is a test body for our automated campaign.')
@@ -376,7 +374,7 @@ def gmail_tool(action: str, params: str) -> str:
                     campaign_id=campaign_id,
                     user_id=user_id
                 )
-                apollo_res = json.loads(apollo_res_str)
+                apollo_res = serializer.loads(apollo_res_str)
                 if apollo_res.get("status") == "success":
                     recipients = apollo_res.get("results", [])
             except Exception as e:
@@ -466,12 +464,12 @@ def gmail_tool(action: str, params: str) -> str:
         # Update analytics if we have campaign context
         if campaign_id:
              try:
-                 from core.db import create_or_update_analytics
-                 create_or_update_analytics(campaign_id, emails_sent=sent_count)
+                 from core.db import increment_analytics
+                 increment_analytics(campaign_id, emails_sent=sent_count)
              except Exception as e:
                  logger.error(f"Failed to update analytics: {e}")
 
-        return json.dumps({
+        return serializer.dumps({
             "status": "success",
             "message": f"Sent {sent_count}/{len(target_list)} emails successfully (to test emails only).",
             "results": results,
@@ -481,20 +479,20 @@ def gmail_tool(action: str, params: str) -> str:
 
     elif action == "send":
         if not access_token:
-            return json.dumps({"status": "error", "message": "Access token is required for Gmail actions"})
+            return serializer.dumps({"status": "error", "message": "Access token is required for Gmail actions"})
         
         to = params_dict.get('to')
         subject = params_dict.get('subject', 'Test Title')
         body = params_dict.get('body', 'Test Body')
         
         if not to:
-             return json.dumps({"status": "error", "message": "Recipient 'to' is required"})
+             return serializer.dumps({"status": "error", "message": "Recipient 'to' is required"})
              
         res = send_gmail(to, subject, body, access_token)
-        return json.dumps(res)
+        return serializer.dumps(res)
 
     logger.info(f"Gmail tool called with action: {action}, params: {params_dict}")
-    return json.dumps({
+    return serializer.dumps({
         "status": "success",
         "message": f"Action '{action}' not fully implemented or recognized.",
         "data": {}
@@ -525,7 +523,7 @@ def execute_gmail_send_email(
     
     if not access_token:
         logger.error("No access token found in context")
-        return json.dumps({
+        return serializer.dumps({
             "status": "error",
             "message": "Authentication required. Please sign in with Google to send emails."
         })
@@ -551,7 +549,7 @@ def execute_gmail_send_email(
             body={'raw': raw_message}
         ).execute()
         
-        return json.dumps({
+        return serializer.dumps({
             "status": "success",
             "message": f"Email sent successfully to {to}",
             "message_id": send_result.get('id'),
@@ -561,7 +559,7 @@ def execute_gmail_send_email(
         })
     except Exception as e:
         logger.error(f"Error sending Gmail: {str(e)}")
-        return json.dumps({
+        return serializer.dumps({
             "status": "error",
             "message": f"Failed to send email: {str(e)}"
         })
@@ -581,7 +579,7 @@ def execute_gmail_create_draft(
     logger.info(f"Gmail create_draft: to={to}, subject={subject}")
     
     # TODO: Implement actual Gmail API call
-    return json.dumps({
+    return serializer.dumps({
         "status": "success",
         "message": "Gmail create_draft - placeholder implementation",
         "draft_id": "placeholder_draft_id",
@@ -620,45 +618,27 @@ def execute_repeat_campaign_action(
     logger.info(f"Repeat campaign action: campaign_id={campaign_id}, action_type={action_type}")
     
     try:
-        from core.db import get_db_connection
-        import json as json_lib
+        from core.db import get_tool_calls
         
-        # Get campaign tool calls
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute('SELECT tool_calls, contacts FROM campaigns WHERE id = ?', (campaign_id,))
-        row = cursor.fetchone()
-        conn.close()
-        
-        if not row or not row[0]:
-            return json.dumps({
-                "status": "error",
-                "message": f"No saved workflow found for campaign {campaign_id}"
-            })
+        # Map action_type to tool names so only the matching calls are read
+        action_to_tool = {
+            "search_leads": "apollo_search_people",
+            "filter_contacts": "filter_contacts_by_company_criteria",
+            "send_emails": "gmail_tool"  # Uses gmail_tool with send_to_list action
+        }
+        target_tool = action_to_tool.get(action_type) if action_type else None
         
-        tool_calls = json_lib.loads(row[0]) if row[0] else []
-        contacts = json_lib.loads(row[1]) if row[1] else []
+        # Get campaign tool calls
+        tool_calls = get_tool_calls(campaign_id, tool_name=target_tool)
         
-        if not tool_calls:
-            return json.dumps({
+        if not tool_calls and not target_tool:
+            return serializer.dumps({
                 "status": "error",
-                "message": "No tool calls found in campaign workflow"
+                "message": f"No saved workflow found for campaign {campaign_id}"
             })
         
-        # Filter tool calls by action_type if specified
-        if action_type:
-            # Map action_type to tool names
-            action_to_tool = {
-                "search_leads": "apollo_search_people",
-                "filter_contacts": "filter_contacts_by_company_criteria",
-                "send_emails": "gmail_tool"  # Uses gmail_tool with send_to_list action
-            }
-            target_tool = action_to_tool.get(action_type)
-            if target_tool:
-                tool_calls = [tc for tc in tool_calls if tc.get("tool_name") == target_tool]
-        
         if not tool_calls:
-            return json.dumps({
+            return serializer.dumps({
                 "status": "error",
                 "message": f"No {action_type} actions found in campaign workflow"
             })
@@ -703,7 +683,7 @@ def execute_repeat_campaign_action(
                     "error": f"Tool executor not found for {tool_name}"
                 })
         
-        return json.dumps({
+        return serializer.dumps({
             "status": "success",
             "message": f"Repeated {len(results)} action(s) from campaign workflow",
             "campaign_id": campaign_id,
@@ -712,7 +692,7 @@ def execute_repeat_campaign_action(
         
     except Exception as e:
         logger.error(f"Error repeating campaign action: {e}")
-        return json.dumps({
+        return serializer.dumps({
             "status": "error",
             "message": f"Failed to repeat campaign action: {str(e)}"
         })
@@ -775,19 +755,11 @@ def execute_gmail_tool(
     # If no recipients provided, try to get filtered contacts from campaign
     if (not recipients or len(recipients) == 0) and campaign_id:
         try:
-            from core.db import get_db_connection
-            import json as json_lib
-            conn = get_db_connection()
-            cursor = conn.cursor()
-            cursor.execute('SELECT contacts FROM campaigns WHERE id = ?', (campaign_id,))
-            row = cursor.fetchone()
-            conn.close()
-            
-            if row and row[0]:
-                contacts_data = json_lib.loads(row[0]) if isinstance(row[0], str) else row[0]
-                if contacts_data:
-                    recipients = contacts_data
-                    logger.info(f"Loaded {len(recipients)} recipients from campaign {campaign_id}")
+            from core.db import get_campaign_contacts
+            contacts_data = get_campaign_contacts(campaign_id)
+            if contacts_data:
+                recipients = contacts_data
+                logger.info(f"Loaded {len(recipients)} recipients from campaign {campaign_id}")
         except Exception as e:
             logger.error(f"Error loading recipients from campaign: {e}")
     
@@ -806,7 +778,7 @@ def execute_gmail_tool(
     logger.info(f"Executing gmail_tool with action={action}, subject={subject[:50] if subject else 'no subject'}...")
     
     # Call the original gmail_tool function
-    return gmail_tool(action, json.dumps(params))
+    return gmail_tool(action, serializer.dumps(params))
 
 
 # =============================================================================
@@ -87,10 +87,13 @@ function App() {
   // if (authLoading) return <div className="h-screen flex items-center justify-center"><LoadingSpinner /></div>
   // if (!user) return <Login />
 
-  // Load messages when campaign changes
+  // Load messages when campaign changes (the campaign list only carries summaries)
   useEffect(() => {
     const campaign = campaigns.find(c => c.id === activeCampaignId)
     setMessages(campaign?.messages || [])
+    if (campaign && !campaign.messages) {
+      fetchCampaignMessages(campaign.id)
+    }
   }, [activeCampaignId, campaigns])
 
   // Reset payment state only when switching campaigns (not on every campaign update)
@@ -104,12 +107,31 @@ function App() {
 
   const fetchCampaignsFromDB = async () => {
     try {
-      const response = await axios.get(`${API_BASE}/campaigns`)
+      // The list endpoint returns summaries a page at a time
+      let allCampaigns = []
+      let cursor = null
+      do {
+        const response = await axios.get(`${API_BASE}/campaigns`, {
+          params: { limit: 200, ...(cursor ? { cursor } : {}) }
+        })
+        if (!response.data.success) break
+        allCampaigns = allCampaigns.concat(response.data.campaigns || [])
+        cursor = response.data.nextCursor
+      } while (cursor)
+      setCampaigns(allCampaigns)
+    } catch (error) {
+      console.error('Error fetching campaigns from database:', error)
+    }
+  }
+
+  const fetchCampaignMessages = async (campaignId) => {
+    try {
+      const response = await axios.get(`${API_BASE}/campaigns/${campaignId}/messages`)
       if (response.data.success) {
-        setCampaigns(response.data.campaigns || [])
+        setCampaigns(prev => prev.map(c => c.id === campaignId ? { ...c, messages: response.data.messages } : c))
       }
     } catch (error) {
-      console.error('Error fetching campaigns from database:', error)
+      console.error('Error fetching campaign messages:', error)
     }
   }
 
@@ -246,12 +268,12 @@ function App() {
     setCampaigns(campaigns.map(c => c.id === activeCampaignId ? { ...c, ...updates } : c))
   }
 
-  // Save messages and pending cost to database
-  const saveMessagesToDB = async (campaignId, messagesArray, costToSave = null) => {
+  // Append new conversation turns (and pending cost) to the database
+  const saveMessagesToDB = async (campaignId, newTurns, costToSave = null) => {
     try {
       const updateData = {
         campaignId: campaignId,
-        messages: messagesArray
+        newMessages: newTurns
       }
       if (costToSave !== null) {
         updateData.pendingCost = costToSave
@@ -277,7 +299,7 @@ function App() {
       setInputMessage('')
       if (textareaRef.current) textareaRef.current.style.height = 'auto'
       // Save messages but don't reset pending cost
-      saveMessagesToDB(activeCampaignId, updatedMessages)
+      saveMessagesToDB(activeCampaignId, [userMessage, paymentReminderMessage])
       return
     }
 
@@ -322,7 +344,7 @@ function App() {
       updateCampaign({ messages: updatedMessages, pendingCost: cost })
       
       // Persist messages and pending cost to database
-      saveMessagesToDB(activeCampaignId, updatedMessages, cost)
+      saveMessagesToDB(activeCampaignId, [userMessage, aiMessage], cost)
     } catch (error) {
       console.error('Error sending message:', error)
       let errorMessage = 'Sorry, I encountered an error. Please try again.'
@@ -344,7 +366,7 @@ function App() {
       }]
       setMessages(errorMessages)
       // Save even error messages so user doesn't lose context
-      saveMessagesToDB(activeCampaignId, errorMessages)
+      saveMessagesToDB(activeCampaignId, errorMessages.slice(-2))
     } finally {
       setIsLoading(false)
     }
@@ -396,7 +418,7 @@ function App() {
             setIsPaymentPending(true)
             
             // Save messages with new pending cost
-            await saveMessagesToDB(activeCampaignId, updatedMessages, payRes.data.cost)
+            await saveMessagesToDB(activeCampaignId, [progressMessage], payRes.data.cost)
             
             // Update local campaign state - mark as PAID (green dot) since payment was processed
             setCampaigns(campaigns.map(c =>
@@ -418,7 +440,7 @@ function App() {
             setMessages(updatedMessages)
             
             // Save messages to DB
-            await saveMessagesToDB(activeCampaignId, updatedMessages, 0)
+            await saveMessagesToDB(activeCampaignId, [successMessage], 0)
             
             // Update local campaign state - mark as PAID (green dot)
             setCampaigns(campaigns.map(c =>
@@ -439,7 +461,7 @@ function App() {
           }
           const updatedMessages = [...messages, errorMessage]
           setMessages(updatedMessages)
-          saveMessagesToDB(activeCampaignId, updatedMessages, 0)
+          saveMessagesToDB(activeCampaignId, [errorMessage], 0)
         }
       } else {
         // Transaction failed - don't reset payment state so user can retry
@@ -449,7 +471,7 @@ function App() {
         }
         const updatedMessages = [...messages, errorMessage]
         setMessages(updatedMessages)
-        saveMessagesToDB(activeCampaignId, updatedMessages)
+        saveMessagesToDB(activeCampaignId, [errorMessage])
       }
     } catch (error) {
       console.error('Payment failed:', error)
@@ -460,7 +482,7 @@ function App() {
       }
       const updatedMessages = [...messages, errorMsg]
       setMessages(updatedMessages)
-      saveMessagesToDB(activeCampaignId, updatedMessages)
+      saveMessagesToDB(activeCampaignId, [errorMsg])
     } finally {
       setIsLoading(false)
     }
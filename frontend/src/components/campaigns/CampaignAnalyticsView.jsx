@@ -18,6 +18,7 @@ export default function CampaignAnalyticsView() {
   // Status checking state
   const [checkingStatus, setCheckingStatus] = useState(false)
   const [replies, setReplies] = useState([])
+  const [latestReplyId, setLatestReplyId] = useState(0)
 
   useEffect(() => {
     fetchCampaigns()
@@ -27,6 +28,7 @@ export default function CampaignAnalyticsView() {
     if (selectedCampaignId) {
       fetchCampaignAnalytics(selectedCampaignId)
       setReplies([])
+      setLatestReplyId(0)
     } else {
       setSelectedCampaign(null)
     }
@@ -41,16 +43,23 @@ export default function CampaignAnalyticsView() {
   const fetchCampaigns = async () => {
     setIsLoadingCampaigns(true)
     try {
-      const response = await axios.get(`${API_BASE}/campaigns`)
-      if (response.data.success) {
-        const allCampaigns = response.data.campaigns || []
-        // Filter campaigns that have been paid (executed) - check both flags for compatibility
-        const paidCampaigns = allCampaigns.filter(c => c.paid || c.executed)
-        setCampaigns(paidCampaigns)
-
-        if (paidCampaigns.length > 0) {
-          setSelectedCampaignId(paidCampaigns[0].id)
-        }
+      // The list endpoint returns summaries a page at a time
+      let allCampaigns = []
+      let cursor = null
+      do {
+        const response = await axios.get(`${API_BASE}/campaigns`, {
+          params: { limit: 200, ...(cursor ? { cursor } : {}) }
+        })
+        if (!response.data.success) break
+        allCampaigns = allCampaigns.concat(response.data.campaigns || [])
+        cursor = response.data.nextCursor
+      } while (cursor)
+      // Filter campaigns that have been paid (executed) - check both flags for compatibility
+      const paidCampaigns = allCampaigns.filter(c => c.paid || c.executed)
+      setCampaigns(paidCampaigns)
+
+      if (paidCampaigns.length > 0) {
+        setSelectedCampaignId(paidCampaigns[0].id)
       }
     } catch (error) {
       console.error('Error fetching campaigns:', error)
@@ -89,15 +98,27 @@ export default function CampaignAnalyticsView() {
         headers['X-Google-AccessToken'] = googleToken
       }
 
-      const response = await axios.post(
-        `${API_BASE}/campaigns/${selectedCampaign.id}/verify_status`,
-        {},
-        { headers }
-      )
+      // Only fetch replies we haven't seen yet; the server pages oldest first
+      let sinceId = latestReplyId
+      let newReplies = []
+      let hasMore = true
+      while (hasMore) {
+        const response = await axios.post(
+          `${API_BASE}/campaigns/${selectedCampaign.id}/verify_status`,
+          {},
+          { headers, params: { since_id: sinceId, limit: 500 } }
+        )
+        if (!response.data.success || !response.data.data?.replies) break
+        newReplies = newReplies.concat(response.data.data.replies)
+        sinceId = response.data.data.latest_id
+        hasMore = response.data.data.has_more
+      }
 
-      if (response.data.success && response.data.data?.replies) {
-        setReplies(response.data.data.replies)
+      if (newReplies.length > 0) {
+        // Keep the list newest first
+        setReplies(prev => [...newReplies.reverse(), ...prev])
       }
+      setLatestReplyId(sinceId)
     } catch (e) {
       console.error("Failed to check status", e)
     } finally {
@@ -175,7 +196,7 @@ export default function CampaignAnalyticsView() {
               </div>
               <div className="flex items-center gap-2">
                 <span className="inline-flex items-center px-2.5 py-0.5 rounded-full text-xs font-medium bg-gray-100 text-gray-800">
-                  {selectedCampaign?.contacts ? JSON.parse(selectedCampaign.contacts).length : 0} Contacts
+                  {selectedCampaign?.contactsCount ?? 0} Contacts
                 </span>
               </div>
             </div>